@@ -4,6 +4,8 @@ import os
 from sentence_transformers import SentenceTransformer
 import numpy as np
 
+from scripts.utils.embedders import index_model
+
 # --- File Paths ---
 index_path = "data/cyber_threats/mitre_faiss.index"
 metadata_path = "data/cyber_threats/index_metadata.pkl"
@@ -16,7 +18,7 @@ with open(metadata_path, "rb") as f:
 
 # --- Load SentenceTransformer model ---
 print("🔍 Loading embedding model...")
-model = SentenceTransformer("all-mpnet-base-v2")  # Must match the one used for indexing
+model = SentenceTransformer(index_model(index_path))  # Must match the one used for indexing
 
 # --- Query loop ---
 def query_loop():
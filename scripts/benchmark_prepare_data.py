@@ -0,0 +1,74 @@
+# Author: Sean Sjahrial
+# Title: Cybersecurity RAG Assistant – Data Preparation Benchmark
+# Description: Measures text-cleaning throughput of prepare_data.py on a synthetic paragraph corpus.
+# GitHub: https://github.com/isnakie
+# License: MIT
+
+# ------------------------------------------------------------------------------
+# Builds a synthetic corpus (default 1M paragraphs) by resampling the labeled
+# pentest paragraphs, writes it to a temporary CSV, then compares rows/second for
+# the original per-row clean_text apply against the vectorized .str path, both
+# whole-file and chunked across worker processes.
+# ------------------------------------------------------------------------------
+
+"""
+Usage:
+> python scripts/benchmark_prepare_data.py --rows 1000000 --chunksize 100000 --workers 4
+"""
+
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from prepare_data import INPUT_CSV, clean_text, clean_text_series, load_and_clean
+
+# --- Resample real paragraphs (with a random suffix so rows are not identical) ---
+def build_corpus(path, rows, seed=42):
+    source = pd.read_csv(INPUT_CSV)
+    rng = np.random.default_rng(seed)
+    picks = rng.integers(0, len(source), size=rows)
+    df = source.iloc[picks].reset_index(drop=True)
+    df["text"] = df["text"].astype(str) + " (ref #" + pd.Series(picks).astype(str) + ")."
+    df.to_csv(path, index=False)
+
+def timed(label, rows, fn):
+    start = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - start
+    print(f"   ├── {label:<40} {elapsed:8.2f}s  {rows / elapsed:>12,.0f} rows/s")
+    return result
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark prepare_data.py text cleaning")
+    parser.add_argument("--rows", type=int, default=1_000_000, help="Synthetic paragraphs to generate")
+    parser.add_argument("--chunksize", type=int, default=100_000, help="Rows per CSV chunk")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="Processes for the parallel run")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        corpus_path = os.path.join(tmpdir, "synthetic_corpus.csv")
+        print(f":: Building synthetic corpus of {args.rows:,} paragraphs ...")
+        build_corpus(corpus_path, args.rows)
+
+        df = pd.read_csv(corpus_path)
+        print(":: Cleaning throughput (in-memory, excludes CSV read)")
+        before = timed("apply(clean_text)", args.rows, lambda: df["text"].astype(str).apply(clean_text))
+        after = timed("clean_text_series", args.rows, lambda: clean_text_series(df["text"]))
+
+        # Both paths must produce identical output before their speed means anything
+        mismatches = int((before != after).sum())
+        print(f"   └── Mismatched rows: {mismatches}")
+
+        print(":: End-to-end throughput (CSV read + clean)")
+        timed("whole file, vectorized", args.rows, lambda: load_and_clean(corpus_path))
+        timed(f"chunks of {args.chunksize:,}, 1 worker", args.rows,
+              lambda: load_and_clean(corpus_path, args.chunksize, 1))
+        timed(f"chunks of {args.chunksize:,}, {args.workers} workers", args.rows,
+              lambda: load_and_clean(corpus_path, args.chunksize, args.workers))
+
+if __name__ == "__main__":
+    main()
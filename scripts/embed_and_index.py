@@ -17,6 +17,8 @@ import pickle
 from sentence_transformers import SentenceTransformer
 from tqdm import tqdm
 
+from scripts.utils.embedders import DEFAULT_MODEL, write_index_info
+
 # --- File paths ---
 jsonl_path = "data/cyber_threats/mitre_cwe_knowledge_base.jsonl"
 index_path = "data/cyber_threats/mitre_faiss.index"
@@ -31,7 +33,7 @@ with open(jsonl_path, "r", encoding="utf-8") as f:
 
 # --- Load embedding model ---
 print(":: Loading sentence transformer model ...")
-model = SentenceTransformer("all-mpnet-base-v2")
+model = SentenceTransformer(DEFAULT_MODEL)
 
 # --- Generate vector embeddings ---
 print(":: Embedding MITRE CWE documents ...")
@@ -48,6 +50,7 @@ index.add(embeddings)
 print(":: Saving FAISS index and metadata ...")
 os.makedirs(os.path.dirname(index_path), exist_ok=True)
 faiss.write_index(index, index_path)
+write_index_info(index_path, DEFAULT_MODEL, dimension)
 
 metadata = [{"id": doc["id"], "metadata": doc["metadata"], "text": doc["content"]} for doc in documents]
 with open(metadata_path, "wb") as f:
@@ -10,10 +10,10 @@
 Usage:
 
 Convert MITRE CSV
-> python scripts/ingest/convert_csv_to_jsonl.py data/cyber_threats/mitre_cwe_clean.csv data/embeddings/mitre_cwe_knowledge_base.jsonl --format mitre
+> python -m scripts.ingest.convert_csv_to_jsonl data/cyber_threats/mitre_cwe_clean.csv data/embeddings/mitre_cwe_knowledge_base.jsonl --format mitre
 
 Convert STIG CSV
-> python scripts/ingest/convert_csv_to_jsonl.py data/STIGs/stig_traditional_security_checklist_v2r6_flat.csv data/embeddings/stig_traditional_security_checklist_v2r6.jsonl --format stig
+> python -m scripts.ingest.convert_csv_to_jsonl data/STIGs/stig_traditional_security_checklist_v2r6_flat.csv data/embeddings/stig_traditional_security_checklist_v2r6.jsonl --format stig
 """
 
 import argparse
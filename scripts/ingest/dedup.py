@@ -0,0 +1,168 @@
+# Author: Sean Sjahrial
+# Title: Cybersecurity RAG Assistant
+# Description: Part of UC Berkeley MICS Machine Learning Course (2025)
+# GitHub: https://github.com/isnakie
+# Description: MinHash/LSH near-duplicate detection for the ingest pipeline. STIG checklists contain many
+# rules that differ only in an asset name; these are clustered so only one representative per cluster is
+# embedded, with the member IDs kept in its metadata for expansion at query time.
+# License: MIT
+
+"""
+Usage:
+
+Used by the ingest script
+> python -m scripts.ingest.ingest_combined_jsonl_to_faiss --dedup --dedup-threshold 0.8
+
+Report index size, build time and top-k diversity with and without collapsing duplicates
+> python -m scripts.ingest.dedup --threshold 0.8 --k 5
+"""
+
+import argparse
+import re
+import time
+import zlib
+
+import numpy as np
+
+# Largest prime below 2^32 for the hash family h(x) = (a*x + b) mod p over 32-bit shingle hashes;
+# with a, b, x < 2^32 the product a*x + b still fits in uint64
+_PRIME = (1 << 32) - 5
+
+TOKEN_RE = re.compile(r"\w+")
+
+def shingles(text, k=3):
+    """Hashed word k-grams of the lowercased text (the text itself when shorter than k words)."""
+    tokens = TOKEN_RE.findall(text.lower())
+    grams = {" ".join(tokens[i:i + k]) for i in range(max(len(tokens) - k + 1, 1))}
+    return np.fromiter((zlib.crc32(g.encode("utf-8")) for g in grams), dtype=np.uint64, count=len(grams))
+
+def minhash_signatures(texts, num_perm=128, k=3, seed=1):
+    rng = np.random.default_rng(seed)
+    a = rng.integers(1, _PRIME, size=num_perm, dtype=np.uint64)
+    b = rng.integers(0, _PRIME, size=num_perm, dtype=np.uint64)
+
+    signatures = np.empty((len(texts), num_perm), dtype=np.uint64)
+    for i, text in enumerate(texts):
+        hashed = shingles(text, k)
+        # One (shingles x permutations) matrix per text, minimum per permutation
+        signatures[i] = ((np.outer(hashed, a) + b) % _PRIME).min(axis=0)
+    return signatures
+
+def lsh_params(threshold, num_perm):
+    """Bands x rows (= num_perm) whose S-curve midpoint (1/bands)^(1/rows) is closest to threshold."""
+    options = [(num_perm // r, r) for r in range(1, num_perm + 1) if num_perm % r == 0]
+    return min(options, key=lambda br: abs((1 / br[0]) ** (1 / br[1]) - threshold))
+
+def candidate_pairs(signatures, bands, rows):
+    pairs = set()
+    for band in range(bands):
+        buckets = {}
+        chunk = signatures[:, band * rows:(band + 1) * rows]
+        for i, key in enumerate(map(bytes, chunk)):
+            buckets.setdefault(key, []).append(i)
+        for members in buckets.values():
+            for x in range(len(members)):
+                for y in range(x + 1, len(members)):
+                    pairs.add((members[x], members[y]))
+    return pairs
+
+def cluster_near_duplicates(texts, threshold=0.8, num_perm=128, k=3):
+    """
+    Group texts whose estimated Jaccard similarity (over word k-shingles) is at least threshold.
+    Returns clusters as lists of indices in input order; the first index is the representative.
+    """
+    signatures = minhash_signatures(texts, num_perm, k)
+    bands, rows = lsh_params(threshold, num_perm)
+
+    parent = list(range(len(texts)))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    # LSH only proposes candidates; keep pairs whose signature agreement clears the threshold
+    for x, y in candidate_pairs(signatures, bands, rows):
+        if np.mean(signatures[x] == signatures[y]) >= threshold:
+            root_x, root_y = find(x), find(y)
+            if root_x != root_y:
+                parent[max(root_x, root_y)] = min(root_x, root_y)
+
+    clusters = {}
+    for i in range(len(texts)):
+        clusters.setdefault(find(i), []).append(i)
+    return list(clusters.values())
+
+def collapse(metadata, clusters):
+    """One metadata entry per cluster, recording the other members' IDs and titles for expansion."""
+    collapsed = []
+    for members in clusters:
+        entry = dict(metadata[members[0]])
+        entry["duplicate_ids"] = [metadata[i]["id"] for i in members[1:]]
+        entry["duplicate_titles"] = [metadata[i]["title"] for i in members[1:]]
+        collapsed.append(entry)
+    return collapsed
+
+# --- Before/after report ---
+def diversity_at_k(index, query_vecs, cluster_of, k):
+    """Mean share of distinct near-duplicate clusters among each query's top-k."""
+    _, I = index.search(query_vecs, k)
+    return float(np.mean([len({cluster_of[i] for i in row if i != -1}) / k for row in I]))
+
+def build_and_measure(model, texts, k, queries):
+    import faiss
+
+    start = time.perf_counter()
+    embeddings = np.asarray(model.encode(texts, batch_size=32), dtype="float32")
+    index = faiss.IndexFlatL2(embeddings.shape[1])
+    index.add(embeddings)
+    build_s = time.perf_counter() - start
+    size_mb = len(faiss.serialize_index(index)) / 1e6
+
+    query_vecs = np.asarray(model.encode(queries, batch_size=32), dtype="float32")
+    start = time.perf_counter()
+    index.search(query_vecs, k)
+    search_ms = (time.perf_counter() - start) * 1000 / len(queries)
+    return index, query_vecs, build_s, size_mb, search_ms
+
+def main():
+    from scripts.ingest.ingest_combined_jsonl_to_faiss import build_metadata, load_jsonl
+    from scripts.utils.embedders import DEFAULT_MODEL, load_embedder
+
+    parser = argparse.ArgumentParser(description="Report the effect of near-duplicate collapsing on the FAISS index")
+    parser.add_argument("--input", default="data/embeddings/combined_cybersecurity_knowledge_base.jsonl", help="Knowledge base JSONL")
+    parser.add_argument("--model", default=DEFAULT_MODEL, help="SentenceTransformer model to embed with")
+    parser.add_argument("--threshold", type=float, default=0.8, help="Estimated Jaccard similarity for near-duplicates")
+    parser.add_argument("--num-perm", type=int, default=128, help="MinHash permutations")
+    parser.add_argument("--k", type=int, default=5, help="Top-k used for the diversity measure")
+    args = parser.parse_args()
+
+    metadata = build_metadata(load_jsonl(args.input))
+    texts = [entry["text"] for entry in metadata]
+
+    start = time.perf_counter()
+    clusters = cluster_near_duplicates(texts, args.threshold, args.num_perm)
+    dedup_s = time.perf_counter() - start
+    cluster_of = {i: c for c, members in enumerate(clusters) for i in members}
+    representatives = [members[0] for members in clusters]
+    largest = max(len(members) for members in clusters)
+    print(f":: {len(texts)} entries -> {len(clusters)} clusters (largest {largest}) in {dedup_s:.2f}s")
+
+    # Queries are entry titles without their ID prefix, as in rerank.py's known-item evaluation
+    queries = [entry["title"].split(": ", 1)[-1] for entry in metadata]
+    model = load_embedder(args.model)
+
+    rows = []
+    for name, subset in (("all entries", list(range(len(texts)))), ("deduplicated", representatives)):
+        index, query_vecs, build_s, size_mb, search_ms = build_and_measure(model, [texts[i] for i in subset], args.k, queries)
+        subset_clusters = [cluster_of[i] for i in subset]
+        diversity = diversity_at_k(index, query_vecs, subset_clusters, args.k)
+        rows.append((name, index.ntotal, size_mb, build_s, search_ms, diversity))
+
+    print(f"\n   {'index':<14}{'vectors':>9}{'size MB':>10}{'build s':>10}{'search ms':>11}{f'diverse@{args.k}':>12}")
+    for name, count, size_mb, build_s, search_ms, diversity in rows:
+        print(f"   {name:<14}{count:>9}{size_mb:>10.2f}{build_s:>10.2f}{search_ms:>11.3f}{diversity:>12.3f}")
+
+if __name__ == "__main__":
+    main()
@@ -6,48 +6,27 @@
 # into a FAISS index and metadata pickle file for fast vector similarity search.
 # License: MIT
 
+import argparse
 import os
 import json
 import faiss
 import pickle
 from tqdm import tqdm
-from sentence_transformers import SentenceTransformer
+
+from scripts.ingest.dedup import cluster_near_duplicates, collapse
+from scripts.utils.context_blocks import add_context_blocks
+from scripts.utils.embedders import BACKENDS, DEFAULT_MODEL, MODEL_REGISTRY, load_embedder, resolve_model, write_index_info
+from scripts.utils.metrics import add_metrics_arguments, snapshot, start_exporters, timed, write_json
+from scripts.utils.snapshots import SNAPSHOT_ROOT, publish_snapshot
+from scripts.utils.tuning import add_tuning_arguments, apply_tuning
 
 # Load all JSONL lines into memory as a list of dictionaries
 def load_jsonl(path):
     with open(path, "r", encoding="utf-8") as f:
         return [json.loads(line) for line in f]
 
-# Create and populate a flat FAISS index from dense vectors
-def build_faiss_index(embeddings):
-    dim = embeddings[0].shape[0]
-    index = faiss.IndexFlatL2(dim)
-    index.add(embeddings)
-    return index
-
-def main():
-    jsonl_path = "data/embeddings/combined_cybersecurity_knowledge_base.jsonl"
-    index_path = "data/embeddings/combined_faiss.index"
-    metadata_path = "data/embeddings/combined_metadata.pkl"
-
-    print(f":: Loading JSONL from {jsonl_path}")
-    entries = load_jsonl(jsonl_path)
-
-    print(":: Initializing embedding model ...")
-    model = SentenceTransformer("all-mpnet-base-v2")
-
-    print(":: Encoding entries into dense vectors ...")
-    texts = [entry["text"] for entry in entries]
-    embeddings = model.encode(texts, show_progress_bar=True)
-
-    print(":: Building FAISS index ...")
-    index = build_faiss_index(embeddings)
-
-    print(":: Saving FAISS index and metadata ...")
-    os.makedirs(os.path.dirname(index_path), exist_ok=True)
-    faiss.write_index(index, index_path)
-
-    # Build structured metadata for fast retrieval and display
+# Build structured metadata for fast retrieval and display
+def build_metadata(entries):
     metadata = []
     for entry in entries:
         entry_id = entry.get("id") or entry.get("cwe_id") or entry.get("vuln_id") or "N/A"
@@ -69,13 +48,93 @@ def main():
             "source": source,
             "text": entry.get("text", "")
         })
+    return metadata
 
-    with open(metadata_path, "wb") as f:
+# Create and populate a flat FAISS index from dense vectors
+def build_faiss_index(embeddings):
+    dim = embeddings[0].shape[0]
+    index = faiss.IndexFlatL2(dim)
+    index.add(embeddings)
+    return index
+
+def main():
+    parser = argparse.ArgumentParser(description="Embed the combined JSONL knowledge base into a FAISS index")
+    parser.add_argument("--model", default=DEFAULT_MODEL, help=f"Embedding model or registry alias ({', '.join(MODEL_REGISTRY)})")
+    parser.add_argument("--backend", choices=BACKENDS, default="torch", help="Embedding backend")
+    parser.add_argument("--quantize", action="store_true", help="Use the int8-quantized ONNX model")
+    parser.add_argument("--threads", type=int, default=None, help="Embedder intra-op threads")
+    parser.add_argument("--dedup", action="store_true", help="Embed one representative per near-duplicate cluster")
+    parser.add_argument("--dedup-threshold", type=float, default=0.8, help="Estimated Jaccard similarity for near-duplicates")
+    parser.add_argument("--snapshots", default=SNAPSHOT_ROOT, help="Versioned snapshot directory (query processes hot-swap to new snapshots)")
+    parser.add_argument("--no-activate", action="store_true", help="Publish the snapshot without pointing CURRENT at it")
+    add_tuning_arguments(parser)
+    add_metrics_arguments(parser, trace=False)
+    args = parser.parse_args()
+    apply_tuning(args, "throughput")
+    start_exporters(args)
+
+    jsonl_path = "data/embeddings/combined_cybersecurity_knowledge_base.jsonl"
+    index_path = "data/embeddings/combined_faiss.index"
+    metadata_path = "data/embeddings/combined_metadata.pkl"
+
+    print(f":: Loading JSONL from {jsonl_path}")
+    with timed("load_jsonl"):
+        entries = load_jsonl(jsonl_path)
+
+    metadata = build_metadata(entries)
+    if args.dedup:
+        print(f":: Collapsing near-duplicates (Jaccard >= {args.dedup_threshold}) ...")
+        with timed("dedup"):
+            clusters = cluster_near_duplicates([entry["text"] for entry in metadata], args.dedup_threshold)
+            metadata = collapse(metadata, clusters)
+        print(f"   └── {len(entries)} entries -> {len(metadata)} representatives")
+
+    # Prompt-ready context blocks depend only on the entry, so they are formatted once here
+    with timed("context_blocks"):
+        add_context_blocks(metadata)
+
+    model_name = resolve_model(args.model)
+    print(":: Initializing embedding model ...")
+    with timed("load_model"):
+        model = load_embedder(model_name, args.backend, args.quantize, args.threads)
+
+    print(":: Encoding entries into dense vectors ...")
+    texts = [entry["text"] for entry in metadata]
+    with timed("encode"):
+        embeddings = model.encode(texts, batch_size=args.batch_size or 32, show_progress_bar=True)
+
+    print(":: Building FAISS index ...")
+    with timed("build_index"):
+        index = build_faiss_index(embeddings)
+
+    print(":: Saving FAISS index and metadata ...")
+    os.makedirs(os.path.dirname(index_path), exist_ok=True)
+    with timed("write_index"):
+        faiss.write_index(index, index_path)
+        write_index_info(index_path, model_name, index.d, backend=args.backend, quantized=args.quantize)
+
+    with timed("write_metadata"), open(metadata_path, "wb") as f:
         pickle.dump(metadata, f)
 
+    # Immutable versioned copy; running query processes switch over once CURRENT points at it
+    with timed("publish_snapshot"):
+        snapshot_name = publish_snapshot(
+            index, metadata, model_name, args.snapshots,
+            extra={"backend": args.backend, "quantized": args.quantize, "source": jsonl_path,
+                   "dedup_threshold": args.dedup_threshold if args.dedup else None, "source_entries": len(entries)},
+            activate=not args.no_activate,
+        )
+
     print(f":: FAISS index saved to: {index_path}")
     print(f":: Metadata saved to:   {metadata_path}")
-    print(f":: Total entries indexed: {len(metadata)}")
+    print(f":: Snapshot published:  {snapshot_name}{'' if args.no_activate else ' (CURRENT)'}")
+    print(f":: Total entries indexed: {len(metadata)} with {model_name} ({index.d}-d)")
+
+    print(":: Stage timings")
+    for stage, timing in snapshot().items():
+        print(f"   ├── {stage:<16} {timing['sum_ms'] / 1000:>8.2f} s")
+    if args.metrics_json:
+        write_json(args.metrics_json)
 
 if __name__ == "__main__":
     main()
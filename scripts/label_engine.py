@@ -0,0 +1,182 @@
+# Author: Sean Sjahrial
+# Title: Cybersecurity RAG Assistant – Fused Labelling Engine
+# Description: Labels pentest report paragraphs with keyword rules and the TF-IDF classifier in one pass.
+# GitHub: https://github.com/isnakie
+# License: MIT
+
+# ------------------------------------------------------------------------------
+# suggest_labels.py (keyword rules) and predict.py (TF-IDF + LinearSVC) used to be
+# run separately over the same report and merged by hand. This engine lowercases
+# each paragraph once for a single-pass keyword automaton, vectorizes the whole
+# batch once for the classifier, and combines both votes with a configurable
+# policy into one merged label set per paragraph.
+# ------------------------------------------------------------------------------
+
+"""
+Usage:
+
+Label a raw report (paragraphs extracted as in suggest_labels.py)
+> python scripts/label_engine.py data/raw/tinder-report.txt logs/tinder-report_fused.csv
+
+Label an existing CSV with a text column, trusting the classifier first
+> python scripts/label_engine.py data/processed/test.csv logs/test_fused.csv --policy classifier_first
+"""
+
+import argparse
+import re
+import time
+from pathlib import Path
+
+import pandas as pd
+
+from predict import CALIBRATED_MODEL_PATH, calibrated, predict_topk
+from suggest_labels import LABEL_KEYWORDS, NAME_RE, extract_paragraphs
+
+BACKGROUND = "Background Information"
+UNKNOWN = "Unknown"
+
+# rules_first:      keyword label when one fires, classifier otherwise
+# classifier_first: classifier label unless it abstains, keyword label otherwise
+# union:            every label either source voted for
+# consensus:        a label only when both sources agree, otherwise flag for review
+POLICIES = ("rules_first", "classifier_first", "union", "consensus")
+
+# Policies that trust the classifier's abstention, which only means something with calibrated probabilities
+CALIBRATED_POLICIES = ("classifier_first", "consensus")
+
+# --- Compile every keyword into one alternation, scanned once per paragraph ---
+def build_keyword_automaton(label_keywords=LABEL_KEYWORDS):
+    label_order = {label: i for i, label in enumerate(label_keywords)}
+    keyword_labels = {}
+    for label, keywords in label_keywords.items():
+        for keyword in keywords:
+            keyword_labels.setdefault(keyword, set()).add(label)
+
+    # Longest-first so each position reports its longest hit; shorter keywords that are
+    # prefixes of that hit start at the same position, so their labels are folded in here
+    keywords = sorted(keyword_labels, key=len, reverse=True)
+    hit_labels = {
+        keyword: set().union(*(keyword_labels[k] for k in keywords if keyword.startswith(k)))
+        for keyword in keywords
+    }
+    pattern = re.compile("(?=(" + "|".join(map(re.escape, keywords)) + "))")
+    return pattern, hit_labels, label_order
+
+# --- Same decision as suggest_label, from a single scan of the lowered text ---
+def rule_label(paragraph, para_lower, automaton):
+    pattern, hit_labels, label_order = automaton
+    matched = set()
+    for hit in pattern.finditer(para_lower):
+        matched |= hit_labels[hit.group(1)]
+
+    specific = matched - {BACKGROUND}
+    if specific:
+        return min(specific, key=label_order.get)
+    if BACKGROUND in matched or NAME_RE.search(paragraph):
+        return BACKGROUND
+    return UNKNOWN
+
+# --- Classifier labels are coarse families of the keyword labels ("Exploitation" vs "Exploitation - ...") ---
+def normalize_label(label):
+    return re.sub(r"\s*-\s*", "-", label).lower()
+
+def labels_agree(rule, clf):
+    return normalize_label(rule).startswith(normalize_label(clf))
+
+def merge_votes(rule, clf, policy):
+    """Return (merged labels, needs_review) for one paragraph."""
+    rule_fired = rule != UNKNOWN
+
+    if policy == "rules_first":
+        if rule_fired:
+            return [rule], False
+        return ([clf], False) if clf else ([], True)
+
+    if policy == "classifier_first":
+        if clf:
+            return [clf], False
+        return ([rule], False) if rule_fired else ([], True)
+
+    if policy == "union":
+        labels = [label for label in (rule if rule_fired else None, clf) if label]
+        if len(labels) == 2 and labels_agree(rule, clf):
+            labels = [rule]
+        return labels, not labels
+
+    if policy == "consensus":
+        if rule_fired and clf and labels_agree(rule, clf):
+            return [rule], False
+        return [], True
+
+    raise ValueError(f"Unknown policy: {policy}")
+
+def label_batch(df, policy="rules_first", top_k=3, threshold=0.35, automaton=None):
+    """
+    Label a DataFrame with a text column (and optional pre-assigned Formatting labels). Returns the input
+    columns with the rule/classifier votes and merged labels added after them.
+    """
+    automaton = automaton or build_keyword_automaton()
+    texts = df["text"].astype(str).tolist()
+
+    # Classifier: one vectorize + predict_proba call for the whole batch
+    predictions = predict_topk(texts, top_k, threshold)
+
+    rows = []
+    for i, text in enumerate(texts):
+        preset = df["label"].iloc[i] if "label" in df else None
+        if preset == "Formatting":
+            rule = "Formatting"
+        else:
+            rule = rule_label(text, text.lower(), automaton)
+
+        pred = predictions[i]
+        clf = pred["label"]
+        labels, review = merge_votes(rule, clf, policy)
+        rows.append({
+            "rule_label": rule,
+            "classifier_label": clf,
+            "classifier_confidence": pred["top_k"][0][1],
+            "classifier_top_k": "; ".join(f"{label} ({prob:.2f})" for label, prob in pred["top_k"]),
+            "labels": "; ".join(labels),
+            "needs_review": review,
+        })
+    votes = pd.DataFrame(rows)
+    # Re-labelling a previous output replaces its vote columns instead of duplicating them
+    kept = df.drop(columns=votes.columns, errors="ignore").reset_index(drop=True)
+    return pd.concat([kept, votes], axis=1)
+
+def main():
+    parser = argparse.ArgumentParser(description="Fused keyword-rule + classifier labelling")
+    parser.add_argument("input", help="Report .txt or CSV with a text column")
+    parser.add_argument("output_csv", help="Path to save the merged labels")
+    parser.add_argument("--policy", choices=POLICIES, default="rules_first", help="How to combine the two votes")
+    parser.add_argument("--top-k", type=int, default=3, help="Classifier labels kept per paragraph")
+    parser.add_argument("--threshold", type=float, default=0.35, help="Classifier abstains below this probability")
+    args = parser.parse_args()
+
+    if not calibrated:
+        if args.policy in CALIBRATED_POLICIES:
+            parser.error(f"--policy {args.policy} needs calibrated probabilities but {CALIBRATED_MODEL_PATH} "
+                         "is missing (run train_baseline_model.py)")
+        print(f":: !! {CALIBRATED_MODEL_PATH} not found: the classifier never abstains, every paragraph gets its top label")
+
+    automaton = build_keyword_automaton()
+
+    start = time.perf_counter()
+    if args.input.endswith(".csv"):
+        df = pd.read_csv(args.input)
+    else:
+        df = extract_paragraphs(args.input, labeler=None)
+    result = label_batch(df, args.policy, args.top_k, args.threshold, automaton)
+    elapsed = time.perf_counter() - start
+
+    Path(args.output_csv).parent.mkdir(parents=True, exist_ok=True)
+    result.to_csv(args.output_csv, index=False)
+
+    print(f":: Labelled {len(result)} paragraphs with policy '{args.policy}'")
+    print(f":: {int(result['needs_review'].sum())} paragraphs flagged for review")
+    print(f":: Throughput: {len(result) / elapsed:,.0f} paragraphs/s ({elapsed:.3f}s total)")
+    print(f"Labeled data saved to {args.output_csv}")
+
+if __name__ == "__main__":
+    main()
@@ -8,16 +8,69 @@
 # This CLI tool is part of the legacy supervised learning branch of the project.
 # It loads a TF-IDF vectorizer and LinearSVC model to predict the most likely
 # attack phase or label given a raw input sentence from a penetration test report.
+# With --top-k it also returns calibrated probabilities and flags low-confidence
+# paragraphs (below --threshold) as abstentions that should go to human review.
+# The calibrated copy is fitted from the saved training matrices on first use.
 # ------------------------------------------------------------------------------
 
-import joblib
+"""
+Usage:
+
+Single snippet
+> python scripts/predict.py "The attacker used PowerShell to disable antivirus."
+
+Top-3 labels with calibrated probabilities and an abstain threshold
+> python scripts/predict.py "The attacker used PowerShell to disable antivirus." --top-k 3 --threshold 0.4
+
+Whole CSV in one batch, with per-batch latency
+> python scripts/predict.py --input-csv data/processed/test.csv --output-csv logs/predictions.csv --top-k 3
+"""
+
+import argparse
 import json
+import os
 import sys
-from sklearn.feature_extraction.text import TfidfVectorizer
+import time
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.calibration import CalibratedClassifierCV
+from sklearn.svm import LinearSVC
+
+MODEL_PATH = "models/LinearSVC_model.pkl"
+CALIBRATED_MODEL_PATH = "models/LinearSVC_calibrated.pkl"
+VECTORIZER_PATH = "models/tfidf_vectorizer.pkl"
+X_TRAIN_PATH = "data/processed/X_train.pkl"
+Y_TRAIN_PATH = "data/processed/y_train.pkl"
 
 # --- Load trained model and vectorizer ---
-model = joblib.load("models/LinearSVC_model.pkl")
-vectorizer = joblib.load("models/tfidf_vectorizer.pkl")
+model = joblib.load(MODEL_PATH)
+vectorizer = joblib.load(VECTORIZER_PATH)
+
+# --- Calibrate a copy of the model on the saved training matrices (same settings as train_baseline_model.py) ---
+def fit_calibrated_model():
+    if not (os.path.exists(X_TRAIN_PATH) and os.path.exists(Y_TRAIN_PATH)):
+        return None
+    X_train = joblib.load(X_TRAIN_PATH)
+    if X_train.shape[1] != len(vectorizer.vocabulary_):
+        return None  # matrices were built with another vectorizer
+    calibrated_model = CalibratedClassifierCV(LinearSVC(class_weight="balanced"), method="sigmoid", cv=3)
+    calibrated_model.fit(X_train, joblib.load(Y_TRAIN_PATH))
+    joblib.dump(calibrated_model, CALIBRATED_MODEL_PATH)
+    print(f":: Calibrated model saved to {CALIBRATED_MODEL_PATH}")
+    return calibrated_model
+
+# --- Probability model: the model itself if it has predict_proba, else its calibrated copy (fitted on first use) ---
+if hasattr(model, "predict_proba"):
+    proba_model = model
+elif os.path.exists(CALIBRATED_MODEL_PATH):
+    proba_model = joblib.load(CALIBRATED_MODEL_PATH)
+else:
+    proba_model = fit_calibrated_model()
+
+# --- Without calibrated probabilities the threshold has no meaning, so nothing abstains ---
+calibrated = proba_model is not None
 
 # --- Load label mapping ---
 with open("models/label_map.json") as f:
@@ -32,12 +85,98 @@ def predict(text):
     prediction = model.predict(X)[0]
     return prediction
 
-if __name__ == "__main__":
-    if len(sys.argv) < 2:
+def predict_proba_batch(X):
+    """Return (classes, probability matrix) for an already-vectorized batch."""
+    if proba_model is not None:
+        return proba_model.classes_, proba_model.predict_proba(X)
+
+    # Uncalibrated fallback: softmax over the SVM margins keeps the ranking but not the scale
+    scores = model.decision_function(X)
+    scores = np.exp(scores - scores.max(axis=1, keepdims=True))
+    return model.classes_, scores / scores.sum(axis=1, keepdims=True)
+
+def predict_topk(texts, k=3, threshold=0.35):
+    """
+    Return the top-k (label, probability) pairs for each text and whether it should abstain.
+    Abstention needs calibrated probabilities; with the softmax fallback every text gets its top label.
+    """
+    classes, proba = predict_proba_batch(vectorizer.transform(texts))
+
+    k = min(k, proba.shape[1])
+    top_idx = np.argsort(-proba, axis=1)[:, :k]
+    top_proba = np.take_along_axis(proba, top_idx, axis=1)
+    top_labels = classes[top_idx]
+    abstain = top_proba[:, 0] < threshold if calibrated else np.zeros(len(texts), dtype=bool)
+
+    return [
+        {
+            "label": None if abstain[i] else top_labels[i, 0],
+            "top_k": list(zip(top_labels[i].tolist(), top_proba[i].round(4).tolist())),
+            "abstain": bool(abstain[i]),
+        }
+        for i in range(len(texts))
+    ]
+
+# --- Time plain argmax prediction against the top-k/abstain path on the same batch ---
+def measure_batch_latency(texts, k, threshold, repeats=5):
+    timings = {}
+    for name, fn in [
+        ("predict", lambda: model.predict(vectorizer.transform(texts))),
+        ("predict_topk", lambda: predict_topk(texts, k, threshold)),
+    ]:
+        start = time.perf_counter()
+        for _ in range(repeats):
+            fn()
+        timings[name] = (time.perf_counter() - start) / repeats * 1000
+    return timings
+
+def main():
+    parser = argparse.ArgumentParser(description="Predict attack phase labels for pentest report text")
+    parser.add_argument("text", nargs="?", help="Snippet to classify")
+    parser.add_argument("--input-csv", help="CSV with a text column to classify as one batch")
+    parser.add_argument("--output-csv", help="Where to save batch predictions")
+    parser.add_argument("--top-k", type=int, default=0, help="Return the k most likely labels with probabilities")
+    parser.add_argument("--threshold", type=float, default=0.35, help="Abstain when the top probability is below this")
+    args = parser.parse_args()
+
+    if not args.text and not args.input_csv:
         print(":: Missing input text.")
         print("Usage: python predict.py \"The attacker used PowerShell to disable antivirus.\"")
         sys.exit(1)
 
-    input_text = sys.argv[1]
-    pred_label = predict(input_text)
-    print(f"\n:: Predicted label → {pred_label}")
+    if not calibrated and (args.top_k or args.input_csv):
+        print(f":: {CALIBRATED_MODEL_PATH} not found, probabilities are uncalibrated and --threshold is ignored "
+              "(run train_baseline_model.py)")
+
+    if args.text:
+        if not args.top_k:
+            pred_label = predict(args.text)
+            print(f"\n:: Predicted label → {pred_label}")
+            return
+
+        result = predict_topk([args.text], args.top_k, args.threshold)[0]
+        print(f"\n:: Predicted label → {result['label'] or 'ABSTAIN (route to review)'}")
+        for label, prob in result["top_k"]:
+            print(f"   ├── {label:<30} {prob:.4f}")
+        return
+
+    df = pd.read_csv(args.input_csv)
+    texts = df["text"].astype(str).tolist()
+    results = predict_topk(texts, max(args.top_k, 1), args.threshold)
+
+    df["predicted_label"] = [r["label"] for r in results]
+    df["top_k"] = [json.dumps(r["top_k"]) for r in results]
+    df["abstain"] = [r["abstain"] for r in results]
+    print(f":: Classified {len(df)} rows, {int(df['abstain'].sum())} routed to review")
+
+    timings = measure_batch_latency(texts, max(args.top_k, 1), args.threshold)
+    print(f":: Batch latency: predict {timings['predict']:.2f} ms, "
+          f"predict_topk {timings['predict_topk']:.2f} ms "
+          f"(+{timings['predict_topk'] - timings['predict']:.2f} ms for {len(texts)} rows)")
+
+    if args.output_csv:
+        df.to_csv(args.output_csv, index=False)
+        print(f":: Predictions saved to {args.output_csv}")
+
+if __name__ == "__main__":
+    main()
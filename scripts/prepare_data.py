@@ -11,15 +11,26 @@
 # classification alongside retrieval for future hybrid models.
 # ------------------------------------------------------------------------------
 
-import pandas as pd
+"""
+Usage:
+
+Default (whole CSV, single process)
+> python scripts/prepare_data.py
+
+Large label datasets (chunked read, cleaning spread over 4 processes)
+> python scripts/prepare_data.py --input data/processed/Larger_Group_Labels.csv --chunksize 100000 --workers 4
+"""
+
+import argparse
 import re
-from sklearn.model_selection import train_test_split
+from concurrent.futures import ProcessPoolExecutor
 
-print(":: Script started")
+import pandas as pd
+from sklearn.model_selection import train_test_split
 
-# --- Load raw labeled findings ---
-print(":: Loading CSV data ...")
-df = pd.read_csv("data/processed/Larger_Group_Labels.csv")  # Update path if needed
+INPUT_CSV = "data/processed/Larger_Group_Labels.csv"  # Update path if needed
+TRAIN_CSV = "data/processed/train.csv"
+TEST_CSV = "data/processed/test.csv"
 
 # --- Text cleaning ---
 def clean_text(text):
@@ -28,17 +39,74 @@ def clean_text(text):
     text = re.sub(r"\s+", " ", text).strip()  # Normalize whitespace
     return text
 
-df["clean_text"] = df["text"].astype(str).apply(clean_text)
+# --- Batch cleaning: ASCII characters that clean_text strips (neither \w nor \s), as a bytes.translate table ---
+ROW_SEP = "\x00"
+ASCII_PUNCTUATION = bytes(c for c in range(1, 128) if not re.match(r"[\w\s]", chr(c)))
+
+def clean_ascii_batch(texts):
+    # Clean many rows in a handful of C-level passes over one joined string
+    joined = ROW_SEP.join(texts).lower()
+    joined = joined.encode("ascii").translate(None, ASCII_PUNCTUATION).decode("ascii")  # Remove punctuation
+    joined = " ".join(joined.split())                                                    # Normalize whitespace
+    return [text.strip() for text in joined.split(ROW_SEP)]
+
+# --- Column-wise equivalent of .apply(clean_text), falls back per row for non-ASCII text ---
+def clean_text_series(texts):
+    texts = texts.astype(str)
+    fast = texts.map(str.isascii) & ~texts.str.contains(ROW_SEP, regex=False)
+
+    parts = []
+    if fast.any():
+        parts.append(pd.Series(clean_ascii_batch(texts[fast].tolist()), index=texts.index[fast], dtype=object))
+    if not fast.all():
+        parts.append(texts[~fast].apply(clean_text).astype(object))
+    return pd.concat(parts).reindex(texts.index) if parts else texts
+
+def clean_chunk(chunk):
+    chunk["clean_text"] = clean_text_series(chunk["text"])
+    return chunk
+
+# --- Read the CSV (optionally in chunks) and clean each chunk, in parallel if requested ---
+def load_and_clean(path, chunksize=None, workers=1):
+    if not chunksize:
+        return clean_chunk(pd.read_csv(path))
+
+    chunks = pd.read_csv(path, chunksize=chunksize)
+    if workers <= 1:
+        return pd.concat([clean_chunk(chunk) for chunk in chunks], ignore_index=True)
+
+    # Chunks are submitted as they are read, and only the text column crosses the process boundary
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = [(chunk, pool.submit(clean_text_series, chunk["text"])) for chunk in chunks]
+        for chunk, future in pending:
+            chunk["clean_text"] = future.result()
+    return pd.concat([chunk for chunk, _ in pending], ignore_index=True)
+
+def main():
+    parser = argparse.ArgumentParser(description="Clean labeled pentest text and split into train/test")
+    parser.add_argument("--input", default=INPUT_CSV, help="Labeled CSV with text,label columns")
+    parser.add_argument("--chunksize", type=int, default=None, help="Rows per CSV chunk (default: read whole file)")
+    parser.add_argument("--workers", type=int, default=1, help="Processes used to clean chunks")
+    args = parser.parse_args()
+
+    print(":: Script started")
+
+    # --- Load raw labeled findings and clean text ---
+    print(":: Loading CSV data ...")
+    df = load_and_clean(args.input, args.chunksize, args.workers)
+
+    # --- Train/test split ---
+    print(":: Splitting into train/test sets ...")
+    train_df, test_df = train_test_split(df, test_size=0.2, stratify=df["label"], random_state=42)
 
-# --- Train/test split ---
-print(":: Splitting into train/test sets ...")
-train_df, test_df = train_test_split(df, test_size=0.2, stratify=df["label"], random_state=42)
+    # --- Save to disk ---
+    train_df.to_csv(TRAIN_CSV, index=False)
+    test_df.to_csv(TEST_CSV, index=False)
 
-# --- Save to disk ---
-train_df.to_csv("data/processed/train.csv", index=False)
-test_df.to_csv("data/processed/test.csv", index=False)
+    # --- Done ---
+    print(":: ✅ Preprocessing and split complete.")
+    print(f":: Train shape: {train_df.shape}")
+    print(f":: Test shape:  {test_df.shape}")
 
-# --- Done ---
-print(":: ✅ Preprocessing and split complete.")
-print(f":: Train shape: {train_df.shape}")
-print(f":: Test shape:  {test_df.shape}")
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+# Author: Sean Sjahrial
+# Title: Cybersecurity RAG Assistant
+# Description: Part of UC Berkeley MICS Machine Learning Course (2025)
+# GitHub: https://github.com/isnakie
+# Description: Non-interactive batch mode for the query scripts. Questions are read from JSONL/CSV,
+# embedded and searched in bulk chunks, and LLM requests run on a bounded worker pool so retrieval
+# for later chunks overlaps generation for earlier ones. Results are appended to a JSONL file as they
+# complete; that file doubles as the resume file for interrupted runs.
+# License: MIT
+
+"""
+Usage (through the query scripts):
+
+Answer a questionnaire with 4 concurrent LLM requests; re-running the same command resumes
+> python -m scripts.query.query_with_lm_studio --batch data/stig_questions.jsonl --output logs/stig_answers.jsonl --concurrency 4
+
+Retrieval only (no LLM)
+> python -m scripts.query.query_faiss_index --batch data/stig_questions.csv --output logs/stig_hits.jsonl
+
+Input rows need a "question" field (or column); an optional "id" field names each result,
+otherwise the row number is used.
+"""
+
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+import requests
+from tqdm import tqdm
+
+from scripts.query.rerank import two_stage_search_batch
+
+# --- Load questions as (id, question) pairs from JSONL or CSV ---
+def load_questions(path, field="question"):
+    if path.endswith(".csv"):
+        rows = pd.read_csv(path, dtype=str).fillna("").to_dict("records")
+    else:
+        with open(path, "r", encoding="utf-8") as f:
+            rows = [json.loads(line) for line in f if line.strip()]
+
+    questions = []
+    for i, row in enumerate(rows):
+        question = str(row.get(field, "")).strip()
+        if question:
+            questions.append((str(row.get("id") or i), question))
+    return questions
+
+# --- Resume: keep successful records, drop failed ones so they are retried ---
+def load_completed(output_path):
+    if not os.path.exists(output_path):
+        return set()
+
+    kept = []
+    with open(output_path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue  # a line cut short by the interruption
+            if not record.get("error"):
+                kept.append(record)
+
+    tmp_path = f"{output_path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        for record in kept:
+            f.write(json.dumps(record) + "\n")
+    os.replace(tmp_path, output_path)
+    return {record["id"] for record in kept}
+
+def source_summary(hits):
+    return [
+        {"id": entry.get("id", "N/A"), "title": entry.get("title", "N/A"), "source": entry.get("source", "Unknown"), "score": score,
+         "duplicate_ids": entry.get("duplicate_ids", [])}
+        for entry, score in hits
+    ]
+
+def run_batch(questions, output_path, embedder, index, metadata, generate=None, expand=None, reranker=None,
+              k=5, recall_n=50, budget_ms=150.0, chunk_size=64, concurrency=4, resolve=None, batch_size=32):
+    """
+    Answer (id, question) pairs, appending one JSON record per question to output_path as it completes.
+    generate(question, hits, session=...) returns the answer text (None when no context fits) and raises
+    on LLM errors; without it only the retrieved sources are written. resolve(), if given, returns the
+    (embedder, index, metadata) to use for each chunk, so long runs follow index snapshot swaps.
+    """
+    os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+    completed = load_completed(output_path)
+    pending = [(qid, q) for qid, q in questions if qid not in completed]
+    print(f":: {len(questions)} questions, {len(completed)} already answered, {len(pending)} to go")
+    if not pending:
+        return
+
+    write_lock = threading.Lock()
+    errors = 0
+
+    def write(record):
+        nonlocal errors
+        with write_lock:
+            out.write(json.dumps(record) + "\n")
+            out.flush()
+            errors += bool(record.get("error"))
+            progress.update(1)
+
+    # One keep-alive session per worker thread (requests.Session is not shared across threads)
+    sessions = threading.local()
+
+    def answer(record, question, hits):
+        if not hasattr(sessions, "session"):
+            sessions.session = requests.Session()
+        start = time.perf_counter()
+        try:
+            text = generate(question, hits, session=sessions.session)
+            record["answer"] = text if text is not None else ":: No usable entries found."
+            record["error"] = None
+        except Exception as e:
+            record["answer"] = None
+            record["error"] = str(e)
+        record["llm_ms"] = (time.perf_counter() - start) * 1000
+        write(record)
+
+    # At most `concurrency` requests run and as many wait; past that the retrieval loop blocks
+    slots = threading.BoundedSemaphore(concurrency * 2)
+    start = time.perf_counter()
+    # Output file and progress bar are closed even if retrieval or embedding raises part-way
+    with open(output_path, "a", encoding="utf-8") as out, tqdm(total=len(pending), desc="Questions") as progress, \
+            ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for c in range(0, len(pending), chunk_size):
+            chunk = pending[c:c + chunk_size]
+            search_questions = [expand(q) if expand else q for _, q in chunk]
+            if resolve:
+                embedder, index, metadata = resolve()
+            results = two_stage_search_batch(
+                search_questions, embedder, index, metadata, reranker, k, recall_n, budget_ms, batch_size
+            )
+
+            for (qid, question), search_question, (hits, stats) in zip(chunk, search_questions, results):
+                record = {"id": qid, "question": question, "sources": source_summary(hits),
+                          "retrieval_ms": stats["embed_ms"] + stats["ann_ms"] + stats["rerank_ms"]}
+                if generate is None:
+                    write(record)
+                    continue
+
+                slots.acquire()
+                future = pool.submit(answer, record, search_question, hits)
+                future.add_done_callback(lambda _: slots.release())
+
+    elapsed = time.perf_counter() - start
+    print(f":: Wrote {len(pending)} results to {output_path} in {elapsed:.1f}s "
+          f"({len(pending) / elapsed:.2f} questions/s, {errors} errors)")
+    if errors:
+        print(":: Re-run the same command to retry the failed questions")
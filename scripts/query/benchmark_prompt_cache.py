@@ -0,0 +1,164 @@
+# Author: Sean Sjahrial
+# Title: Cybersecurity RAG Assistant
+# Description: Part of UC Berkeley MICS Machine Learning Course (2025)
+# GitHub: https://github.com/isnakie
+# Description: Measures prompt prefill and time-to-first-token for the old question-first prompt, the
+# stable system/context/question layout, and a warm session over chains of follow-up questions. Runs
+# against the bundled mock LLM server (prefix cache simulated) or any OpenAI-compatible --url.
+# License: MIT
+
+"""
+Usage:
+
+Against the stand-in server (started in-process)
+> python -m scripts.query.benchmark_prompt_cache
+
+Against LM Studio / llama.cpp with its prompt cache enabled
+> python -m scripts.query.benchmark_prompt_cache --url http://localhost:1234/v1/chat/completions
+"""
+
+import argparse
+import json
+import pickle
+import time
+
+import numpy as np
+import requests
+
+from scripts.query.mock_llm_server import PrefixCache, add_server_arguments, start_server
+from scripts.query.query_with_lm_studio import (
+    INDEX_PATH, METADATA_PATH, MODEL_NAME, SYSTEM_PROMPT, WarmSession, build_messages, expand_question
+)
+from scripts.query.rerank import two_stage_search
+from scripts.utils.context_blocks import clean_text
+from scripts.utils.embedders import EmbedderCache, index_model
+from scripts.utils.index_io import load_index
+
+# Each chain is one conversation: a question followed by follow-ups
+DEFAULT_CHAINS = [
+    ["How should passwords be stored?", "What minimum password length is required?", "How often must passwords be changed?"],
+    ["How is SQL injection prevented?", "Is input validation enough on its own?", "Do parameterized queries fix it?"],
+    ["What audit logging is required?", "How long must audit records be kept?", "Who may delete audit logs?"],
+    ["How should session tokens be protected?", "When should sessions time out?", "What about concurrent sessions?"],
+]
+
+def question_first_messages(user_question, hits, max_context_chars=3500):
+    """The previous layout: one user message with the question before the context, in rank order."""
+    blocks, total_chars = [], 0
+    for entry, _ in hits:
+        block = f"[{entry.get('source', 'Unknown')}] {entry.get('id', 'N/A')} - {entry.get('title', 'Untitled')}\n  {clean_text(entry.get('text', ''))}"
+        if total_chars + len(block) > max_context_chars:
+            break
+        blocks.append(block)
+        total_chars += len(block)
+    if not blocks:
+        return None
+    context = "\n\n====\n\n".join(blocks)
+    return [{"role": "user", "content": f"{SYSTEM_PROMPT}\n\nUser Question: {user_question}\n\nContext:\n{context}\n\nAnswer:"}]
+
+def stream_completion(url, messages, session):
+    """Stream one completion; returns (ttft_ms, total_ms, answer, usage, server timings)."""
+    start = time.perf_counter()
+    response = session.post(url, json={
+        "model": MODEL_NAME, "messages": messages, "temperature": 0.5,
+        "stream": True, "stream_options": {"include_usage": True},
+    }, stream=True)
+    response.raise_for_status()
+
+    ttft_ms, parts, usage, timings = None, [], {}, {}
+    for line in response.iter_lines(decode_unicode=True):
+        if not line or not line.startswith("data: "):
+            continue
+        payload = line[len("data: "):]
+        if payload == "[DONE]":
+            break
+        chunk = json.loads(payload)
+        usage = chunk.get("usage") or usage
+        timings = chunk.get("timings") or timings
+        for choice in chunk.get("choices", []):
+            content = choice.get("delta", {}).get("content")
+            if content:
+                if ttft_ms is None:
+                    ttft_ms = (time.perf_counter() - start) * 1000
+                parts.append(content)
+    return ttft_ms, (time.perf_counter() - start) * 1000, "".join(parts), usage, timings
+
+def run_layout(layout, chains, retrieved, url, session, max_context_chars):
+    rows = []
+    for c, chain in enumerate(chains):
+        chat = WarmSession() if layout == "warm session" else None
+        for q, question in enumerate(chain):
+            hits = retrieved[c][q]
+            if layout == "question-first":
+                messages = question_first_messages(question, hits, max_context_chars)
+            elif chat:
+                messages = chat.prepare(question, hits, max_context_chars)
+            else:
+                messages = build_messages(question, hits, max_context_chars)
+            if messages is None:
+                continue
+
+            ttft_ms, total_ms, answer, usage, timings = stream_completion(url, messages, session)
+            if chat:
+                chat.record(answer)
+            rows.append({
+                "follow_up": q > 0,
+                "prompt_tokens": usage.get("prompt_tokens", 0),
+                "cached_tokens": usage.get("prompt_tokens_details", {}).get("cached_tokens", 0),
+                "prefill_ms": timings.get("prefill_ms", float("nan")),
+                "ttft_ms": ttft_ms,
+                "total_ms": total_ms,
+            })
+    return rows
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure prefill / TTFT for the prompt layouts")
+    parser.add_argument("--url", default=None, help="OpenAI-compatible chat endpoint (default: in-process mock server)")
+    parser.add_argument("--port", type=int, default=1235, help="Port for the in-process mock server")
+    parser.add_argument("--chains", default=None, help="JSON file with a list of question chains (default: built-in)")
+    parser.add_argument("--index", default=INDEX_PATH, help="Path to FAISS index")
+    parser.add_argument("--metadata", default=METADATA_PATH, help="Path to metadata pickle")
+    parser.add_argument("--max-context-chars", type=int, default=3500)
+    add_server_arguments(parser)
+    args = parser.parse_args()
+
+    chains = DEFAULT_CHAINS
+    if args.chains:
+        with open(args.chains) as f:
+            chains = json.load(f)
+
+    index = load_index(args.index)
+    with open(args.metadata, "rb") as f:
+        metadata = pickle.load(f)
+    embedder = EmbedderCache().get(index_model(args.index))
+    # Same retrieved entries for every layout, so only the prompt layout differs
+    retrieved = [[two_stage_search(expand_question(q), embedder, index, metadata)[0] for q in chain] for chain in chains]
+
+    server = None
+    url = args.url
+    if url is None:
+        server = start_server(args, port=args.port)
+        url = f"http://127.0.0.1:{args.port}/v1/chat/completions"
+        print(f":: Mock LLM: prefill {args.prefill_ms_per_token} ms/token, {args.tokens_per_s} tokens/s, "
+              f"{args.cache_slots} cache slots")
+
+    session = requests.Session()
+    print(f"\n   {'layout':<16}{'questions':<11}{'prompt tok':>11}{'cached %':>10}{'prefill ms':>12}{'TTFT p50':>10}{'TTFT mean':>11}")
+    for layout in ("question-first", "stable", "warm session"):
+        if server:
+            server.cache = PrefixCache(args.cache_slots)  # every layout starts from a cold cache
+        rows = run_layout(layout, chains, retrieved, url, session, args.max_context_chars)
+        for label, subset in (("first", [r for r in rows if not r["follow_up"]]), ("follow-up", [r for r in rows if r["follow_up"]])):
+            if not subset:
+                continue
+            prompt = np.mean([r["prompt_tokens"] for r in subset])
+            cached = 100 * sum(r["cached_tokens"] for r in subset) / max(sum(r["prompt_tokens"] for r in subset), 1)
+            ttft = [r["ttft_ms"] for r in subset]
+            print(f"   {layout:<16}{label:<11}{prompt:>11.0f}{cached:>10.1f}{np.mean([r['prefill_ms'] for r in subset]):>12.1f}"
+                  f"{np.percentile(ttft, 50):>10.1f}{np.mean(ttft):>11.1f}")
+
+    if server:
+        server.shutdown()
+
+if __name__ == "__main__":
+    main()
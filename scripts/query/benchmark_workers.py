@@ -0,0 +1,91 @@
+# Author: Sean Sjahrial
+# Title: Cybersecurity RAG Assistant
+# Description: Part of UC Berkeley MICS Machine Learning Course (2025)
+# GitHub: https://github.com/isnakie
+# Description: Starts serve.py with 1, 4 and 16 workers and reports warm-up time and total memory for a
+# heap-loaded vs memory-mapped index, each with workers loading after fork ("own") and with the parent
+# preloading before fork ("pre-fork"). RSS counts shared pages once per process; PSS splits each shared
+# page between the processes mapping it, so the PSS total is the real footprint. Linux only (/proc).
+# License: MIT
+
+"""
+Usage:
+> python -m scripts.query.benchmark_workers --workers 1 4 16
+> python -m scripts.query.benchmark_workers --workers 1 4 --index data/embeddings/combined_faiss.index
+"""
+
+import argparse
+import json
+import subprocess
+import sys
+import time
+import urllib.request
+from pathlib import Path
+
+SERVE = "scripts.query.serve"
+
+def proc_tree(pid):
+    pids = [pid]
+    for child in Path(f"/proc/{pid}/task/{pid}/children").read_text().split():
+        pids.append(int(child))
+    return pids
+
+def memory_mb(pids):
+    rss = pss = 0
+    for pid in pids:
+        for line in Path(f"/proc/{pid}/smaps_rollup").read_text().splitlines():
+            if line.startswith("Rss:"):
+                rss += int(line.split()[1])
+            elif line.startswith("Pss:"):
+                pss += int(line.split()[1])
+    return rss / 1024, pss / 1024
+
+MODES = {
+    "heap, own": ["--no-preload"],
+    "mmap, own": ["--no-preload", "--mmap"],
+    "heap, pre-fork": [],
+    "mmap, pre-fork": ["--mmap"],
+}
+
+def run(workers, mode_args, port, extra_args):
+    cmd = [sys.executable, "-m", SERVE, "--workers", str(workers), "--port", str(port)] + mode_args + extra_args
+    start = time.perf_counter()
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, text=True)
+    try:
+        for line in proc.stdout:
+            if "workers ready" in line:
+                break
+        else:
+            raise RuntimeError(f"serve.py exited before becoming ready: {' '.join(cmd)}")
+        warmup_s = time.perf_counter() - start
+
+        request = urllib.request.Request(
+            f"http://127.0.0.1:{port}/search", data=json.dumps({"query": "password policy", "k": 5}).encode()
+        )
+        latencies = []
+        for _ in range(20):
+            t = time.perf_counter()
+            urllib.request.urlopen(request).read()
+            latencies.append((time.perf_counter() - t) * 1000)
+
+        rss, pss = memory_mb(proc_tree(proc.pid))
+        return warmup_s, rss, pss, sorted(latencies)[len(latencies) // 2]
+    finally:
+        proc.terminate()
+        proc.wait()
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure memory and warm-up of serve.py across worker counts")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4, 16], help="Worker counts to try")
+    parser.add_argument("--modes", nargs="+", choices=list(MODES), default=list(MODES), help="Loading modes to compare")
+    parser.add_argument("--port", type=int, default=8765)
+    args, serve_args = parser.parse_known_args()  # anything else is passed through to serve.py
+
+    print(f"   {'mode':<16}{'workers':>8}{'warm-up s':>11}{'RSS MB':>10}{'PSS MB':>10}{'p50 ms':>9}")
+    for workers in args.workers:
+        for mode in args.modes:
+            warmup_s, rss, pss, p50 = run(workers, MODES[mode], args.port, serve_args)
+            print(f"   {mode:<16}{workers:>8}{warmup_s:>11.2f}{rss:>10.0f}{pss:>10.0f}{p50:>9.2f}", flush=True)
+
+if __name__ == "__main__":
+    main()
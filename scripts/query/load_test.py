@@ -0,0 +1,264 @@
+# Author: Sean Sjahrial
+# Title: Cybersecurity RAG Assistant
+# Description: Part of UC Berkeley MICS Machine Learning Course (2025)
+# GitHub: https://github.com/isnakie
+# Description: Load generator for the RAG path of query_with_lm_studio.py. Replays a query mix at increasing
+# concurrency (closed loop) or Poisson arrival rates (open loop) through retrieval and the LLM request, against
+# the bundled mock LLM server or a real LLM_API_URL, and reports throughput, tail latency and error rates per
+# stage at each load level, plus where they saturate.
+# License: MIT
+
+"""
+Usage:
+
+Concurrent analysts (each sends its next question when the previous answer arrives)
+> python -m scripts.query.load_test --concurrency 1 2 4 8 16 --duration 20
+
+Fixed arrival rates in questions/s; latency includes time spent waiting to be served
+> python -m scripts.query.load_test --rates 0.5 1 2 4 --duration 30
+
+Replay a question file against a real LM Studio server
+> python -m scripts.query.load_test --queries data/stig_questions.jsonl --url http://localhost:1234/v1/chat/completions
+"""
+
+import argparse
+import json
+import os
+import pickle
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import requests
+
+import scripts.query.query_with_lm_studio as rag
+from scripts.query.batch_query import load_questions
+from scripts.query.mock_llm_server import add_server_arguments, start_server
+from scripts.query.rerank import DEFAULT_RERANKER, load_reranker, two_stage_search
+from scripts.utils.embedders import EmbedderCache, index_model
+from scripts.utils.index_io import load_index
+
+STAGES = ("retrieval", "llm")
+
+# Default query mix: short and long, MITRE- and STIG-flavoured, with and without CWE IDs
+DEFAULT_QUERIES = [
+    "How should passwords be stored?",
+    "What is CWE-89 and how is it prevented?",
+    "What audit logging is required for privileged actions?",
+    "How long must audit records be retained?",
+    "How should session tokens be protected against fixation and theft?",
+    "What are the requirements for emergency lighting and exits in the server room?",
+    "Explain CWE-79 cross-site scripting and the recommended mitigations for a web application that renders user input",
+    "Which controls apply to removable media?",
+    "What does the STIG require for account lockout after failed logons?",
+    "How is buffer overflow (CWE-120) mitigated?",
+    "What encryption is required for data at rest?",
+    "Who may approve exceptions to the configuration baseline?",
+]
+
+class Recorder:
+    """Per-level samples: stage latencies of successful requests, error counts per stage, drops."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = {stage: [] for stage in STAGES + ("total",)}
+        self.errors = {stage: 0 for stage in STAGES}
+        self.requests = 0
+        self.dropped = 0
+        self.no_context = 0
+
+    def add(self, timings, error_stage=None, no_context=False):
+        with self.lock:
+            self.requests += 1
+            self.no_context += no_context
+            if error_stage:
+                self.errors[error_stage] += 1
+            for stage, ms in timings.items():
+                self.latencies[stage].append(ms)
+
+    def drop(self):
+        with self.lock:
+            self.dropped += 1
+
+def one_request(question, resources, reranker, session, started=None):
+    """Run one question through retrieval and the LLM; returns (stage timings, failed stage or None, no context)."""
+    embedder, index, metadata = resources
+    start = started or time.perf_counter()
+    timings = {}
+
+    t = time.perf_counter()
+    try:
+        hits, _ = two_stage_search(rag.expand_question(question), embedder, index, metadata, reranker)
+    except Exception:
+        return timings, "retrieval", False
+    timings["retrieval"] = (time.perf_counter() - t) * 1000
+
+    t = time.perf_counter()
+    try:
+        answer = rag.generate_answer(question, hits, session=session)
+    except Exception:
+        return timings, "llm", False
+    timings["llm"] = (time.perf_counter() - t) * 1000
+    timings["total"] = (time.perf_counter() - start) * 1000
+    return timings, None, answer is None
+
+def run_closed(concurrency, duration_s, questions, resources, reranker, seed=0):
+    """`concurrency` simulated analysts, each asking its next question as soon as the last one is answered."""
+    recorder = Recorder()
+    deadline = time.perf_counter() + duration_s
+
+    def analyst(worker):
+        rng = np.random.default_rng(seed + worker)
+        session = requests.Session()
+        while time.perf_counter() < deadline:
+            recorder.add(*one_request(questions[rng.integers(len(questions))], resources, reranker, session))
+
+    threads = [threading.Thread(target=analyst, args=(w,)) for w in range(concurrency)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return recorder, time.perf_counter() - start
+
+def run_open(rate, duration_s, questions, resources, reranker, max_in_flight=64, seed=0):
+    """
+    Poisson arrivals at `rate` questions/s. Latency counts from the scheduled arrival, so time spent
+    queued behind slow requests is included; arrivals beyond max_in_flight are dropped and counted.
+    """
+    recorder = Recorder()
+    rng = np.random.default_rng(seed)
+    sessions = threading.local()
+    in_flight = threading.BoundedSemaphore(max_in_flight)
+
+    def handle(question, arrival):
+        if not hasattr(sessions, "session"):
+            sessions.session = requests.Session()
+        try:
+            recorder.add(*one_request(question, resources, reranker, sessions.session, started=arrival))
+        finally:
+            in_flight.release()
+
+    start = time.perf_counter()
+    next_arrival = start
+    with ThreadPoolExecutor(max_workers=max_in_flight) as pool:
+        while True:
+            next_arrival += rng.exponential(1 / rate)
+            if next_arrival - start > duration_s:
+                break
+            time.sleep(max(next_arrival - time.perf_counter(), 0))
+            if not in_flight.acquire(blocking=False):
+                recorder.drop()
+                continue
+            pool.submit(handle, questions[rng.integers(len(questions))], next_arrival)
+    return recorder, time.perf_counter() - start
+
+def summarize(load, recorder, elapsed_s):
+    def pct(stage, q):
+        samples = recorder.latencies[stage]
+        return float(np.percentile(samples, q)) if samples else float("nan")
+
+    attempted = recorder.requests + recorder.dropped
+    return {
+        "load": load,
+        "requests": recorder.requests,
+        "completed": len(recorder.latencies["total"]),
+        "throughput": len(recorder.latencies["total"]) / elapsed_s,
+        **{f"total_p{q}_ms": pct("total", q) for q in (50, 95, 99)},
+        **{f"{stage}_p{q}_ms": pct(stage, q) for stage in STAGES for q in (50, 95, 99)},
+        **{f"{stage}_error_rate": recorder.errors[stage] / max(recorder.requests, 1) for stage in STAGES},
+        "drop_rate": recorder.dropped / max(attempted, 1),
+        "no_context": recorder.no_context,
+    }
+
+def print_row(row, label):
+    print(f"   {label:<10}{row['completed']:>6}{row['throughput']:>8.2f}"
+          f"{row['total_p50_ms']:>9.0f}{row['total_p95_ms']:>9.0f}{row['total_p99_ms']:>9.0f}"
+          f"{row['retrieval_p95_ms']:>10.1f}{row['llm_p95_ms']:>9.0f}"
+          f"{row['retrieval_error_rate']:>9.1%}{row['llm_error_rate']:>8.1%}{row['drop_rate']:>8.1%}", flush=True)
+
+def report_saturation(rows, open_loop):
+    """Where throughput stops growing and tail latency leaves the unloaded baseline."""
+    peak = max(rows, key=lambda r: r["throughput"])
+    print(f"\n:: Peak throughput {peak['throughput']:.2f} questions/s at {'rate' if open_loop else 'concurrency'} {peak['load']}")
+
+    if open_loop:
+        dropping = next((row for row in rows if row["drop_rate"] > 0), None)
+        if dropping:
+            print(f":: Saturated at {dropping['load']}/s: {dropping['drop_rate']:.1%} of arrivals dropped "
+                  "with --max-in-flight requests in progress")
+    for prev, row in zip(rows, rows[1:]):
+        if not open_loop and row["throughput"] < 1.1 * prev["throughput"]:
+            print(f":: Throughput flattens from concurrency {prev['load']} -> {row['load']} "
+                  f"({prev['throughput']:.2f} -> {row['throughput']:.2f}/s); extra load only queues")
+            break
+
+    baseline = rows[0]["total_p99_ms"]
+    for row in rows[1:]:
+        if row["total_p99_ms"] > 2 * baseline:
+            print(f":: p99 latency passes 2x the lightest load ({baseline:.0f} ms) at {row['load']}: {row['total_p99_ms']:.0f} ms")
+            break
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the retrieval + LLM path")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 2, 4, 8, 16], help="Closed-loop concurrency levels")
+    parser.add_argument("--rates", type=float, nargs="+", default=None, help="Open-loop arrival rates (questions/s); overrides --concurrency")
+    parser.add_argument("--duration", type=float, default=20.0, help="Seconds per load level")
+    parser.add_argument("--max-in-flight", type=int, default=64, help="Open loop: concurrent requests before arrivals are dropped")
+    parser.add_argument("--queries", default=None, help="JSONL/CSV query mix (default: built-in mix)")
+    parser.add_argument("--question-field", default="question", help="Field/column holding the question")
+    parser.add_argument("--url", default=None, help="LLM endpoint (default: in-process mock server)")
+    parser.add_argument("--mock-port", type=int, default=1236, help="Port for the in-process mock server")
+    parser.add_argument("--rerank", action="store_true", help="Rerank candidates with a cross-encoder")
+    parser.add_argument("--reranker", default=DEFAULT_RERANKER, help="Cross-encoder model used with --rerank")
+    parser.add_argument("--index", default=rag.INDEX_PATH, help="Path to FAISS index")
+    parser.add_argument("--metadata", default=rag.METADATA_PATH, help="Path to metadata pickle")
+    parser.add_argument("--threads", type=int, default=None, help="Embedder intra-op threads")
+    parser.add_argument("--output", default=None, help="Write the per-level results as JSON")
+    add_server_arguments(parser)
+    args = parser.parse_args()
+
+    questions = [q for _, q in load_questions(args.queries, args.question_field)] if args.queries else DEFAULT_QUERIES
+    index = load_index(args.index)
+    with open(args.metadata, "rb") as f:
+        metadata = pickle.load(f)
+    resources = (EmbedderCache(threads=args.threads).get(index_model(args.index)), index, metadata)
+    reranker = load_reranker(args.reranker) if args.rerank else None
+
+    server = None
+    if args.url:
+        rag.LLM_API_URL = args.url
+    else:
+        server = start_server(args, port=args.mock_port)
+        rag.LLM_API_URL = f"http://127.0.0.1:{args.mock_port}/v1/chat/completions"
+        print(f":: Mock LLM: {args.latency_ms:.0f} ms latency, {args.prefill_ms_per_token} ms/prompt token, "
+              f"{args.tokens_per_s} tokens/s x {args.max_tokens}, {args.parallel} parallel, {args.error_rate:.0%} errors")
+
+    one_request(questions[0], resources, reranker, requests.Session())  # warm-up
+    open_loop = args.rates is not None
+    levels = args.rates if open_loop else args.concurrency
+    print(f":: {len(questions)} questions in the mix, {args.duration:.0f}s per level\n")
+    print(f"   {'rate/s' if open_loop else 'conc.':<10}{'done':>6}{'q/s':>8}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}"
+          f"{'retr p95':>10}{'llm p95':>9}{'retr err':>9}{'llm err':>8}{'dropped':>8}")
+
+    rows = []
+    for level in levels:
+        if open_loop:
+            recorder, elapsed = run_open(level, args.duration, questions, resources, reranker, args.max_in_flight)
+        else:
+            recorder, elapsed = run_closed(level, args.duration, questions, resources, reranker)
+        rows.append(summarize(level, recorder, elapsed))
+        print_row(rows[-1], str(level))
+
+    report_saturation(rows, open_loop)
+    if args.output:
+        os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+        with open(args.output, "w") as f:
+            json.dump({"mode": "open" if open_loop else "closed", "duration_s": args.duration, "levels": rows}, f, indent=4)
+        print(f":: Results written to {args.output}")
+    if server:
+        server.shutdown()
+
+if __name__ == "__main__":
+    main()
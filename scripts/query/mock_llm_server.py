@@ -0,0 +1,196 @@
+# Author: Sean Sjahrial
+# Title: Cybersecurity RAG Assistant
+# Description: Part of UC Berkeley MICS Machine Learning Course (2025)
+# GitHub: https://github.com/isnakie
+# Description: Local stand-in for the LM Studio OpenAI-compatible endpoint (LLM_API_URL). It simulates
+# prompt prefill (per uncached token), a prefix KV cache shared across requests like llama.cpp's slots,
+# and streamed generation at a fixed token rate, with a limited number of parallel generation slots and
+# optional injected errors, so prompt layout and load can be measured without a GPU.
+# License: MIT
+
+"""
+Usage:
+
+Serve on LM Studio's default port
+> python -m scripts.query.mock_llm_server --port 1234 --prefill-ms-per-token 0.5 --tokens-per-s 30
+
+Point the query script at it (LLM_API_URL already defaults to http://localhost:1234/v1/chat/completions)
+> python -m scripts.query.query_with_lm_studio
+"""
+
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+TOKEN_RE = re.compile(r"\w+|[^\w\s]")
+ANSWER_WORDS = ("Based on the provided context the control requires that credentials are stored using a "
+                "salted adaptive hash and that accounts are reviewed regularly by the system administrator").split()
+
+def tokenize(messages):
+    """Rough token stream of the chat template, so identical message prefixes give identical token prefixes."""
+    tokens = []
+    for message in messages:
+        tokens.append(f"<|{message['role']}|>")
+        tokens.extend(TOKEN_RE.findall(message.get("content") or ""))
+        tokens.append("<|end|>")
+    return tokens
+
+def common_prefix(a, b):
+    n = 0
+    for x, y in zip(a, b):
+        if x != y:
+            break
+        n += 1
+    return n
+
+class PrefixCache:
+    """
+    Token sequences (prompt + generated answer) of the last `slots` requests; a new prompt reuses its
+    longest common prefix with any of them, as a follow-up that resends the conversation would.
+    """
+
+    def __init__(self, slots=4):
+        self.slots = slots
+        self.entries = []
+        self.lock = threading.Lock()
+
+    def lookup_and_store(self, tokens, generated=()):
+        with self.lock:
+            if not self.slots:
+                return 0
+            best = max(range(len(self.entries)), key=lambda i: common_prefix(self.entries[i], tokens), default=None)
+            cached = common_prefix(self.entries[best], tokens) if best is not None else 0
+            # Reuse the matched slot (its KV is extended in place), else evict the least recently used
+            if best is not None and cached:
+                self.entries.pop(best)
+            elif len(self.entries) >= self.slots:
+                self.entries.pop(0)
+            self.entries.append(tokens + list(generated))
+            return cached
+
+class MockLLMHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def _json(self, status, body):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if self.path == "/v1/models":
+            self._json(200, {"object": "list", "data": [{"id": self.server.config.model, "object": "model"}]})
+        else:
+            self.send_error(404)
+
+    def do_POST(self):
+        if self.path != "/v1/chat/completions":
+            self.send_error(404)
+            return
+        config = self.server.config
+        request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+        start = time.perf_counter()
+        if random.random() < config.error_rate:
+            self._json(500, {"error": {"message": "mock server: injected error", "type": "server_error"}})
+            return
+
+        # Requests beyond --parallel wait for a free generation slot, as on a real single-GPU server
+        with self.server.slots:
+            queue_ms = (time.perf_counter() - start) * 1000
+            self._complete(request, config, start, queue_ms)
+
+    def _complete(self, request, config, start, queue_ms):
+        n_tokens = min(int(request.get("max_tokens") or config.max_tokens), config.max_tokens)
+        words = [ANSWER_WORDS[i % len(ANSWER_WORDS)] for i in range(n_tokens)]
+
+        prompt = tokenize(request["messages"])
+        cached = self.server.cache.lookup_and_store(prompt, tokenize([{"role": "assistant", "content": " ".join(words)}]))
+        prefill_s = (len(prompt) - cached) * config.prefill_ms_per_token / 1000
+        time.sleep(config.latency_ms / 1000 + prefill_s)
+        usage = {"prompt_tokens": len(prompt), "completion_tokens": n_tokens, "total_tokens": len(prompt) + n_tokens,
+                 "prompt_tokens_details": {"cached_tokens": cached}}
+        timings = {"prefill_ms": prefill_s * 1000, "queue_ms": queue_ms}
+        created = int(time.time())
+
+        if not request.get("stream"):
+            time.sleep(n_tokens / config.tokens_per_s)
+            timings["total_ms"] = (time.perf_counter() - start) * 1000
+            self._json(200, {
+                "id": f"chatcmpl-mock-{created}", "object": "chat.completion", "created": created, "model": config.model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": " ".join(words)}, "finish_reason": "stop"}],
+                "usage": usage, "timings": timings,
+            })
+            return
+
+        # Server-sent events, one chunk per token, then a usage chunk and [DONE]
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        self.end_headers()
+
+        def send(payload):
+            self.wfile.write(f"data: {payload}\n\n".encode("utf-8"))
+            self.wfile.flush()
+
+        for i, word in enumerate(words):
+            if i:
+                time.sleep(1 / config.tokens_per_s)
+            send(json.dumps({"object": "chat.completion.chunk", "created": created, "model": config.model,
+                             "choices": [{"index": 0, "delta": {"content": (" " if i else "") + word}, "finish_reason": None}]}))
+        timings["total_ms"] = (time.perf_counter() - start) * 1000
+        send(json.dumps({"object": "chat.completion.chunk", "created": created, "model": config.model,
+                         "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}], "usage": usage, "timings": timings}))
+        send("[DONE]")
+        self.close_connection = True
+
+    def log_message(self, *args):
+        pass
+
+class MockLLMServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 256  # listen backlog for load tests (socketserver's default is 5)
+
+def add_server_arguments(parser):
+    parser.add_argument("--model", default="mistral", help="Model id reported by the server")
+    parser.add_argument("--latency-ms", type=float, default=20.0, help="Fixed per-request overhead")
+    parser.add_argument("--prefill-ms-per-token", type=float, default=0.5, help="Prefill cost per uncached prompt token")
+    parser.add_argument("--tokens-per-s", type=float, default=30.0, help="Generation rate")
+    parser.add_argument("--max-tokens", type=int, default=64, help="Tokens generated per answer")
+    parser.add_argument("--cache-slots", type=int, default=4, help="Prompts kept in the prefix cache (0 disables it)")
+    parser.add_argument("--parallel", type=int, default=1, help="Requests generated concurrently; the rest queue")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with HTTP 500")
+
+def start_server(config, host="127.0.0.1", port=1234):
+    """Start the stand-in server on a daemon thread; returns the server (call .shutdown() to stop)."""
+    server = MockLLMServer((host, port), MockLLMHandler)
+    server.config = config
+    server.cache = PrefixCache(config.cache_slots)
+    server.slots = threading.BoundedSemaphore(config.parallel)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def main():
+    parser = argparse.ArgumentParser(description="Stand-in OpenAI-compatible chat completion server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=1234)
+    add_server_arguments(parser)
+    args = parser.parse_args()
+
+    server = start_server(args, args.host, args.port)
+    print(f":: Mock LLM on http://{args.host}:{args.port}/v1/chat/completions "
+          f"(prefill {args.prefill_ms_per_token} ms/token, {args.tokens_per_s} tokens/s, {args.parallel} parallel, "
+          f"{args.cache_slots} cache slots, {args.error_rate:.0%} errors)")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+if __name__ == "__main__":
+    main()
@@ -7,27 +7,38 @@
 # License: MIT
 
 import argparse
-import faiss
 import pickle
-from sentence_transformers import SentenceTransformer
-import numpy as np
+
+from scripts.query.batch_query import load_questions, run_batch
+from scripts.query.rerank import DEFAULT_RERANKER, load_reranker, two_stage_search
+from scripts.utils.embedders import (
+    BACKENDS, MODEL_REGISTRY, EmbedderCache, check_index_compatibility, check_model_matches, index_model, resolve_model
+)
+from scripts.utils.index_io import load_index
+from scripts.utils.metrics import add_metrics_arguments, end_trace, format_trace, start_exporters, start_trace, timed
+from scripts.utils.snapshots import SNAPSHOT_ROOT, SnapshotWatcher, read_current
+from scripts.utils.tuning import add_tuning_arguments, apply_tuning
+
+INDEX_PATH = "data/embeddings/combined_faiss.index"
+METADATA_PATH = "data/embeddings/combined_metadata.pkl"
 
 # Load both the FAISS index and the associated metadata
-def load_index_and_metadata(index_path, metadata_path):
+def load_index_and_metadata(index_path, metadata_path, mmap=False):
     print(":: Loading FAISS index and metadata ...")
-    index = faiss.read_index(index_path)
+    index = load_index(index_path, mmap)
     with open(metadata_path, "rb") as f:
         metadata = pickle.load(f)
     return index, metadata
 
-# Perform semantic search using the embedder
-def search_index(query, model, index, metadata, top_k=5):
-    embedding = model.encode([query])
-    D, I = index.search(np.array(embedding).astype("float32"), top_k)
-    return [metadata[i] for i in I[0]], D[0]
+# Perform semantic search using the embedder, optionally reranking the top recall_n with a cross-encoder
+def search_index(query, model, index, metadata, top_k=5, reranker=None, recall_n=50, budget_ms=150.0, stats=None):
+    hits, search_stats = two_stage_search(query, model, index, metadata, reranker, top_k, recall_n, budget_ms)
+    if stats is not None:
+        stats.update(search_stats)
+    return [entry for entry, _ in hits], [score for _, score in hits]
 
 # Display search results, showing full text for the top hit and snippets for the rest
-def display_results(results, distances):
+def display_results(results, distances, score_label="Distance"):
     print()
     for i, (item, score) in enumerate(zip(results, distances)):
         meta = item.get("metadata", {})  # legacy support
@@ -38,7 +49,9 @@ def display_results(results, distances):
         print(f"Result {i+1}")
         print(f"  Title   : {title}")
         print(f"  Source  : {source}")
-        print(f"  Distance: {score:.4f}")
+        print(f"  {score_label + ':':<9} {score:.4f}")
+        if item.get("duplicate_ids"):
+            print(f"  Also    : {', '.join(map(str, item['duplicate_ids']))}")
 
         if i == 0:
             print(f"\n  Full Match:\n{text}\n")
@@ -50,19 +63,104 @@ def display_results(results, distances):
 def main():
     parser = argparse.ArgumentParser()
     parser.add_argument(
-        "--index", default="data/embeddings/combined_faiss.index", help="Path to FAISS index"
+        "--index", default=None, help=f"Path to FAISS index (default: CURRENT snapshot, else {INDEX_PATH})"
+    )
+    parser.add_argument(
+        "--metadata", default=None, help=f"Path to metadata pickle (default: CURRENT snapshot, else {METADATA_PATH})"
+    )
+    parser.add_argument(
+        "--mmap", action="store_true", help="Memory-map the index read-only instead of loading it into the heap"
+    )
+    parser.add_argument(
+        "--snapshots", default=SNAPSHOT_ROOT, help="Versioned index snapshot directory"
+    )
+    parser.add_argument(
+        "--snapshot-interval", type=float, default=5.0, help="Seconds between checks for a new index snapshot"
+    )
+    parser.add_argument(
+        "--model", default=None,
+        help=f"Expected embedding model or alias ({', '.join(MODEL_REGISTRY)}); default: the model recorded with the index"
+    )
+    parser.add_argument(
+        "--backend", choices=BACKENDS, default="torch", help="Embedding backend (onnx needs embedders.py export)"
+    )
+    parser.add_argument(
+        "--quantize", action="store_true", help="Use the int8-quantized ONNX model"
+    )
+    parser.add_argument(
+        "--threads", type=int, default=None, help="Embedder intra-op threads"
     )
     parser.add_argument(
-        "--metadata", default="data/embeddings/combined_metadata.pkl", help="Path to metadata pickle"
+        "--rerank", action="store_true", help="Rerank the top --recall-n candidates with a cross-encoder"
     )
     parser.add_argument(
-        "--model", default="all-mpnet-base-v2", help="SentenceTransformer model to use"
+        "--reranker", default=DEFAULT_RERANKER, help="Cross-encoder model used with --rerank"
     )
+    parser.add_argument(
+        "--recall-n", type=int, default=50, help="Candidates recalled from FAISS before reranking"
+    )
+    parser.add_argument(
+        "--budget-ms", type=float, default=150.0, help="Latency budget for the rerank stage"
+    )
+    parser.add_argument(
+        "--batch", default=None, help="Search every question in this JSONL/CSV file instead of prompting"
+    )
+    parser.add_argument(
+        "--output", default="logs/batch_hits.jsonl", help="Batch results (and resume file)"
+    )
+    parser.add_argument(
+        "--question-field", default="question", help="Field/column holding the question"
+    )
+    parser.add_argument(
+        "--chunk-size", type=int, default=64, help="Questions embedded and searched per bulk call"
+    )
+    add_tuning_arguments(parser)
+    add_metrics_arguments(parser)
     args = parser.parse_args()
+    apply_tuning(args, "throughput" if args.batch else "latency")
+    start_exporters(args)
+
+    embedders = EmbedderCache(args.backend, args.quantize, args.threads)
+
+    # Explicit paths pin a flat index; otherwise follow the CURRENT snapshot and hot-swap on change.
+    # The query model always comes from the index; --model only asserts which one that should be.
+    watcher = None
+    try:
+        if args.index is None and args.metadata is None and read_current(args.snapshots):
+            watcher = SnapshotWatcher(
+                args.snapshots, args.snapshot_interval, prepare=embedders.attach, mmap=args.mmap,
+                accept=lambda manifest: not args.model or resolve_model(args.model) == manifest["model"],
+            ).start()
+            model, index, metadata = watcher.current["embedder"], watcher.current["index"], watcher.current["metadata"]
+            print(f":: Serving index snapshot {watcher.current['name']} ({watcher.current['manifest']['model']})")
+        else:
+            index_path = args.index or INDEX_PATH
+            built_with = index_model(index_path)
+            check_model_matches(args.model, built_with)
+            index, metadata = load_index_and_metadata(index_path, args.metadata or METADATA_PATH, args.mmap)
+            model = embedders.get(built_with)
+    except ValueError as e:
+        parser.error(str(e))
+
+    def current_index():
+        if watcher is None:
+            return model, index, metadata
+        snapshot = watcher.current
+        return snapshot["embedder"], snapshot["index"], snapshot["metadata"]
+
+    if args.backend != "torch":
+        report = check_index_compatibility(model, index, metadata)
+        if report["rebuild_required"]:
+            print(f":: !! {args.backend} embeddings do not match the index vectors ({report}), rebuild the index")
+    reranker = load_reranker(args.reranker) if args.rerank else None
 
-    index, metadata = load_index_and_metadata(args.index, args.metadata)
-    print(f":: Loading embedding model: {args.model} ...")
-    model = SentenceTransformer(args.model)
+    if args.batch:
+        run_batch(
+            load_questions(args.batch, args.question_field), args.output, model, index, metadata,
+            reranker=reranker, recall_n=args.recall_n, budget_ms=args.budget_ms, chunk_size=args.chunk_size,
+            resolve=current_index, batch_size=args.batch_size or 32,
+        )
+        return
 
     print("\n=== FAISS Search Console ===")
     while True:
@@ -71,8 +169,19 @@ def main():
             break
 
         print("\n:: Searching index ...")
-        results, distances = search_index(query, model, index, metadata)
-        display_results(results, distances)
+        stats = {}
+        if args.trace:
+            start_trace()
+        with timed("query_total"):
+            query_model, query_index, query_metadata = current_index()
+            results, distances = search_index(
+                query, query_model, query_index, query_metadata, reranker=reranker, recall_n=args.recall_n, budget_ms=args.budget_ms, stats=stats
+            )
+        display_results(results, distances, "Score" if reranker else "Distance")
+        print(f":: embed {stats['embed_ms']:.1f} ms | ann {stats['ann_ms']:.1f} ms | "
+              f"rerank {stats['rerank_ms']:.1f} ms (depth {stats['depth']})")
+        if args.trace:
+            print(format_trace(end_trace()))
 
 if __name__ == "__main__":
     main()
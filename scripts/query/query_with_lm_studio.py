@@ -9,111 +9,241 @@
 # The script retrieves the most relevant knowledge snippets and crafts a prompt to ask a local LLM for a focused response.
 # License: MIT
 
-import faiss
+import argparse
 import pickle
-import numpy as np
-from sentence_transformers import SentenceTransformer
 import requests
-import textwrap
+import sys
 import re
 
+from scripts.query.batch_query import load_questions, run_batch
+from scripts.query.rerank import DEFAULT_RERANKER, load_reranker, two_stage_search
+from scripts.utils.context_blocks import select_blocks
+from scripts.utils.embedders import BACKENDS, EmbedderCache, check_index_compatibility, index_model
+from scripts.utils.index_io import load_index
+from scripts.utils.metrics import add_metrics_arguments, end_trace, format_trace, start_exporters, start_trace, timed
+from scripts.utils.snapshots import SNAPSHOT_ROOT, SnapshotWatcher, read_current
+from scripts.utils.tuning import add_tuning_arguments, apply_tuning
+
 # --- File paths for the FAISS index and corresponding metadata
 INDEX_PATH = "data/embeddings/combined_faiss.index"
 METADATA_PATH = "data/embeddings/combined_metadata.pkl"
 
-# --- Load the vector index and metadata file
-print(":: Loading FAISS index and metadata ...")
-index = faiss.read_index(INDEX_PATH)
-with open(METADATA_PATH, "rb") as f:
-    metadata = pickle.load(f)
-
-# --- Load the SentenceTransformer model used to embed queries
-print(":: Loading sentence transformer model ...")
-embedder = SentenceTransformer("all-mpnet-base-v2")
+# --- Populated by load_resources(): vector index, metadata and the query embedder. When versioned
+# snapshots exist, `watcher` owns the index/metadata/embedder triple and hot-swaps it when CURRENT changes.
+index = None
+metadata = None
+embedder = None
+watcher = None
+
+def load_resources(backend="torch", quantize=False, threads=None, snapshot_interval=5.0, mmap=False):
+    global index, metadata, embedder, watcher
+
+    # --- Query embeddings always come from the model recorded with the index
+    embedders = EmbedderCache(backend, quantize, threads)
+
+    # --- Load the vector index and metadata file
+    if read_current(SNAPSHOT_ROOT):
+        print(f":: Loading index snapshot {read_current(SNAPSHOT_ROOT)} ...")
+        watcher = SnapshotWatcher(SNAPSHOT_ROOT, snapshot_interval, prepare=embedders.attach, mmap=mmap).start()
+        embedder, index, metadata = current_index()
+    else:
+        print(":: Loading FAISS index and metadata ...")
+        index = load_index(INDEX_PATH, mmap)
+        with open(METADATA_PATH, "rb") as f:
+            metadata = pickle.load(f)
+        embedder = embedders.get(index_model(INDEX_PATH))
+
+    if backend != "torch":
+        report = check_index_compatibility(embedder, index, metadata)
+        if report["rebuild_required"]:
+            print(f":: !! {backend} embeddings do not match the index vectors ({report}), rebuild the index with --backend {backend}")
+
+# The embedder/index/metadata to use for one query (always from the same snapshot)
+def current_index():
+    if watcher is None:
+        return embedder, index, metadata
+    snapshot = watcher.current
+    return snapshot["embedder"], snapshot["index"], snapshot["metadata"]
+
+# --- Optional cross-encoder reranker (enabled with --rerank); FAISS top-k is final without it
+reranker = None
+RECALL_N = 50
+RERANK_BUDGET_MS = 150.0
+
+# --- Optional warm session (--warm-session): follow-up questions extend one conversation
+chat = None
 
 # --- LLM Studio API configuration
 LLM_API_URL = "http://localhost:1234/v1/chat/completions"
 MODEL_NAME = "mistral"
 
-# --- Helper function to strip extra whitespace and truncate long text blocks
-def clean_text(text, max_chars=1800):
-    return " ".join(text.split())[:max_chars]
-
 # --- Main RAG query logic: retrieve from FAISS, build context, and send to LLM
 def query_lm(user_question, k=5, max_context_chars=3500):
-    print(":: Searching FAISS index ...")
+    with timed("query_total"):
+        print(":: Searching FAISS index ...")
+        user_question = expand_question(user_question)
+
+        # Embed the query, recall candidates from the index and (optionally) rerank them
+        query_embedder, query_index, query_metadata = current_index()
+        hits, _ = two_stage_search(user_question, query_embedder, query_index, query_metadata, reranker, k, RECALL_N, RERANK_BUDGET_MS)
+        return answer_from_hits(user_question, hits, max_context_chars, chat=chat)
 
-    # If the user mentions CWE IDs, include them again in the question to increase relevance in FAISS
+# If the user mentions CWE IDs, include them again in the question to increase relevance in FAISS
+def expand_question(user_question):
     cwe_ids = re.findall(r'\bCWE-(\d+)\b', user_question.upper())
     if cwe_ids:
         user_question += " Related CWE IDs: " + " ".join([f"CWE-{cwe_id}" for cwe_id in cwe_ids])
+    return user_question
 
-    # Embed the query and search the index
-    query_vec = embedder.encode([user_question])
-    D, I = index.search(np.array(query_vec), k=k)
-
-    # Build up the context prompt using the top matching entries
-    context_blocks = []
-    total_chars = 0
-    for idx in I[0]:
-        entry = metadata[idx]
-        title = entry.get("title", "Untitled")
-        source = entry.get("source", "Unknown")
-        doc_id = entry.get("id", "N/A")
-        text = clean_text(entry.get("text", ""))
-
-        # Build a readable block with header
-        header = f"[{source}] {doc_id} - {title}"
-        block = f"{header}\n{textwrap.indent(text, '  ')}"
-        block_chars = len(block)
-
-        # Enforce total character limit to stay within LLM context window
-        if total_chars + block_chars > max_context_chars:
-            break
-
-        context_blocks.append(block)
-        total_chars += block_chars
-
-    if not context_blocks:
-        return ":: No usable entries found. Try a simpler query."
-
-    # Join context blocks with separators
-    context = "\n\n====\n\n".join(context_blocks)
-
-    # The full prompt the LLM will see, including the user question and retrieved context
-    full_prompt = f"""You are a focused cybersecurity assistant. Use only the provided context from STIGs or MITRE CWEs to answer the user's question.
+# Fixed instructions sent first on every request, so the server's prompt (KV) cache can reuse them
+SYSTEM_PROMPT = """You are a focused cybersecurity assistant. Use only the provided context from STIGs or MITRE CWEs to answer the user's question.
 - Do not speculate or hallucinate.
-- If the answer is not in the context, say so.
-
-User Question: {user_question}
-
-Context:
-{context}
-
-Answer:""".strip()
-
-    # Send the request to the LLM hosted in LM Studio
-    response = requests.post(LLM_API_URL, json={
-        "model": MODEL_NAME,
-        "messages": [{"role": "user", "content": full_prompt}],
-        "temperature": 0.5
-    })
-
+- If the answer is not in the context, say so."""
+
+# Retrieved entries as readable context blocks, keyed by (source, id)
+def context_blocks(hits, max_context_chars=3500, skip=()):
+    """
+    Blocks for the best-ranked entries that fit max_context_chars, then sorted by (source, id) so the
+    same set of entries always yields the same text. Entries whose key is in skip are left out.
+    Blocks are precomputed at ingest; only older metadata is formatted here.
+    """
+    with timed("context_assembly"):
+        return sorted(select_blocks(hits, max_context_chars, skip))
+
+def user_message(question, blocks):
+    # Context before the question: the question is the only part that differs for the same context
+    if not blocks:
+        return f"Question: {question}\n\nAnswer:"
+    context = "\n\n====\n\n".join(block for _, block in blocks)
+    return f"Context:\n{context}\n\nQuestion: {question}\n\nAnswer:"
+
+# Chat messages for one question: stable system message, sorted context, then the question;
+# None when no entry fits the context budget
+def build_messages(user_question, hits, max_context_chars=3500):
+    blocks = context_blocks(hits, max_context_chars)
+    if not blocks:
+        return None
+    return [{"role": "system", "content": SYSTEM_PROMPT}, {"role": "user", "content": user_message(user_question, blocks)}]
+
+class WarmSession:
+    """
+    Conversation kept across follow-up questions (--warm-session). Each request resends the earlier
+    turns unchanged, so the server serves them from its prompt cache and only prefills the new turn,
+    which carries just the context blocks not already in the conversation. Starts over once the
+    conversation passes max_chars.
+    """
+
+    def __init__(self, max_chars=12000):
+        self.max_chars = max_chars
+        self.reset()
+
+    def reset(self):
+        self.messages = [{"role": "system", "content": SYSTEM_PROMPT}]
+        self.sent = set()
+
+    def chars(self):
+        return sum(len(message["content"]) for message in self.messages)
+
+    def prepare(self, user_question, hits, max_context_chars=3500):
+        """Messages for the next request; None when there is no context at all."""
+        if self.chars() > self.max_chars:
+            self.reset()
+        blocks = context_blocks(hits, max_context_chars, skip=self.sent)
+        if not blocks and not self.sent:
+            return None
+        self.pending = (user_message(user_question, blocks), {key for key, _ in blocks})
+        return self.messages + [{"role": "user", "content": self.pending[0]}]
+
+    def record(self, answer):
+        content, keys = self.pending
+        self.messages += [{"role": "user", "content": content}, {"role": "assistant", "content": answer}]
+        self.sent |= keys
+
+# Send the messages to the LLM hosted in LM Studio; raises on HTTP or response errors
+def request_completion(messages, session=requests):
+    with timed("llm_request"):
+        response = session.post(LLM_API_URL, json={
+            "model": MODEL_NAME,
+            "messages": messages,
+            "temperature": 0.5
+        })
+    response.raise_for_status()
+    return response.json()["choices"][0]["message"]["content"]
+
+# Answer text for retrieved hits, None when no entry fits the context; LLM errors propagate (batch mode)
+def generate_answer(user_question, hits, max_context_chars=3500, session=requests, chat=None):
+    messages = chat.prepare(user_question, hits, max_context_chars) if chat else build_messages(user_question, hits, max_context_chars)
+    if messages is None:
+        return None
+    answer = request_completion(messages, session)
+    if chat:
+        chat.record(answer)
+    return answer
+
+def answer_from_hits(user_question, hits, max_context_chars=3500, session=requests, chat=None):
     try:
-        response.raise_for_status()
-        result = response.json()
-        return result["choices"][0]["message"]["content"]
+        answer = generate_answer(user_question, hits, max_context_chars, session, chat)
     except Exception as e:
-        return f"!! Error contacting LLM :: {e}\n{response.text}"
+        body = getattr(getattr(e, "response", None), "text", "")
+        return f"!! Error contacting LLM :: {e}\n{body}"
+    return answer if answer is not None else ":: No usable entries found. Try a simpler query."
 
 # --- CLI loop: allows the user to type questions interactively
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Query the STIG + MITRE knowledge base through LM Studio")
+    parser.add_argument("--rerank", action="store_true", help="Rerank the top --recall-n candidates with a cross-encoder")
+    parser.add_argument("--reranker", default=DEFAULT_RERANKER, help="Cross-encoder model used with --rerank")
+    parser.add_argument("--recall-n", type=int, default=RECALL_N, help="Candidates recalled from FAISS before reranking")
+    parser.add_argument("--budget-ms", type=float, default=RERANK_BUDGET_MS, help="Latency budget for the rerank stage")
+    parser.add_argument("--backend", choices=BACKENDS, default="torch", help="Embedding backend for queries")
+    parser.add_argument("--quantize", action="store_true", help="Use the int8-quantized ONNX model")
+    parser.add_argument("--threads", type=int, default=None, help="Embedder intra-op threads")
+    parser.add_argument("--mmap", action="store_true", help="Memory-map the index read-only instead of loading it into the heap")
+    parser.add_argument("--snapshot-interval", type=float, default=5.0, help="Seconds between checks for a new index snapshot")
+    parser.add_argument("--batch", default=None, help="Answer every question in this JSONL/CSV file instead of prompting")
+    parser.add_argument("--output", default="logs/batch_answers.jsonl", help="Batch results (and resume file)")
+    parser.add_argument("--question-field", default="question", help="Field/column holding the question")
+    parser.add_argument("--concurrency", type=int, default=4, help="Concurrent LLM requests in batch mode")
+    parser.add_argument("--chunk-size", type=int, default=64, help="Questions embedded and searched per bulk call")
+    parser.add_argument("--warm-session", action="store_true", help="Keep the conversation for follow-ups ('reset' starts over)")
+    parser.add_argument("--session-chars", type=int, default=12000, help="Conversation size after which a warm session starts over")
+    add_tuning_arguments(parser)
+    add_metrics_arguments(parser)
+    args = parser.parse_args()
+
+    apply_tuning(args, "throughput" if args.batch else "latency")
+    start_exporters(args)
+    load_resources(args.backend, args.quantize, args.threads, args.snapshot_interval, args.mmap)
+    RECALL_N = args.recall_n
+    RERANK_BUDGET_MS = args.budget_ms
+    if args.rerank:
+        reranker = load_reranker(args.reranker)
+    if args.warm_session:
+        chat = WarmSession(args.session_chars)
+
+    if args.batch:
+        run_batch(
+            load_questions(args.batch, args.question_field), args.output, embedder, index, metadata,
+            generate=generate_answer, expand=expand_question, reranker=reranker, recall_n=RECALL_N,
+            budget_ms=RERANK_BUDGET_MS, chunk_size=args.chunk_size, concurrency=args.concurrency,
+            resolve=current_index, batch_size=args.batch_size or 32,
+        )
+        sys.exit(0)
+
     print("\n=== Cybersecurity RAG Query ===")
     while True:
         q = input("\n>> Ask your question (or type 'exit'): ").strip()
         if q.lower() in {"exit", "quit"}:
             break
+        if chat and q.lower() == "reset":
+            chat.reset()
+            print(":: Started a new session")
+            continue
         print("\n:: Generating response ...\n")
+        if args.trace:
+            start_trace()
         answer = query_lm(q)
         print("\n" + answer)
+        if args.trace:
+            print("\n" + format_trace(end_trace()))
         print("\n" + "-"*80)
@@ -0,0 +1,199 @@
+# Author: Sean Sjahrial
+# Title: Cybersecurity RAG Assistant
+# Description: Part of UC Berkeley MICS Machine Learning Course (2025)
+# GitHub: https://github.com/isnakie
+# Description: Two-stage retrieval for the STIG + MITRE CWE FAISS index. Stage one recalls the top-N
+# candidates by vector distance, stage two rescores them with a cross-encoder in a single batched
+# forward pass. The rerank depth is sized to fit a millisecond budget.
+# License: MIT
+
+"""
+Usage:
+
+Tune depth/latency on known-item queries (each entry's title should retrieve that entry)
+> python -m scripts.query.rerank --recall-n 50 --budget-ms 150 --depths 5 10 20 50
+
+Library use (see query_faiss_index.py / query_with_lm_studio.py)
+> reranker = load_reranker()
+> hits, stats = two_stage_search(query, embedder, index, metadata, reranker, k=5, recall_n=50, budget_ms=150)
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+from scripts.utils.embedders import index_model, load_embedder
+from scripts.utils.metrics import timed
+
+DEFAULT_RERANKER = "cross-encoder/ms-marco-MiniLM-L-6-v2"
+
+# Long MITRE/STIG entries are clipped before scoring; the cross-encoder only reads ~512 tokens anyway
+RERANK_CHARS = 1200
+
+# --- Load the cross-encoder and measure what one forward pass costs on this machine ---
+def load_reranker(model_name=DEFAULT_RERANKER):
+    from sentence_transformers import CrossEncoder
+
+    print(f":: Loading cross-encoder reranker: {model_name} ...")
+    model = CrossEncoder(model_name)
+    reranker = {"model": model, "overhead_ms": 0.0, "per_pair_ms": 1.0}
+    calibrate_reranker(reranker)
+    return reranker
+
+def calibrate_reranker(reranker, sizes=(1, 16), repeats=3):
+    """Fit rerank latency as overhead + per_pair * depth from two batch sizes."""
+    pair = ("sample question about password policy", ("sample passage " * 100)[:RERANK_CHARS])
+    timings = []
+    for size in sizes:
+        reranker["model"].predict([pair] * size, batch_size=size)  # warm-up
+        start = time.perf_counter()
+        for _ in range(repeats):
+            reranker["model"].predict([pair] * size, batch_size=size)
+        timings.append((time.perf_counter() - start) / repeats * 1000)
+
+    per_pair = max((timings[1] - timings[0]) / (sizes[1] - sizes[0]), 1e-3)
+    reranker["per_pair_ms"] = per_pair
+    reranker["overhead_ms"] = max(timings[0] - per_pair * sizes[0], 0.0)
+
+def rerank_depth(reranker, budget_ms, k, recall_n):
+    """Largest depth whose predicted rerank time fits the budget, never below k or above recall_n."""
+    depth = int((budget_ms - reranker["overhead_ms"]) / reranker["per_pair_ms"])
+    return max(k, min(depth, recall_n))
+
+def passage_text(entry):
+    title = entry.get("title") or entry.get("metadata", {}).get("title") or ""
+    return f"{title}\n{entry.get('text', '')}"[:RERANK_CHARS]
+
+# --- Stage two: score (query, passage) pairs in one batch and reorder ---
+def rerank(query, candidates, reranker):
+    pairs = [(query, passage_text(entry)) for entry, _ in candidates]
+    scores = reranker["model"].predict(pairs, batch_size=len(pairs))
+    order = np.argsort(-np.asarray(scores))
+    return [(candidates[i][0], float(scores[i])) for i in order], [int(i) for i in order]
+
+def two_stage_search(query, embedder, index, metadata, reranker=None, k=5, recall_n=50, budget_ms=150.0):
+    """
+    Return (hits, stats). hits is a list of (metadata entry, score); without a reranker the
+    score is the FAISS distance and the result is plain top-k. stats holds per-stage timings
+    and quality counters for tuning depth against latency.
+    """
+    return two_stage_search_batch([query], embedder, index, metadata, reranker, k, recall_n, budget_ms)[0]
+
+def two_stage_search_batch(queries, embedder, index, metadata, reranker=None, k=5, recall_n=50, budget_ms=150.0,
+                           batch_size=32):
+    """
+    Batched two_stage_search: one encode call and one index search for all queries, then a
+    per-query rerank. Embed/ANN times in each stats dict are the batch cost amortized per query.
+    """
+    with timed("embed") as t:
+        query_vecs = np.asarray(embedder.encode(list(queries), batch_size=batch_size), dtype="float32")
+    embed_ms = t.ms / len(queries)
+
+    depth = rerank_depth(reranker, budget_ms, k, recall_n) if reranker else k
+    with timed("index_search") as t:
+        D, I = index.search(query_vecs, depth)
+    ann_ms = t.ms / len(queries)
+
+    results = []
+    for query, distances, ids in zip(queries, D, I):
+        stats = {"embed_ms": embed_ms, "ann_ms": ann_ms}
+        candidates = [(metadata[i], float(d)) for i, d in zip(ids, distances) if i != -1]
+        stats["depth"] = len(candidates)
+        if not reranker:
+            stats["rerank_ms"] = 0.0
+            results.append((candidates[:k], stats))
+        else:
+            results.append((rerank_candidates(query, candidates, reranker, k, budget_ms, stats), stats))
+    return results
+
+def rerank_candidates(query, candidates, reranker, k, budget_ms, stats):
+    if not candidates:
+        # Nothing to score (empty index or every id was -1); predict() rejects batch_size=0
+        stats.update(rerank_ms=0.0, promoted=0, overlap_at_k=0.0, over_budget=False)
+        return []
+    with timed("rerank") as t:
+        reranked, order = rerank(query, candidates, reranker)
+    elapsed = t.ms
+    stats["rerank_ms"] = elapsed
+
+    # Keep the cost model honest: blend the observed per-pair cost into the estimate
+    observed = max(elapsed - reranker["overhead_ms"], 0.0) / max(len(candidates), 1)
+    reranker["per_pair_ms"] = 0.8 * reranker["per_pair_ms"] + 0.2 * max(observed, 1e-3)
+
+    top = order[:k]
+    stats["promoted"] = sum(1 for i in top if i >= k)        # hits pulled up from beyond ANN top-k
+    stats["overlap_at_k"] = sum(1 for i in top if i < k) / k  # agreement with ANN-only top-k
+    stats["over_budget"] = elapsed > budget_ms
+    return reranked[:k]
+
+# --- Offline tuning: known-item queries built from entry titles ---
+def known_item_queries(metadata, limit):
+    queries = []
+    for i, entry in enumerate(metadata):
+        title = entry.get("title", "")
+        # Drop the "CWE-20: " / "V-12345: " prefix so the ID itself cannot be matched
+        query = title.split(": ", 1)[-1].strip()
+        if query and query != "N/A":
+            queries.append((query, i))
+    return queries[:limit]
+
+def evaluate(embedder, index, metadata, reranker, depths, k, recall_n, budget_ms, limit):
+    queries = known_item_queries(metadata, limit)
+    configs = [("ANN only", None, k)] + [(f"rerank depth={d}", reranker, d) for d in depths]
+    rows = []
+
+    for name, model, depth in configs:
+        hits_at_k, reciprocal_ranks, latencies = 0, [], []
+        for query, target in queries:
+            if model is None:
+                hits, stats = two_stage_search(query, embedder, index, metadata, None, k=k)
+            else:
+                # A budget large enough to force exactly this depth
+                forced = model["overhead_ms"] + model["per_pair_ms"] * depth + 1
+                hits, stats = two_stage_search(query, embedder, index, metadata, model, k, depth, forced)
+            latencies.append(stats["embed_ms"] + stats["ann_ms"] + stats["rerank_ms"])
+
+            ids = [id(entry) for entry, _ in hits]
+            if id(metadata[target]) in ids:
+                hits_at_k += 1
+                reciprocal_ranks.append(1.0 / (ids.index(id(metadata[target])) + 1))
+            else:
+                reciprocal_ranks.append(0.0)
+
+        rows.append((name, hits_at_k / len(queries), float(np.mean(reciprocal_ranks)),
+                     float(np.percentile(latencies, 50)), float(np.percentile(latencies, 95))))
+
+    print(f"\n:: Known-item retrieval over {len(queries)} title queries (k={k})")
+    print(f"   {'config':<22}{'hit@k':>8}{'MRR':>8}{'p50 ms':>10}{'p95 ms':>10}")
+    for name, hit_rate, mrr, p50, p95 in rows:
+        print(f"   {name:<22}{hit_rate:>8.3f}{mrr:>8.3f}{p50:>10.1f}{p95:>10.1f}")
+    print(f"\n:: Depth chosen for a {budget_ms:.0f} ms budget: {rerank_depth(reranker, budget_ms, k, recall_n)}")
+
+def main():
+    import faiss
+    import pickle
+
+    parser = argparse.ArgumentParser(description="Tune two-stage retrieval depth against a latency budget")
+    parser.add_argument("--index", default="data/embeddings/combined_faiss.index", help="Path to FAISS index")
+    parser.add_argument("--metadata", default="data/embeddings/combined_metadata.pkl", help="Path to metadata pickle")
+    parser.add_argument("--model", default=None, help="Embedding model (default: the model recorded with the index)")
+    parser.add_argument("--reranker", default=DEFAULT_RERANKER, help="Cross-encoder model to use")
+    parser.add_argument("--k", type=int, default=5, help="Final results per query")
+    parser.add_argument("--recall-n", type=int, default=50, help="Stage-one candidates")
+    parser.add_argument("--budget-ms", type=float, default=150.0, help="Rerank latency budget")
+    parser.add_argument("--depths", type=int, nargs="+", default=[5, 10, 20, 50], help="Rerank depths to compare")
+    parser.add_argument("--limit", type=int, default=200, help="Max known-item queries")
+    args = parser.parse_args()
+
+    index = faiss.read_index(args.index)
+    with open(args.metadata, "rb") as f:
+        metadata = pickle.load(f)
+    embedder = load_embedder(args.model or index_model(args.index))
+    reranker = load_reranker(args.reranker)
+    print(f":: Rerank cost model: {reranker['overhead_ms']:.1f} ms + {reranker['per_pair_ms']:.2f} ms/pair")
+
+    evaluate(embedder, index, metadata, reranker, args.depths, args.k, args.recall_n, args.budget_ms, args.limit)
+
+if __name__ == "__main__":
+    main()
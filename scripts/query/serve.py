@@ -0,0 +1,195 @@
+# Author: Sean Sjahrial
+# Title: Cybersecurity RAG Assistant
+# Description: Part of UC Berkeley MICS Machine Learning Course (2025)
+# GitHub: https://github.com/isnakie
+# Description: Pre-fork HTTP retrieval server. The parent loads the embedder, metadata and (optionally
+# memory-mapped) index once, then forks workers that share those pages copy-on-write and accept on one
+# listening socket. Pages loaded later in a worker (a hot-swapped snapshot, or everything with
+# --no-preload) are private to it unless the index is memory-mapped. POSIX only (os.fork).
+# License: MIT
+
+"""
+Usage:
+
+Four workers sharing one memory-mapped index
+> python -m scripts.query.serve --workers 4 --mmap --port 8080
+
+Each worker loads its own copy, as separately started processes would (for comparison)
+> python -m scripts.query.serve --workers 4 --no-preload
+
+Query it
+> curl -s localhost:8080/search -d '{"query": "password storage requirements", "k": 5}'
+"""
+
+import argparse
+import gc
+import json
+import os
+import signal
+import sys
+import time
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+from scripts.query.rerank import two_stage_search
+from scripts.utils.embedders import BACKENDS, EmbedderCache, index_model
+from scripts.utils.index_io import load_index
+from scripts.utils.metrics import render_prometheus, timed
+from scripts.utils.snapshots import SNAPSHOT_ROOT, SnapshotWatcher, load_snapshot, read_current
+from scripts.utils.tuning import add_tuning_arguments, apply_tuning, set_faiss_threads
+
+INDEX_PATH = "data/embeddings/combined_faiss.index"
+METADATA_PATH = "data/embeddings/combined_metadata.pkl"
+WARMUP_QUERY = "How should passwords be stored?"
+
+# Set in each worker after fork; the handler reads it once per request
+state = {"watcher": None, "snapshot": None}
+
+def current_snapshot():
+    return state["watcher"].current if state["watcher"] else state["snapshot"]
+
+class SearchHandler(BaseHTTPRequestHandler):
+    def _send(self, status, body, content_type="application/json"):
+        data = body.encode("utf-8") if isinstance(body, str) else json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if self.path == "/health":
+            self._send(200, {"pid": os.getpid(), "snapshot": current_snapshot()["name"]})
+        elif self.path == "/metrics":
+            self._send(200, render_prometheus(), "text/plain; version=0.0.4")
+        else:
+            self.send_error(404)
+
+    def do_POST(self):
+        if self.path != "/search":
+            self.send_error(404)
+            return
+        try:
+            request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+            query, k = request["query"], int(request.get("k", 5))
+        except (ValueError, KeyError) as e:
+            self._send(400, {"error": f"bad request: {e}"})
+            return
+
+        snapshot = current_snapshot()
+        with timed("query_total"):
+            hits, stats = two_stage_search(query, snapshot["embedder"], snapshot["index"], snapshot["metadata"], k=k)
+        self._send(200, {
+            "hits": [{"id": e.get("id"), "title": e.get("title"), "source": e.get("source"), "score": s} for e, s in hits],
+            "stats": stats,
+            "pid": os.getpid(),
+        })
+
+    def log_message(self, *args):
+        pass
+
+def load_shared(args):
+    """Everything loaded here is inherited by the workers instead of being loaded N times."""
+    embedders = EmbedderCache(args.backend, threads=args.threads)
+    if args.index is None and read_current(args.snapshots):
+        snapshot = load_snapshot(root=args.snapshots, mmap=args.mmap)
+        embedders.attach(snapshot)
+    else:
+        import pickle
+
+        index_path = args.index or INDEX_PATH
+        with open(args.metadata or METADATA_PATH, "rb") as f:
+            metadata = pickle.load(f)
+        index = load_index(index_path, args.mmap)
+        snapshot = {"name": index_path, "manifest": None, "index": index, "metadata": metadata,
+                    "embedder": embedders.get(index_model(index_path))}
+    return snapshot, embedders
+
+def run_worker(server, snapshot, embedders, args, ready_fd):
+    signal.signal(signal.SIGTERM, lambda *_: os._exit(0))
+    signal.signal(signal.SIGINT, signal.SIG_IGN)  # the parent handles Ctrl-C and stops the workers
+    if snapshot is None:
+        snapshot, embedders = load_shared(args)
+
+    state["snapshot"] = snapshot
+    if snapshot["manifest"] is not None:
+        # Threads do not survive fork, so each worker watches CURRENT itself
+        state["watcher"] = SnapshotWatcher(
+            args.snapshots, args.snapshot_interval, prepare=embedders.attach, mmap=args.mmap, initial=snapshot
+        ).start()
+
+    # Warm-up: first-call allocations and page faults happen before the worker reports ready
+    two_stage_search(WARMUP_QUERY, snapshot["embedder"], snapshot["index"], snapshot["metadata"])
+    os.write(ready_fd, b"r")
+    os.close(ready_fd)
+    server.serve_forever()
+
+def main():
+    parser = argparse.ArgumentParser(description="Pre-fork retrieval server sharing one index across workers")
+    parser.add_argument("--workers", type=int, default=4, help="Worker processes")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--mmap", action="store_true", help="Memory-map the index so workers share page-cache pages")
+    parser.add_argument("--index", default=None, help=f"Flat index (default: CURRENT snapshot, else {INDEX_PATH})")
+    parser.add_argument("--metadata", default=None, help=f"Metadata pickle (default: {METADATA_PATH})")
+    parser.add_argument("--snapshots", default=SNAPSHOT_ROOT, help="Versioned index snapshot directory")
+    parser.add_argument("--snapshot-interval", type=float, default=5.0, help="Seconds between checks for a new snapshot")
+    parser.add_argument("--backend", choices=BACKENDS, default="torch", help="Embedding backend")
+    parser.add_argument("--threads", type=int, default=None, help="Embedder intra-op threads per worker (default: profile, else 1)")
+    parser.add_argument("--no-preload", action="store_true", help="Load everything in each worker after fork")
+    add_tuning_arguments(parser, batch_size=False)
+    args = parser.parse_args()
+
+    # Workers share the host's cores: without a profile (autotune --processes N), one thread per stage
+    apply_tuning(args, "latency")
+    args.threads = args.threads or 1
+    if not args.faiss_threads:
+        set_faiss_threads(1)
+
+    if not hasattr(os, "fork"):
+        sys.exit("!! serve.py needs os.fork (Linux/macOS); use query_faiss_index.py --batch on Windows")
+
+    start = time.perf_counter()
+    snapshot, embedders = (None, None) if args.no_preload else load_shared(args)
+    server = HTTPServer((args.host, args.port), SearchHandler)
+
+    # Move everything loaded so far out of the GC's generations so collections in the workers
+    # do not touch (and copy) the shared pages
+    gc.collect()
+    gc.freeze()
+
+    ready_r, ready_w = os.pipe()
+    children = []
+    for _ in range(args.workers):
+        pid = os.fork()
+        if pid == 0:
+            os.close(ready_r)
+            run_worker(server, snapshot, embedders, args, ready_w)
+        children.append(pid)
+    os.close(ready_w)
+
+    ready = 0
+    while ready < args.workers:
+        chunk = os.read(ready_r, args.workers)
+        if not chunk:
+            break  # a worker died during warm-up
+        ready += len(chunk)
+    print(f":: {ready}/{args.workers} workers ready in {time.perf_counter() - start:.2f}s "
+          f"on http://{args.host}:{args.port} (mmap={args.mmap}, preload={not args.no_preload})", flush=True)
+
+    def stop(*_):
+        for pid in children:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    for _ in children:
+        try:
+            os.wait()
+        except ChildProcessError:
+            break
+
+if __name__ == "__main__":
+    main()
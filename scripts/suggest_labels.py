@@ -72,7 +72,7 @@ def suggest_label(paragraph):
         return "Background Information"
     return "Unknown"
 
-def extract_paragraphs(filename, target_sentences=3):
+def extract_paragraphs(filename, target_sentences=3, labeler=suggest_label):
     with open(filename, "r", encoding="utf-8") as f:
         lines = f.readlines()
 
@@ -93,13 +93,13 @@ def extract_paragraphs(filename, target_sentences=3):
         if sentence_count >= target_sentences:
             paragraph = " ".join(current)
             if len(paragraph) > 50:
-                paragraphs.append({"text": paragraph.strip(), "label": suggest_label(paragraph)})
+                paragraphs.append({"text": paragraph.strip(), "label": labeler(paragraph) if labeler else None})
             current = []
             sentence_count = 0
     if current:
         paragraph = " ".join(current)
         if len(paragraph) > 50:
-            paragraphs.append({"text": paragraph.strip(), "label": suggest_label(paragraph)})
+            paragraphs.append({"text": paragraph.strip(), "label": labeler(paragraph) if labeler else None})
     return pd.DataFrame(paragraphs)
 
 def main():
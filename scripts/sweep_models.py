@@ -0,0 +1,240 @@
+# Author: Sean Sjahrial
+# Title: Cybersecurity RAG Assistant – Baseline Classifier Sweep
+# Description: Cross-validated sweep over TF-IDF and model configurations for the pentest classifier.
+# GitHub: https://github.com/isnakie
+# License: MIT
+
+# ------------------------------------------------------------------------------
+# vectorize_data.py hard-codes one TF-IDF configuration and train_baseline_model.py
+# trains a single LinearSVC. This script evaluates a grid of vectorizer and model
+# configurations with stratified cross-validation across a process pool. Each
+# vectorizer config is fitted once per fold and cached to disk, so all models
+# share the same feature matrices. Results go to a leaderboard CSV and the
+# Pareto-best model (macro-F1 vs. predict latency vs. size) is exported in place
+# of models/LinearSVC_model.pkl together with its matching vectorizer.
+# ------------------------------------------------------------------------------
+
+"""
+Usage:
+
+Run the full sweep and export the Pareto-best model
+> python scripts/sweep_models.py
+
+Only write the leaderboard, keep the current model files
+> python scripts/sweep_models.py --no-export --workers 4
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import pickle
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.calibration import CalibratedClassifierCV
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.linear_model import LogisticRegression
+from sklearn.metrics import accuracy_score, f1_score
+from sklearn.model_selection import StratifiedKFold
+from sklearn.naive_bayes import MultinomialNB
+from sklearn.svm import LinearSVC
+
+# --- File paths ---
+TRAIN_CSV = "data/processed/train.csv"
+TEST_CSV = "data/processed/test.csv"
+CACHE_DIR = "data/processed/sweep_cache"
+LEADERBOARD_PATH = "logs/sweep_leaderboard.csv"
+MODEL_PATH = "models/LinearSVC_model.pkl"
+VECTORIZER_PATH = "models/tfidf_vectorizer.pkl"
+CALIBRATED_MODEL_PATH = "models/LinearSVC_calibrated.pkl"
+
+# --- Vectorizer grid (the first entry matches vectorize_data.py) ---
+VECTORIZER_CONFIGS = [
+    {"max_features": 10000, "ngram_range": (1, 3), "min_df": 2, "stop_words": "english"},
+    {"max_features": 10000, "ngram_range": (1, 2), "min_df": 2, "stop_words": "english"},
+    {"max_features": 5000, "ngram_range": (1, 1), "min_df": 1, "stop_words": "english"},
+    {"max_features": 20000, "ngram_range": (1, 3), "min_df": 1, "stop_words": None, "sublinear_tf": True},
+]
+
+# --- Model grid, built lazily inside the worker processes ---
+MODEL_CONFIGS = [
+    ("LinearSVC", {"C": 0.5, "class_weight": "balanced"}),
+    ("LinearSVC", {"C": 1.0, "class_weight": "balanced"}),
+    ("LogisticRegression", {"C": 5.0, "max_iter": 1000, "class_weight": "balanced"}),
+    ("MultinomialNB", {"alpha": 0.1}),
+    ("MultinomialNB", {"alpha": 1.0}),
+]
+
+MODEL_CLASSES = {
+    "LinearSVC": LinearSVC,
+    "LogisticRegression": LogisticRegression,
+    "MultinomialNB": MultinomialNB,
+}
+
+def build_model(name, params):
+    return MODEL_CLASSES[name](**params)
+
+# --- Stable cache key for a vectorizer config ---
+def config_key(config):
+    return hashlib.sha1(json.dumps(config, sort_keys=True).encode("utf-8")).hexdigest()[:12]
+
+# --- Digest of the training data, so cached folds are rebuilt whenever train.csv changes ---
+def data_digest(texts, labels):
+    digest = hashlib.sha1()
+    for text, label in zip(texts, labels):
+        digest.update(f"{text}\x1f{label}\x1e".encode("utf-8"))
+    return digest.hexdigest()[:12]
+
+def describe(config):
+    return json.dumps(config, sort_keys=True)
+
+# --- Fit each vectorizer config once per fold and cache the matrices on disk ---
+def build_feature_cache(texts, labels, configs, n_splits, cache_dir):
+    Path(cache_dir).mkdir(parents=True, exist_ok=True)
+    folds = list(StratifiedKFold(n_splits=n_splits, shuffle=True, random_state=42).split(texts, labels))
+    cache_paths = {}
+    digest = data_digest(texts, labels)
+
+    for config in configs:
+        key = config_key(config)
+        path = Path(cache_dir) / f"tfidf_{key}_cv{n_splits}_{digest}.pkl"
+        cache_paths[key] = str(path)
+        if path.exists():
+            print(f":: Using cached features for {describe(config)}")
+            continue
+
+        print(f":: Vectorizing folds for {describe(config)} ...")
+        fold_data = []
+        for train_idx, val_idx in folds:
+            vectorizer = TfidfVectorizer(**config)
+            X_tr = vectorizer.fit_transform(texts[train_idx])
+            X_val = vectorizer.transform(texts[val_idx])
+            fold_data.append((X_tr, labels[train_idx], X_val, labels[val_idx], len(pickle.dumps(vectorizer))))
+        joblib.dump(fold_data, path)
+
+    return cache_paths
+
+# --- Worker: cross-validate one (vectorizer config, model config) pair ---
+def evaluate_pair(cache_path, vec_config, model_name, model_params):
+    fold_data = joblib.load(cache_path)
+    f1s, accs, train_times, latencies, sizes = [], [], [], [], []
+
+    for X_tr, y_tr, X_val, y_val, vectorizer_bytes in fold_data:
+        clf = build_model(model_name, model_params)
+
+        start = time.perf_counter()
+        clf.fit(X_tr, y_tr)
+        train_times.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        y_pred = clf.predict(X_val)
+        latencies.append((time.perf_counter() - start) / X_val.shape[0] * 1000)
+
+        f1s.append(f1_score(y_val, y_pred, average="macro", zero_division=0))
+        accs.append(accuracy_score(y_val, y_pred))
+        sizes.append(len(pickle.dumps(clf)) + vectorizer_bytes)
+
+    return {
+        "vectorizer": describe(vec_config),
+        "model": model_name,
+        "params": json.dumps(model_params, sort_keys=True),
+        "macro_f1": float(np.mean(f1s)),
+        "macro_f1_std": float(np.std(f1s)),
+        "accuracy": float(np.mean(accs)),
+        "train_seconds": float(np.mean(train_times)),
+        "predict_ms_per_sample": float(np.mean(latencies)),
+        "model_bytes": int(np.mean(sizes)),
+    }
+
+# --- Mark rows that no other row beats on all of (F1 up, latency down, size down) ---
+def pareto_front(df):
+    scores = df[["macro_f1", "predict_ms_per_sample", "model_bytes"]].to_numpy()
+    on_front = []
+    for i, (f1, latency, size) in enumerate(scores):
+        dominated = any(
+            o_f1 >= f1 and o_lat <= latency and o_size <= size
+            and (o_f1 > f1 or o_lat < latency or o_size < size)
+            for j, (o_f1, o_lat, o_size) in enumerate(scores) if j != i
+        )
+        on_front.append(not dominated)
+    return np.array(on_front)
+
+# --- Refit the chosen configuration on the full train split and export it ---
+def export_best(best, train_df, test_df):
+    vec_config = json.loads(best["vectorizer"])
+    if vec_config.get("ngram_range"):
+        vec_config["ngram_range"] = tuple(vec_config["ngram_range"])
+    vectorizer = TfidfVectorizer(**vec_config)
+    clf = build_model(best["model"], json.loads(best["params"]))
+
+    X_train = vectorizer.fit_transform(train_df["text"].astype(str))
+    clf.fit(X_train, train_df["label"])
+    y_pred = clf.predict(vectorizer.transform(test_df["text"].astype(str)))
+
+    print(f":: Held-out test accuracy: {accuracy_score(test_df['label'], y_pred):.4f}")
+    print(f":: Held-out test macro-F1: {f1_score(test_df['label'], y_pred, average='macro', zero_division=0):.4f}")
+
+    joblib.dump(clf, MODEL_PATH)
+    joblib.dump(vectorizer, VECTORIZER_PATH)
+    print(f":: Model saved to {MODEL_PATH}")
+    print(f":: Vectorizer saved to {VECTORIZER_PATH}")
+
+    # predict.py needs probabilities for top-k/abstention; margin-only models get a calibrated copy
+    if not hasattr(clf, "predict_proba"):
+        calibrated = CalibratedClassifierCV(build_model(best["model"], json.loads(best["params"])), method="sigmoid", cv=3)
+        calibrated.fit(X_train, train_df["label"])
+        joblib.dump(calibrated, CALIBRATED_MODEL_PATH)
+        print(f":: Calibrated model saved to {CALIBRATED_MODEL_PATH}")
+
+# --- Entry point ---
+def main():
+    parser = argparse.ArgumentParser(description="Cross-validated sweep over vectorizer and model configs")
+    parser.add_argument("--folds", type=int, default=5, help="Stratified CV folds")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="Process pool size")
+    parser.add_argument("--cache-dir", default=CACHE_DIR, help="Directory for cached TF-IDF fold matrices")
+    parser.add_argument("--leaderboard", default=LEADERBOARD_PATH, help="Where to write the leaderboard CSV")
+    parser.add_argument("--no-export", action="store_true", help="Do not overwrite the exported model files")
+    args = parser.parse_args()
+
+    train_df = pd.read_csv(TRAIN_CSV)
+    test_df = pd.read_csv(TEST_CSV)
+    texts = train_df["text"].astype(str).to_numpy()
+    labels = train_df["label"].to_numpy()
+
+    cache_paths = build_feature_cache(texts, labels, VECTORIZER_CONFIGS, args.folds, args.cache_dir)
+
+    print(f":: Evaluating {len(VECTORIZER_CONFIGS) * len(MODEL_CONFIGS)} configurations on {args.workers} workers ...")
+    rows = []
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        futures = [
+            pool.submit(evaluate_pair, cache_paths[config_key(vec_config)], vec_config, name, params)
+            for vec_config in VECTORIZER_CONFIGS
+            for name, params in MODEL_CONFIGS
+        ]
+        for future in as_completed(futures):
+            row = future.result()
+            rows.append(row)
+            print(f"   ├── {row['model']:<18} F1={row['macro_f1']:.4f}  {row['vectorizer']}")
+
+    leaderboard = pd.DataFrame(rows).sort_values("macro_f1", ascending=False).reset_index(drop=True)
+    leaderboard["pareto"] = pareto_front(leaderboard)
+
+    Path(args.leaderboard).parent.mkdir(parents=True, exist_ok=True)
+    leaderboard.to_csv(args.leaderboard, index=False)
+    print(f"\n:: Leaderboard saved to {args.leaderboard}")
+    print(leaderboard.head(10).to_string(index=False))
+
+    # The leaderboard is sorted by F1, so the first Pareto row is the most accurate non-dominated model
+    best = leaderboard[leaderboard["pareto"]].iloc[0]
+    print(f"\n:: Pareto-best: {best['model']} {best['params']} with {best['vectorizer']}")
+
+    if not args.no_export:
+        export_best(best, train_df, test_df)
+
+if __name__ == "__main__":
+    main()
@@ -14,6 +14,7 @@ import pandas as pd
 from sklearn.linear_model import LogisticRegression
 from sklearn.naive_bayes import MultinomialNB
 from sklearn.svm import LinearSVC
+from sklearn.calibration import CalibratedClassifierCV
 from sklearn.preprocessing import LabelEncoder
 from sklearn.metrics import classification_report, confusion_matrix, accuracy_score
 
@@ -55,6 +56,16 @@ print("Classification Report:\n", classification_report(y_test, y_pred))
 joblib.dump(clf, "models/LinearSVC_model.pkl")
 print("Model saved to models/LinearSVC_model.pkl")
 
+# ------------------------------------------------------------------------------
+# Calibrate probabilities (used by predict.py for top-k labels and abstention)
+# ------------------------------------------------------------------------------
+
+calibrated = CalibratedClassifierCV(LinearSVC(class_weight="balanced"), method="sigmoid", cv=3)
+calibrated.fit(X_train, y_train)
+
+joblib.dump(calibrated, "models/LinearSVC_calibrated.pkl")
+print("Calibrated model saved to models/LinearSVC_calibrated.pkl")
+
 # ------------------------------------------------------------------------------
 # Log misclassified samples
 # ------------------------------------------------------------------------------
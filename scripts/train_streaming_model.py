@@ -0,0 +1,234 @@
+# Author: Sean Sjahrial
+# Title: Cybersecurity RAG Assistant – Streaming (Out-of-Core) Classifier
+# Description: Trains and incrementally updates the pentest paragraph classifier in minibatches.
+# GitHub: https://github.com/isnakie
+# License: MIT
+
+# ------------------------------------------------------------------------------
+# The baseline pipeline (vectorize_data.py -> train_baseline_model.py) fits a
+# TF-IDF vocabulary and a LinearSVC on the full dataset in memory, so every newly
+# labelled report forces a full retrain. This script uses a stateless
+# HashingVectorizer (no vocabulary to refit) and an SGD linear model trained with
+# partial_fit, so new CSVs can be folded into the existing model in minibatches
+# without reprocessing history.
+# ------------------------------------------------------------------------------
+
+"""
+Usage:
+
+Train from scratch on the prepared train split (streamed in chunks)
+> python scripts/train_streaming_model.py train
+
+Fold a newly labelled report into the existing streaming model
+> python scripts/train_streaming_model.py update data/processed/labeled_offsec-report.csv
+
+Reports whose reviewed labels live in another column; the model is only overwritten if test scores hold
+> python scripts/train_streaming_model.py update data/processed/labeled_tinder-report.csv --label-column "Final Labelling"
+
+Compare accuracy and training time against the TF-IDF + LinearSVC baseline
+> python scripts/train_streaming_model.py compare
+"""
+
+import argparse
+import json
+import time
+from pathlib import Path
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.feature_extraction.text import HashingVectorizer, TfidfVectorizer
+from sklearn.linear_model import SGDClassifier
+from sklearn.metrics import accuracy_score, f1_score
+from sklearn.svm import LinearSVC
+from sklearn.utils.class_weight import compute_class_weight
+
+# --- File paths ---
+TRAIN_CSV = "data/processed/train.csv"
+TEST_CSV = "data/processed/test.csv"
+LABEL_MAP_PATH = "models/label_map.json"
+MODEL_PATH = "models/SGD_streaming_model.pkl"
+VECTORIZER_PATH = "models/hashing_vectorizer.pkl"
+
+# --- Build the stateless vectorizer (mirrors the TF-IDF n-gram settings) ---
+def build_vectorizer(n_features=2 ** 18):
+    return HashingVectorizer(
+        n_features=n_features,    # Fixed feature space, no vocabulary to fit
+        ngram_range=(1, 3),       # Use unigrams, bigrams, and trigrams
+        stop_words="english",     # Remove common stopwords
+        alternate_sign=False,     # Keep features non-negative like TF-IDF
+        norm="l2",
+    )
+
+# --- Build an incrementally trainable linear SVM ---
+def build_model():
+    return SGDClassifier(loss="hinge", alpha=1e-4, random_state=42)
+
+# --- Known classes are fixed up front, partial_fit needs the full set on the first call ---
+def load_classes(label_map_path=LABEL_MAP_PATH):
+    with open(label_map_path) as f:
+        label_map = json.load(f)
+    return np.array([label_map[k] for k in sorted(label_map, key=int)])
+
+# --- Stream (text, label) minibatches from a CSV without loading it whole ---
+def iter_minibatches(csv_path, batch_size, classes, label_column="label"):
+    known = set(classes)
+    chunks = pd.read_csv(csv_path, usecols=["text", label_column], chunksize=batch_size, encoding_errors="replace")
+    for chunk in chunks:
+        chunk = chunk.rename(columns={label_column: "label"}).dropna(subset=["text", "label"])
+        unknown = chunk.loc[~chunk["label"].isin(known), "label"]
+        if len(unknown):
+            print(f":: Skipping {len(unknown)} rows with labels outside the label map: {sorted(unknown.unique())}")
+        chunk = chunk[chunk["label"].isin(known)]
+        if len(chunk):
+            yield chunk["text"].astype(str).tolist(), chunk["label"].to_numpy()
+
+# --- "Balanced" class weights over a whole CSV (one extra streaming pass, labels only) ---
+def balanced_weights(csv_path, classes, label_column="label"):
+    known = set(classes)
+    labels = pd.read_csv(csv_path, usecols=[label_column], encoding_errors="replace")[label_column].dropna()
+    labels = labels[labels.isin(known)].to_numpy()
+    if not len(labels):
+        return {}
+    present = np.unique(labels)
+    return dict(zip(present, compute_class_weight("balanced", classes=present, y=labels)))
+
+# --- Fold one CSV into the model, one minibatch at a time ---
+def partial_fit_csv(model, vectorizer, csv_path, classes, batch_size=256, epochs=1, label_column="label", balanced=False):
+    # A skewed report (e.g. mostly "Formatting" rows) would otherwise pull every boundary towards its majority class
+    weights = balanced_weights(csv_path, classes, label_column) if balanced else None
+    seen = 0
+    for _ in range(epochs):
+        for texts, labels in iter_minibatches(csv_path, batch_size, classes, label_column):
+            X = vectorizer.transform(texts)
+            sample_weight = np.array([weights[label] for label in labels]) if weights else None
+            model.partial_fit(X, labels, classes=classes, sample_weight=sample_weight)
+            seen += len(labels)
+    return seen
+
+# --- Evaluate a fitted model on the held-out test split ---
+def evaluate(model, vectorizer, test_csv=TEST_CSV):
+    test_df = pd.read_csv(test_csv)
+    y_pred = model.predict(vectorizer.transform(test_df["text"].astype(str)))
+    return {
+        "accuracy": accuracy_score(test_df["label"], y_pred),
+        "macro_f1": f1_score(test_df["label"], y_pred, average="macro", zero_division=0),
+    }
+
+def train(args):
+    classes = load_classes()
+    vectorizer = build_vectorizer()
+    model = build_model()
+
+    print(f":: Streaming {args.train_csv} in minibatches of {args.batch_size} ...")
+    start = time.perf_counter()
+    seen = partial_fit_csv(model, vectorizer, args.train_csv, classes, args.batch_size, args.epochs)
+    elapsed = time.perf_counter() - start
+
+    joblib.dump(model, MODEL_PATH)
+    joblib.dump(vectorizer, VECTORIZER_PATH)
+    print(f":: Trained on {seen} rows in {elapsed:.2f}s")
+    print(f":: Model saved to {MODEL_PATH}")
+    print(f":: Vectorizer saved to {VECTORIZER_PATH}")
+
+    scores = evaluate(model, vectorizer)
+    print(f":: Accuracy: {scores['accuracy']:.4f}  Macro-F1: {scores['macro_f1']:.4f}")
+
+def update(args):
+    model = joblib.load(MODEL_PATH)
+    vectorizer = joblib.load(VECTORIZER_PATH)
+    classes = model.classes_
+    before = evaluate(model, vectorizer)
+    print(f":: Before update  Accuracy: {before['accuracy']:.4f}  Macro-F1: {before['macro_f1']:.4f}")
+
+    for csv_path in args.csv_files:
+        print(f":: Folding {csv_path} ({args.label_column!r} column) into the streaming model ...")
+        start = time.perf_counter()
+        seen = partial_fit_csv(model, vectorizer, csv_path, classes, args.batch_size, args.epochs,
+                               args.label_column, balanced=not args.no_balance)
+        print(f":: Updated on {seen} rows in {time.perf_counter() - start:.2f}s")
+
+    after = evaluate(model, vectorizer)
+    print(f":: After update   Accuracy: {after['accuracy']:.4f}  Macro-F1: {after['macro_f1']:.4f}")
+
+    # The saved model is only replaced when the held-out scores do not get worse
+    output = args.output or MODEL_PATH
+    regressed = after["accuracy"] < before["accuracy"] or after["macro_f1"] < before["macro_f1"]
+    if regressed and output == MODEL_PATH and not args.force:
+        print(f":: !! Update lowers test scores; {MODEL_PATH} left unchanged "
+              "(use --output to save the updated model elsewhere, or --force to overwrite)")
+        return
+
+    joblib.dump(model, output)
+    print(f":: Model saved to {output}")
+
+def compare(args):
+    train_df = pd.read_csv(args.train_csv)
+    test_df = pd.read_csv(TEST_CSV)
+    rows = []
+
+    # Baseline: full in-memory TF-IDF fit + LinearSVC (same settings as vectorize_data.py)
+    start = time.perf_counter()
+    tfidf = TfidfVectorizer(max_features=10000, ngram_range=(1, 3), min_df=2, stop_words="english")
+    X_train = tfidf.fit_transform(train_df["text"].astype(str))
+    svc = LinearSVC(class_weight="balanced").fit(X_train, train_df["label"])
+    baseline_time = time.perf_counter() - start
+    y_pred = svc.predict(tfidf.transform(test_df["text"].astype(str)))
+    rows.append({
+        "model": "TF-IDF + LinearSVC (baseline)",
+        "train_seconds": baseline_time,
+        "accuracy": accuracy_score(test_df["label"], y_pred),
+        "macro_f1": f1_score(test_df["label"], y_pred, average="macro", zero_division=0),
+    })
+
+    # Streaming: hashing features + SGD partial_fit over minibatches
+    classes = load_classes()
+    vectorizer = build_vectorizer()
+    model = build_model()
+    start = time.perf_counter()
+    partial_fit_csv(model, vectorizer, args.train_csv, classes, args.batch_size, args.epochs)
+    streaming_time = time.perf_counter() - start
+    rows.append({
+        "model": f"Hashing + SGD partial_fit (batch={args.batch_size}, epochs={args.epochs})",
+        "train_seconds": streaming_time,
+        **evaluate(model, vectorizer),
+    })
+
+    print("\n:: Baseline vs streaming")
+    print(pd.DataFrame(rows).to_string(index=False, float_format=lambda v: f"{v:.4f}"))
+
+# --- Entry point ---
+def main():
+    parser = argparse.ArgumentParser(description="Out-of-core training for the pentest paragraph classifier")
+    parser.add_argument("--batch-size", type=int, default=256, help="Rows per partial_fit minibatch")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    train_parser = subparsers.add_parser("train", help="Train a new streaming model from scratch")
+    train_parser.add_argument("--train-csv", default=TRAIN_CSV, help="Labelled CSV with text,label columns")
+    train_parser.add_argument("--epochs", type=int, default=5, help="Passes over the training CSV")
+
+    update_parser = subparsers.add_parser("update", help="Fold new labelled CSVs into the existing model")
+    update_parser.add_argument("csv_files", nargs="+", help="Labelled CSVs with text and label columns")
+    update_parser.add_argument("--label-column", default="label", help='Column holding the labels (e.g. "Final Labelling")')
+    update_parser.add_argument("--no-balance", action="store_true", help="Do not weight rows by inverse class frequency")
+    update_parser.add_argument("--output", default=None, help=f"Where to save the updated model (default: {MODEL_PATH})")
+    update_parser.add_argument("--force", action="store_true", help=f"Overwrite {MODEL_PATH} even if test scores drop")
+    # A single pass by default: repeated passes over one small report overwrite what was learned from history
+    update_parser.add_argument("--epochs", type=int, default=1, help="Passes over each new CSV")
+
+    compare_parser = subparsers.add_parser("compare", help="Compare against the TF-IDF + LinearSVC baseline")
+    compare_parser.add_argument("--train-csv", default=TRAIN_CSV, help="Labelled CSV with text,label columns")
+    compare_parser.add_argument("--epochs", type=int, default=5, help="Passes over the training CSV")
+
+    args = parser.parse_args()
+    Path(MODEL_PATH).parent.mkdir(parents=True, exist_ok=True)
+
+    if args.command == "train":
+        train(args)
+    elif args.command == "update":
+        update(args)
+    elif args.command == "compare":
+        compare(args)
+
+if __name__ == "__main__":
+    main()
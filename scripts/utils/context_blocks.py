@@ -0,0 +1,133 @@
+# Author: Sean Sjahrial
+# Title: Cybersecurity RAG Assistant
+# Description: Part of UC Berkeley MICS Machine Learning Course (2025)
+# GitHub: https://github.com/isnakie
+# Description: Prompt-ready context blocks. Each entry's block (header line plus normalized, truncated and
+# indented text) depends only on the entry, so ingest formats it once and stores it in the metadata with
+# its character and approximate token length; query-time assembly then only concatenates stored strings.
+# License: MIT
+
+"""
+Usage:
+
+Add blocks to an existing metadata pickle without re-embedding (ingest does this on every build)
+> python -m scripts.utils.context_blocks backfill --metadata data/embeddings/combined_metadata.pkl
+
+Measure per-query context assembly with and without precomputed blocks
+> python -m scripts.utils.context_blocks benchmark --queries 2000 --k 5
+"""
+
+import argparse
+import pickle
+import re
+import textwrap
+import time
+
+import numpy as np
+
+MAX_BLOCK_TEXT_CHARS = 1800
+
+# Rough LLM token count (words and punctuation); good enough for budgeting, not an exact tokenizer
+TOKEN_RE = re.compile(r"\w+|[^\w\s]")
+
+# --- Helper function to strip extra whitespace and truncate long text blocks
+def clean_text(text, max_chars=MAX_BLOCK_TEXT_CHARS):
+    return " ".join(text.split())[:max_chars]
+
+def count_tokens(text):
+    return len(TOKEN_RE.findall(text))
+
+def format_block(entry, max_chars=MAX_BLOCK_TEXT_CHARS):
+    """Readable block for one metadata entry: a header line, then the cleaned text indented."""
+    header = f"[{entry.get('source', 'Unknown')}] {entry.get('id', 'N/A')} - {entry.get('title', 'Untitled')}"
+    if entry.get("duplicate_ids"):
+        # Near-duplicate rules collapsed into this entry at ingest (--dedup)
+        header += f" (also: {', '.join(map(str, entry['duplicate_ids']))})"
+    return f"{header}\n{textwrap.indent(clean_text(entry.get('text', ''), max_chars), '  ')}"
+
+def add_context_blocks(metadata):
+    """Ingest stage: store each entry's block and its lengths in the entry itself."""
+    for entry in metadata:
+        block = format_block(entry)
+        entry["context_block"] = block
+        entry["context_chars"] = len(block)
+        entry["context_tokens"] = count_tokens(block)
+    return metadata
+
+def context_block(entry):
+    """(block, chars) for an entry; formatted on the fly for metadata built before blocks were stored."""
+    if "context_block" in entry:
+        return entry["context_block"], entry["context_chars"]
+    block = format_block(entry)
+    return block, len(block)
+
+def select_blocks(hits, max_context_chars=3500, skip=()):
+    """
+    (key, block) for the best-ranked entries that fit max_context_chars, keyed by (source, id).
+    Entries whose key is in skip are left out; selection stops at the first block that does not fit.
+    """
+    blocks = []
+    total_chars = 0
+    for entry, _ in hits:
+        key = (str(entry.get("source", "Unknown")), str(entry.get("id", "N/A")))
+        if key in skip:
+            continue
+        block, block_chars = context_block(entry)
+
+        # Enforce total character limit to stay within LLM context window
+        if total_chars + block_chars > max_context_chars:
+            break
+        blocks.append((key, block))
+        total_chars += block_chars
+    return blocks
+
+def benchmark(metadata, queries, k, max_context_chars, seed=0):
+    """Per-query assembly time for random top-k hit lists, formatting on the fly vs using stored blocks."""
+    rng = np.random.default_rng(seed)
+    hit_lists = [[(metadata[i], 0.0) for i in rng.choice(len(metadata), size=k, replace=False)] for _ in range(queries)]
+    fields = ("context_block", "context_chars", "context_tokens")
+    bare = {id(entry): {key: value for key, value in entry.items() if key not in fields} for entry in metadata}
+    bare_lists = [[(bare[id(entry)], score) for entry, score in hits] for hits in hit_lists]
+    for entry in metadata:
+        if "context_block" not in entry:
+            add_context_blocks([entry])
+
+    def run(lists):
+        start = time.process_time()
+        results = [select_blocks(hits, max_context_chars) for hits in lists]
+        return (time.process_time() - start) * 1e6 / len(lists), results
+
+    run(bare_lists[:50])  # warm-up
+    before_us, before = run(bare_lists)
+    after_us, after = run(hit_lists)
+    assert before == after, "precomputed blocks differ from on-the-fly formatting"
+
+    print(f"\n:: {queries} queries, top-{k}, {max_context_chars}-char budget (CPU time per query)")
+    print(f"   ├── format on the fly   {before_us:>9.1f} µs")
+    print(f"   ├── precomputed blocks  {after_us:>9.1f} µs")
+    print(f"   └── saved               {before_us - after_us:>9.1f} µs ({1 - after_us / before_us:.0%})")
+
+def main():
+    parser = argparse.ArgumentParser(description="Precompute and benchmark prompt-ready context blocks")
+    parser.add_argument("command", choices=["backfill", "benchmark"])
+    parser.add_argument("--metadata", default="data/embeddings/combined_metadata.pkl", help="Metadata pickle")
+    parser.add_argument("--queries", type=int, default=2000, help="Simulated queries for benchmark")
+    parser.add_argument("--k", type=int, default=5, help="Hits per query")
+    parser.add_argument("--max-context-chars", type=int, default=3500, help="Context budget per prompt")
+    args = parser.parse_args()
+
+    with open(args.metadata, "rb") as f:
+        metadata = pickle.load(f)
+
+    if args.command == "backfill":
+        add_context_blocks(metadata)
+        with open(args.metadata, "wb") as f:
+            pickle.dump(metadata, f)
+        tokens = [entry["context_tokens"] for entry in metadata]
+        print(f":: Added context blocks to {len(metadata)} entries in {args.metadata} "
+              f"(mean {np.mean(tokens):.0f} tokens, max {max(tokens)})")
+    else:
+        benchmark(metadata, args.queries, args.k, args.max_context_chars)
+
+if __name__ == "__main__":
+    main()
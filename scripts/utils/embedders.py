@@ -0,0 +1,396 @@
+# Author: Sean Sjahrial
+# Title: Cybersecurity RAG Assistant
+# Description: Part of UC Berkeley MICS Machine Learning Course (2025)
+# GitHub: https://github.com/isnakie
+# Description: Pluggable sentence-embedding backends for the ingest and query scripts. "torch" is the
+# original eager SentenceTransformer path; "onnx" runs the same transformer exported to ONNX (optionally
+# int8-quantized) under ONNX Runtime with a fixed thread configuration.
+# License: MIT
+
+"""
+Usage:
+
+Export the model to ONNX (and an int8-quantized copy)
+> python -m scripts.utils.embedders export --quantize
+
+Check that ONNX embeddings still match the vectors stored in an existing index
+> python -m scripts.utils.embedders check --backend onnx --quantize
+
+Compare single-query latency and batch throughput against the PyTorch path
+> python -m scripts.utils.embedders benchmark --threads 4
+
+Compare registered models: index build time, query latency and known-item retrieval quality
+> python -m scripts.utils.embedders compare --models mpnet minilm
+
+List registered models
+> python -m scripts.utils.embedders models
+"""
+
+import argparse
+import json
+import os
+import time
+from pathlib import Path
+
+import numpy as np
+
+# --- Model registry: short aliases for the embedding models an index may be built with ---
+MODEL_REGISTRY = {
+    "mpnet": {"name": "all-mpnet-base-v2", "dimension": 768, "notes": "default, best retrieval quality"},
+    "minilm": {"name": "all-MiniLM-L6-v2", "dimension": 384, "notes": "~5x faster encoding, half-size index"},
+    "minilm-l12": {"name": "all-MiniLM-L12-v2", "dimension": 384, "notes": "between MiniLM-L6 and mpnet"},
+    "bge-small": {"name": "BAAI/bge-small-en-v1.5", "dimension": 384, "notes": "small, strong on retrieval"},
+}
+DEFAULT_MODEL = MODEL_REGISTRY["mpnet"]["name"]
+ONNX_DIR = "models/onnx"
+BACKENDS = ("torch", "onnx")
+
+# Cosine similarity below which query vectors are no longer interchangeable with the index vectors
+MIN_INDEX_COSINE = 0.99
+
+def resolve_model(model):
+    """Registry alias -> model name; full names and local paths pass through unchanged."""
+    return MODEL_REGISTRY[model]["name"] if model in MODEL_REGISTRY else model
+
+# --- Each index records the model that built it ---
+def index_info_path(index_path):
+    return Path(index_path).with_suffix(".model.json")
+
+def write_index_info(index_path, model_name, dimension, **extra):
+    with open(index_info_path(index_path), "w") as f:
+        json.dump({"model": model_name, "dimension": dimension, **extra}, f, indent=4)
+
+def index_model(index_path=None, manifest=None):
+    """Model an index was built with, from its snapshot manifest or the sidecar next to a flat index."""
+    if manifest is not None:
+        return manifest["model"]
+    info_path = index_info_path(index_path)
+    if info_path.exists():
+        with open(info_path) as f:
+            return json.load(f)["model"]
+    return DEFAULT_MODEL  # indexes built before the registry all used mpnet
+
+def check_model_matches(requested, built_with):
+    if requested and resolve_model(requested) != built_with:
+        raise ValueError(
+            f"Index was built with {built_with} but {resolve_model(requested)} was requested; "
+            "rebuild the index with that model or drop --model to use the index's own"
+        )
+
+def onnx_dir_for(model_name, onnx_dir=ONNX_DIR):
+    return Path(onnx_dir) / Path(model_name).name
+
+def pooling_mode(pooling):
+    config = pooling.get_config_dict()
+    mode = config.get("pooling_mode") or ("cls" if config.get("pooling_mode_cls_token") else "mean")
+    if mode not in ("cls", "mean"):
+        raise ValueError(f"Unsupported pooling mode for ONNX export: {mode}")
+    return mode
+
+# --- Export the SentenceTransformer's transformer to ONNX; pooling/normalization stay in numpy ---
+def export_onnx(model_name=DEFAULT_MODEL, onnx_dir=ONNX_DIR, quantize=False):
+    import torch
+    from sentence_transformers import SentenceTransformer
+    from sentence_transformers.models import Normalize, Pooling
+
+    out_dir = onnx_dir_for(model_name, onnx_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+
+    print(f":: Loading {model_name} for export ...")
+    model = SentenceTransformer(model_name, device="cpu")
+    transformer = model[0].auto_model.eval()
+    pooling = next(m for m in model if isinstance(m, Pooling))
+
+    class LastHiddenState(torch.nn.Module):
+        def __init__(self, inner):
+            super().__init__()
+            self.inner = inner
+
+        def forward(self, input_ids, attention_mask):
+            return self.inner(input_ids=input_ids, attention_mask=attention_mask).last_hidden_state
+
+    sample = model.tokenizer(["export sample", "a longer export sample sentence"], padding=True, return_tensors="pt")
+    onnx_path = out_dir / "model.onnx"
+    print(f":: Exporting transformer to {onnx_path} ...")
+    torch.onnx.export(
+        LastHiddenState(transformer),
+        (sample["input_ids"], sample["attention_mask"]),
+        str(onnx_path),
+        input_names=["input_ids", "attention_mask"],
+        output_names=["last_hidden_state"],
+        dynamic_axes={
+            "input_ids": {0: "batch", 1: "sequence"},
+            "attention_mask": {0: "batch", 1: "sequence"},
+            "last_hidden_state": {0: "batch", 1: "sequence"},
+        },
+        opset_version=17,
+        dynamo=False,
+    )
+
+    model.tokenizer.save_pretrained(str(out_dir))
+    config = {
+        "model_name": model_name,
+        "dimension": model.get_sentence_embedding_dimension(),
+        "max_seq_length": model.max_seq_length,
+        "pooling": pooling_mode(pooling),
+        "normalize": any(isinstance(m, Normalize) for m in model),
+    }
+    with open(out_dir / "embedder_config.json", "w") as f:
+        json.dump(config, f, indent=4)
+
+    if quantize:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        quantized_path = out_dir / "model_int8.onnx"
+        print(f":: Writing int8-quantized copy to {quantized_path} ...")
+        quantize_dynamic(str(onnx_path), str(quantized_path), weight_type=QuantType.QInt8)
+
+    print(f":: ONNX export complete: {out_dir}")
+    return out_dir
+
+class OnnxEmbedder:
+    """Drop-in for SentenceTransformer.encode backed by an ONNX Runtime session."""
+
+    def __init__(self, model_name=DEFAULT_MODEL, onnx_dir=ONNX_DIR, quantize=False, threads=None):
+        import onnxruntime as ort
+        from transformers import AutoTokenizer
+
+        model_dir = onnx_dir_for(model_name, onnx_dir)
+        onnx_path = model_dir / ("model_int8.onnx" if quantize else "model.onnx")
+        if not onnx_path.exists():
+            raise FileNotFoundError(
+                f"{onnx_path} not found. Run: python -m scripts.utils.embedders export --model {model_name}"
+                + (" --quantize" if quantize else "")
+            )
+
+        with open(model_dir / "embedder_config.json") as f:
+            self.config = json.load(f)
+        self.tokenizer = AutoTokenizer.from_pretrained(str(model_dir))
+
+        # Fixed thread configuration: intra-op threads for the matmuls, no inter-op parallelism
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = threads or os.cpu_count()
+        options.inter_op_num_threads = 1
+        options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(str(onnx_path), options, providers=["CPUExecutionProvider"])
+        self.model_name = model_name
+        self.quantized = quantize
+
+    def get_sentence_embedding_dimension(self):
+        return self.config["dimension"]
+
+    def encode(self, sentences, batch_size=32, show_progress_bar=False, convert_to_numpy=True, **kwargs):
+        single = isinstance(sentences, str)
+        sentences = [sentences] if single else list(sentences)
+
+        # Sort by length so each batch pads to a similar sequence length (as SentenceTransformer does)
+        order = np.argsort([-len(s) for s in sentences])
+        batches = range(0, len(sentences), batch_size)
+        if show_progress_bar:
+            from tqdm import tqdm
+            batches = tqdm(batches, desc="Batches")
+
+        embeddings = np.empty((len(sentences), self.config["dimension"]), dtype=np.float32)
+        for start in batches:
+            idx = order[start:start + batch_size]
+            tokens = self.tokenizer(
+                [sentences[i] for i in idx],
+                padding=True,
+                truncation=True,
+                max_length=self.config["max_seq_length"],
+                return_tensors="np",
+            )
+            mask = tokens["attention_mask"].astype(np.int64)
+            hidden = self.session.run(
+                ["last_hidden_state"],
+                {"input_ids": tokens["input_ids"].astype(np.int64), "attention_mask": mask},
+            )[0]
+
+            if self.config["pooling"] == "cls":
+                pooled = hidden[:, 0]
+            else:
+                weights = mask[..., None].astype(np.float32)
+                pooled = (hidden * weights).sum(axis=1) / np.clip(weights.sum(axis=1), 1e-9, None)
+            if self.config["normalize"]:
+                pooled = pooled / np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+            embeddings[idx] = pooled
+
+        return embeddings[0] if single else embeddings
+
+# --- Entry point used by the ingest and query scripts ---
+def load_embedder(model_name=DEFAULT_MODEL, backend="torch", quantize=False, threads=None):
+    model_name = resolve_model(model_name)
+    if backend == "onnx":
+        print(f":: Loading ONNX embedder: {model_name}{' (int8)' if quantize else ''} ...")
+        return OnnxEmbedder(model_name, quantize=quantize, threads=threads)
+
+    import torch
+    from sentence_transformers import SentenceTransformer
+
+    if threads:
+        torch.set_num_threads(threads)
+    print(f":: Loading sentence transformer model: {model_name} ...")
+    return SentenceTransformer(model_name, device="cpu")
+
+class EmbedderCache:
+    """Loads each model once; attach() is the snapshot hook that pairs a snapshot with its model."""
+
+    def __init__(self, backend="torch", quantize=False, threads=None):
+        self.backend = backend
+        self.quantize = quantize
+        self.threads = threads
+        self.loaded = {}
+
+    def get(self, model_name):
+        model_name = resolve_model(model_name)
+        if model_name not in self.loaded:
+            self.loaded[model_name] = load_embedder(model_name, self.backend, self.quantize, self.threads)
+        return self.loaded[model_name]
+
+    def attach(self, snapshot):
+        embedder = self.get(snapshot["manifest"]["model"])
+        if embedder.get_sentence_embedding_dimension() != snapshot["index"].d:
+            raise ValueError(f"{snapshot['manifest']['model']} does not produce {snapshot['index'].d}-d vectors")
+        snapshot["embedder"] = embedder
+
+def check_index_compatibility(embedder, index, metadata, sample=32, min_cosine=MIN_INDEX_COSINE):
+    """
+    Re-embed a sample of indexed texts and compare against the stored vectors. Returns a report
+    with the mean/min cosine similarity and whether the index should be rebuilt for this embedder.
+    """
+    if embedder.get_sentence_embedding_dimension() != index.d:
+        return {"dimension_match": False, "rebuild_required": True}
+
+    ids = np.linspace(0, index.ntotal - 1, num=min(sample, index.ntotal), dtype=np.int64)
+    stored = np.vstack([index.reconstruct(int(i)) for i in ids])
+    fresh = np.asarray(embedder.encode([metadata[i]["text"] for i in ids]), dtype=np.float32)
+
+    def unit(v):
+        return v / np.clip(np.linalg.norm(v, axis=1, keepdims=True), 1e-12, None)
+
+    cosine = (unit(stored) * unit(fresh)).sum(axis=1)
+    return {
+        "dimension_match": True,
+        "mean_cosine": float(cosine.mean()),
+        "min_cosine": float(cosine.min()),
+        "max_abs_diff": float(np.abs(stored - fresh).max()),
+        "rebuild_required": bool(cosine.min() < min_cosine),
+    }
+
+def benchmark(model_name, threads, batch_size, texts, repeats):
+    configs = [("torch", False), ("onnx", False), ("onnx", True)]
+    query = "How should passwords be stored to prevent offline cracking?"
+    print(f"\n   {'backend':<14}{'single p50 ms':>15}{'single p95 ms':>15}{'batch docs/s':>15}")
+
+    for backend, quantize in configs:
+        try:
+            embedder = load_embedder(model_name, backend, quantize, threads)
+        except FileNotFoundError as e:
+            print(f"   {backend + (' int8' if quantize else ''):<14} skipped: {e}")
+            continue
+
+        embedder.encode([query])  # warm-up
+        single = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            embedder.encode([query])
+            single.append((time.perf_counter() - start) * 1000)
+
+        start = time.perf_counter()
+        embedder.encode(texts, batch_size=batch_size)
+        throughput = len(texts) / (time.perf_counter() - start)
+
+        name = backend + (" int8" if quantize else "")
+        print(f"   {name:<14}{np.percentile(single, 50):>15.2f}{np.percentile(single, 95):>15.2f}{throughput:>15.1f}")
+
+def compare_models(models, metadata, k=5, limit=200, batch_size=32, backend="torch", threads=None):
+    """Build a flat index per model and report build time, index size, query latency and hit@k / MRR."""
+    import faiss
+
+    from scripts.query.rerank import known_item_queries
+
+    texts = [entry["text"] for entry in metadata]
+    queries = known_item_queries(metadata, limit)
+    rows = []
+
+    for model in models:
+        model_name = resolve_model(model)
+        embedder = load_embedder(model_name, backend, threads=threads)
+
+        start = time.perf_counter()
+        embeddings = np.asarray(embedder.encode(texts, batch_size=batch_size), dtype="float32")
+        index = faiss.IndexFlatL2(embeddings.shape[1])
+        index.add(embeddings)
+        build_s = time.perf_counter() - start
+        size_mb = len(faiss.serialize_index(index)) / 1e6
+
+        embedder.encode([queries[0][0]])  # warm-up
+        latencies, hits, reciprocal_ranks = [], 0, []
+        for query, target in queries:
+            start = time.perf_counter()
+            _, I = index.search(np.asarray(embedder.encode([query]), dtype="float32"), k)
+            latencies.append((time.perf_counter() - start) * 1000)
+            ranked = list(I[0])
+            hits += target in ranked
+            reciprocal_ranks.append(1.0 / (ranked.index(target) + 1) if target in ranked else 0.0)
+
+        rows.append((model_name, index.d, build_s, size_mb, np.percentile(latencies, 50), np.percentile(latencies, 95),
+                     hits / len(queries), float(np.mean(reciprocal_ranks))))
+
+    print(f"\n:: {len(texts)} entries, {len(queries)} known-item title queries, k={k}")
+    print(f"   {'model':<26}{'dim':>5}{'build s':>9}{'size MB':>9}{'p50 ms':>8}{'p95 ms':>8}{'hit@k':>7}{'MRR':>7}")
+    for name, dim, build_s, size_mb, p50, p95, hit_rate, mrr in rows:
+        print(f"   {name:<26}{dim:>5}{build_s:>9.2f}{size_mb:>9.2f}{p50:>8.2f}{p95:>8.2f}{hit_rate:>7.3f}{mrr:>7.3f}")
+
+def main():
+    import faiss
+    import pickle
+
+    parser = argparse.ArgumentParser(description="Export, check and benchmark embedding backends")
+    parser.add_argument("command", choices=["export", "check", "benchmark", "compare", "models"])
+    parser.add_argument("--model", default=None, help="Model name or registry alias (default: the index's model)")
+    parser.add_argument("--models", nargs="+", default=["mpnet", "minilm"], help="Models for compare")
+    parser.add_argument("--k", type=int, default=5, help="Top-k for compare")
+    parser.add_argument("--backend", choices=BACKENDS, default="onnx", help="Backend to check")
+    parser.add_argument("--quantize", action="store_true", help="Export/use the int8-quantized ONNX model")
+    parser.add_argument("--threads", type=int, default=None, help="Intra-op threads (default: all cores)")
+    parser.add_argument("--batch-size", type=int, default=32, help="Batch size for throughput runs")
+    parser.add_argument("--repeats", type=int, default=50, help="Single-query timing repeats")
+    parser.add_argument("--index", default="data/embeddings/combined_faiss.index", help="Path to FAISS index")
+    parser.add_argument("--metadata", default="data/embeddings/combined_metadata.pkl", help="Path to metadata pickle")
+    args = parser.parse_args()
+
+    if args.command == "models":
+        for alias, info in MODEL_REGISTRY.items():
+            print(f"   {alias:<12}{info['name']:<26}{info['dimension']:>5}  {info['notes']}")
+        return
+
+    model_name = resolve_model(args.model) if args.model else index_model(args.index)
+    if args.command == "export":
+        export_onnx(model_name, quantize=args.quantize)
+        return
+
+    with open(args.metadata, "rb") as f:
+        metadata = pickle.load(f)
+    if args.command == "compare":
+        compare_models(args.models, metadata, args.k, batch_size=args.batch_size, threads=args.threads)
+        return
+
+    index = faiss.read_index(args.index)
+
+    if args.command == "check":
+        embedder = load_embedder(model_name, args.backend, args.quantize, args.threads)
+        report = check_index_compatibility(embedder, index, metadata)
+        print(json.dumps(report, indent=4))
+        if report["rebuild_required"]:
+            print(":: !! Embeddings differ from the stored index vectors, rebuild the index for this backend")
+        else:
+            print(":: Backend is compatible with the existing index")
+        return
+
+    texts = [entry["text"] for entry in metadata]
+    benchmark(model_name, args.threads, args.batch_size, texts, args.repeats)
+
+if __name__ == "__main__":
+    main()
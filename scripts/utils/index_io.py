@@ -0,0 +1,102 @@
+# Author: Sean Sjahrial
+# Title: Cybersecurity RAG Assistant
+# Description: Part of UC Berkeley MICS Machine Learning Course (2025)
+# GitHub: https://github.com/isnakie
+# Description: FAISS index loading with an optional read-only memory-mapped mode. Mapped vectors live in
+# the OS page cache instead of each process's heap, so query workers on one host share a single copy.
+# License: MIT
+
+"""
+Usage:
+
+> from scripts.utils.index_io import load_index
+> index = load_index("data/embeddings/combined_faiss.index", mmap=True)
+> D, I = index.search(query_vecs, 5)
+"""
+
+import os
+import struct
+
+import numpy as np
+
+# fourcc -> metric for the flat index types written by faiss.write_index
+FLAT_FOURCC = {b"IxF2": "l2", b"IxFI": "ip"}
+
+# faiss reports missing results (k > ntotal) with id -1 and the worst possible float32 distance
+FLT_MAX = np.finfo(np.float32).max
+
+def read_fourcc(path):
+    with open(path, "rb") as f:
+        return f.read(4)
+
+class MemmapFlatIndex:
+    """
+    Read-only flat index over the vectors of a faiss IndexFlatL2/IP file, mapped with np.memmap.
+    Implements the parts of the faiss API the query scripts use (d, ntotal, search, reconstruct).
+    """
+
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            header = f.read(16)
+        fourcc = header[:4]
+        if fourcc not in FLAT_FOURCC:
+            raise ValueError(f"{path} is not a flat FAISS index (fourcc {fourcc!r})")
+        self.d, self.ntotal = struct.unpack("<iq", header[4:16])
+        self.metric = FLAT_FOURCC[fourcc]
+
+        # The flat codes (ntotal x d float32) are the last block of the file
+        code_bytes = self.ntotal * self.d * 4
+        offset = os.path.getsize(path) - code_bytes
+        self.vectors = np.memmap(path, dtype=np.float32, mode="r", offset=offset, shape=(self.ntotal, self.d))
+        # Squared norms are the only per-process copy (ntotal floats) and make L2 a single matmul
+        self.norms = np.einsum("ij,ij->i", self.vectors, self.vectors) if self.metric == "l2" else None
+
+    def search(self, queries, k):
+        queries = np.asarray(queries, dtype=np.float32)
+        scores = queries @ self.vectors.T
+        if self.metric == "l2":
+            scores = self.norms[None, :] - 2 * scores + np.einsum("ij,ij->i", queries, queries)[:, None]
+        else:
+            scores = -scores  # inner product: larger is better
+
+        k_eff = min(k, self.ntotal)
+        top = np.argpartition(scores, k_eff - 1, axis=1)[:, :k_eff]
+        order = np.take_along_axis(scores, top, axis=1).argsort(axis=1)
+        I = np.take_along_axis(top, order, axis=1)
+        D = np.take_along_axis(scores, I, axis=1)
+        if self.metric == "ip":
+            D = -D
+
+        # Pad like faiss when k exceeds the index size
+        if k_eff < k:
+            worst = FLT_MAX if self.metric == "l2" else -FLT_MAX
+            I = np.hstack([I, np.full((len(I), k - k_eff), -1)])
+            D = np.hstack([D, np.full((len(D), k - k_eff), worst, dtype=np.float32)])
+        return D.astype(np.float32), I.astype(np.int64)
+
+    def reconstruct(self, i):
+        return np.array(self.vectors[i])
+
+def load_index(path, mmap=False):
+    """
+    faiss.read_index, or with mmap=True a read-only mapping of the file. Uses faiss' in-place
+    mapping of flat codes (IO_FLAG_MMAP_IFC) when this faiss build has it, else MemmapFlatIndex.
+    Index types that can be mapped neither way are read into memory with a warning.
+    """
+    import faiss
+
+    path = str(path)
+    if not mmap:
+        return faiss.read_index(path)
+
+    fourcc = read_fourcc(path)
+    if hasattr(faiss, "IO_FLAG_MMAP_IFC"):
+        try:
+            return faiss.read_index(path, faiss.IO_FLAG_MMAP_IFC | faiss.IO_FLAG_READ_ONLY)
+        except RuntimeError:
+            if fourcc in FLAT_FOURCC:
+                raise  # flat codes always map, so this is a truncated or corrupt file
+    if fourcc in FLAT_FOURCC:
+        return MemmapFlatIndex(path)
+    print(f":: !! {path} (fourcc {fourcc!r}) cannot be memory-mapped by this faiss build; loading it into memory")
+    return faiss.read_index(path)
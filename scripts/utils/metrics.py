@@ -0,0 +1,192 @@
+# Author: Sean Sjahrial
+# Title: Cybersecurity RAG Assistant
+# Description: Part of UC Berkeley MICS Machine Learning Course (2025)
+# GitHub: https://github.com/isnakie
+# Description: Lightweight per-stage latency instrumentation for the RAG query and ingest paths.
+# Stage timers feed fixed-bucket histograms that can be scraped as Prometheus text from a small HTTP
+# endpoint or dumped to JSON periodically. A per-thread trace records the stage breakdown of one query.
+# License: MIT
+
+"""
+Usage:
+
+> from scripts.utils.metrics import timed, start_trace, end_trace, format_trace
+> start_trace()
+> with timed("embed") as t:
+>     vec = embedder.encode([question])
+> print(format_trace(end_trace()))
+
+Expose metrics while a query script runs
+> python -m scripts.query.query_with_lm_studio --metrics-port 9464 --trace
+> curl http://localhost:9464/metrics
+"""
+
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Histogram upper bounds in milliseconds (Prometheus output converts to seconds)
+BUCKETS_MS = (1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000, 60000)
+
+_lock = threading.Lock()
+_histograms = {}
+_local = threading.local()
+
+def _new_histogram():
+    return {"buckets": [0] * len(BUCKETS_MS), "count": 0, "sum_ms": 0.0, "max_ms": 0.0}
+
+def observe(stage, elapsed_ms):
+    """Record one stage duration in its histogram (and in the current thread's trace, if any)."""
+    with _lock:
+        hist = _histograms.setdefault(stage, _new_histogram())
+        for i, bound in enumerate(BUCKETS_MS):
+            if elapsed_ms <= bound:
+                hist["buckets"][i] += 1
+                break
+        hist["count"] += 1
+        hist["sum_ms"] += elapsed_ms
+        hist["max_ms"] = max(hist["max_ms"], elapsed_ms)
+
+    trace = getattr(_local, "trace", None)
+    if trace is not None:
+        trace.append((stage, elapsed_ms))
+
+class StageTimer:
+    __slots__ = ("stage", "ms")
+
+    def __init__(self, stage):
+        self.stage = stage
+        self.ms = 0.0
+
+@contextmanager
+def timed(stage):
+    """Time the enclosed block as `stage`; the yielded timer's .ms holds the duration afterwards."""
+    timer = StageTimer(stage)
+    start = time.perf_counter()
+    try:
+        yield timer
+    finally:
+        timer.ms = (time.perf_counter() - start) * 1000
+        observe(stage, timer.ms)
+
+# --- Per-query traces (thread-local, so concurrent queries do not mix) ---
+def start_trace():
+    _local.trace = []
+
+def end_trace():
+    trace, _local.trace = getattr(_local, "trace", None) or [], None
+    return trace
+
+def format_trace(trace):
+    total = sum(ms for stage, ms in trace if stage == "query_total") or sum(ms for _, ms in trace)
+    lines = [":: Stage breakdown"]
+    for i, (stage, ms) in enumerate(trace):
+        branch = "└──" if i == len(trace) - 1 else "├──"
+        share = f"{ms / total:>6.1%}" if total and stage != "query_total" else ""
+        lines.append(f"   {branch} {stage:<20} {ms:>10.2f} ms {share}".rstrip())
+    return "\n".join(lines)
+
+# --- Aggregates ---
+def _quantile(hist, q):
+    """Upper bucket bound containing quantile q (the usual histogram_quantile approximation)."""
+    if not hist["count"]:
+        return 0.0
+    target, seen = q * hist["count"], 0
+    for bound, count in zip(BUCKETS_MS, hist["buckets"]):
+        seen += count
+        if seen >= target:
+            return float(bound)
+    return hist["max_ms"]
+
+def snapshot():
+    with _lock:
+        return {
+            stage: {
+                "count": hist["count"],
+                "sum_ms": hist["sum_ms"],
+                "mean_ms": hist["sum_ms"] / hist["count"] if hist["count"] else 0.0,
+                "p50_ms": _quantile(hist, 0.50),
+                "p95_ms": _quantile(hist, 0.95),
+                "p99_ms": _quantile(hist, 0.99),
+                "max_ms": hist["max_ms"],
+            }
+            for stage, hist in _histograms.items()
+        }
+
+def render_prometheus(name="rag_stage_latency_seconds"):
+    with _lock:
+        lines = [
+            f"# HELP {name} Latency of RAG pipeline stages.",
+            f"# TYPE {name} histogram",
+        ]
+        for stage, hist in sorted(_histograms.items()):
+            cumulative = 0
+            for bound, count in zip(BUCKETS_MS, hist["buckets"]):
+                cumulative += count
+                lines.append(f'{name}_bucket{{stage="{stage}",le="{bound / 1000:g}"}} {cumulative}')
+            lines.append(f'{name}_bucket{{stage="{stage}",le="+Inf"}} {hist["count"]}')
+            lines.append(f'{name}_sum{{stage="{stage}"}} {hist["sum_ms"] / 1000:.6f}')
+            lines.append(f'{name}_count{{stage="{stage}"}} {hist["count"]}')
+    return "\n".join(lines) + "\n"
+
+def reset():
+    with _lock:
+        _histograms.clear()
+
+# --- Exporters ---
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.rstrip("/") not in ("/metrics", ""):
+            self.send_error(404)
+            return
+        body = render_prometheus().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass  # keep the interactive console clean
+
+def start_metrics_server(port, host="127.0.0.1"):
+    """Serve Prometheus text at http://host:port/metrics from a daemon thread."""
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    print(f":: Metrics endpoint: http://{host}:{port}/metrics")
+    return server
+
+def write_json(path):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump({"timestamp": time.time(), "stages": snapshot()}, f, indent=4)
+    os.replace(tmp_path, path)
+
+def start_json_dump(path, interval_s=30.0):
+    """Rewrite `path` with the current snapshot every interval_s seconds from a daemon thread."""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+
+    def loop():
+        while True:
+            time.sleep(interval_s)
+            write_json(path)
+
+    threading.Thread(target=loop, daemon=True).start()
+    print(f":: Metrics JSON dump: {path} (every {interval_s:g}s)")
+
+# --- Shared CLI wiring for the query/ingest entry points ---
+def add_metrics_arguments(parser, trace=True):
+    if trace:
+        parser.add_argument("--trace", action="store_true", help="Print a per-query stage breakdown")
+    parser.add_argument("--metrics-port", type=int, default=None, help="Serve Prometheus metrics on this port")
+    parser.add_argument("--metrics-json", default=None, help="Periodically dump stage metrics to this JSON file")
+    parser.add_argument("--metrics-interval", type=float, default=30.0, help="Seconds between JSON dumps")
+
+def start_exporters(args):
+    if args.metrics_port:
+        start_metrics_server(args.metrics_port)
+    if args.metrics_json:
+        start_json_dump(args.metrics_json, args.metrics_interval)
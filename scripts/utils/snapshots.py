@@ -0,0 +1,301 @@
+# Author: Sean Sjahrial
+# Title: Cybersecurity RAG Assistant
+# Description: Part of UC Berkeley MICS Machine Learning Course (2025)
+# GitHub: https://github.com/isnakie
+# Description: Versioned, immutable FAISS index snapshots. Each build is written to its own directory
+# with a manifest (model, dimension, count, checksums) and published by atomically rewriting a CURRENT
+# pointer file. Query processes watch the pointer and hot-swap to a new snapshot in the background.
+# License: MIT
+
+"""
+Usage:
+
+Publish the existing flat index/metadata pair as a snapshot (the ingest script does this on every build)
+> python -m scripts.utils.snapshots publish --index data/embeddings/combined_faiss.index --metadata data/embeddings/combined_metadata.pkl
+
+List snapshots, roll back to an older one, verify checksums, delete old snapshots
+> python -m scripts.utils.snapshots list
+> python -m scripts.utils.snapshots activate 20250601-101500-482913-3f2a9c1e
+> python -m scripts.utils.snapshots verify
+> python -m scripts.utils.snapshots prune --keep 3
+
+Layout:
+
+data/embeddings/snapshots/
+├── CURRENT                             <- name of the active snapshot, replaced atomically
+├── 20250601-101500-482913-3f2a9c1e/    <- UTC time (with microseconds) and index checksum prefix
+│   ├── index.faiss
+│   ├── metadata.pkl
+│   └── manifest.json
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import pickle
+import shutil
+import stat
+import threading
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+SNAPSHOT_ROOT = "data/embeddings/snapshots"
+CURRENT_FILE = "CURRENT"
+INDEX_FILE = "index.faiss"
+METADATA_FILE = "metadata.pkl"
+MANIFEST_FILE = "manifest.json"
+
+def sha256_file(path, block_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def _fsync_write(path, data, mode="w"):
+    with open(path, mode) as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+
+def _fsync_path(path):
+    """fsync an existing file or directory (a directory fsync makes its entries durable)."""
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+# --- Writing ---
+def publish_snapshot(index, metadata, model_name, root=SNAPSHOT_ROOT, extra=None, activate=True):
+    """
+    Write index + metadata into a new immutable snapshot directory and (by default) point CURRENT at it.
+    Returns the snapshot name. Readers never see a partial snapshot: files are written under a temp
+    name and the directory is renamed into place only after the manifest is complete.
+    """
+    import faiss
+
+    if index.ntotal != len(metadata):
+        raise ValueError(f"Index has {index.ntotal} vectors but metadata has {len(metadata)} entries")
+
+    root = Path(root)
+    root.mkdir(parents=True, exist_ok=True)
+    tmp_dir = root / f".tmp-{os.getpid()}-{time.time_ns()}"
+    tmp_dir.mkdir()
+
+    faiss.write_index(index, str(tmp_dir / INDEX_FILE))
+    _fsync_path(tmp_dir / INDEX_FILE)
+    _fsync_write(tmp_dir / METADATA_FILE, pickle.dumps(metadata), mode="wb")
+
+    checksums = {name: sha256_file(tmp_dir / name) for name in (INDEX_FILE, METADATA_FILE)}
+    # Microseconds keep names unique (and in publish order) when several builds land in the same second
+    created = datetime.now(timezone.utc)
+    name = created.strftime("%Y%m%d-%H%M%S-%f-") + checksums[INDEX_FILE][:8]
+    manifest = {
+        "name": name,
+        "created": created.isoformat(timespec="seconds"),
+        "model": model_name,
+        "dimension": index.d,
+        "count": index.ntotal,
+        "index_type": type(index).__name__,
+        "checksums": checksums,
+        **(extra or {}),
+    }
+    _fsync_write(tmp_dir / MANIFEST_FILE, json.dumps(manifest, indent=4))
+
+    # Snapshots are immutable once published
+    for path in tmp_dir.iterdir():
+        path.chmod(stat.S_IREAD | stat.S_IRGRP | stat.S_IROTH)
+    _fsync_path(tmp_dir)
+    os.rename(tmp_dir, root / name)  # fails rather than overwrite if the name is somehow taken
+    _fsync_path(root)
+
+    if activate:
+        set_current(name, root)
+    return name
+
+def set_current(name, root=SNAPSHOT_ROOT):
+    root = Path(root)
+    if not (root / name / MANIFEST_FILE).exists():
+        raise FileNotFoundError(f"No snapshot named {name} under {root}")
+    tmp_path = root / f"{CURRENT_FILE}.tmp-{os.getpid()}"
+    _fsync_write(tmp_path, name + "\n")
+    os.replace(tmp_path, root / CURRENT_FILE)
+
+# --- Reading ---
+def read_current(root=SNAPSHOT_ROOT):
+    try:
+        return (Path(root) / CURRENT_FILE).read_text().strip() or None
+    except FileNotFoundError:
+        return None
+
+def read_manifest(name, root=SNAPSHOT_ROOT):
+    with open(Path(root) / name / MANIFEST_FILE) as f:
+        return json.load(f)
+
+def list_snapshots(root=SNAPSHOT_ROOT):
+    root = Path(root)
+    if not root.exists():
+        return []
+    return sorted(p.name for p in root.iterdir() if (p / MANIFEST_FILE).exists())
+
+def verify_snapshot(name, root=SNAPSHOT_ROOT):
+    manifest = read_manifest(name, root)
+    return {
+        file: sha256_file(Path(root) / name / file) == expected
+        for file, expected in manifest["checksums"].items()
+    }
+
+def load_snapshot(name=None, root=SNAPSHOT_ROOT, verify=True, mmap=False):
+    """Load a snapshot (CURRENT by default) as {"name", "manifest", "index", "metadata"}."""
+    from scripts.utils.index_io import load_index
+
+    name = name or read_current(root)
+    if name is None:
+        raise FileNotFoundError(f"No CURRENT snapshot under {root}")
+
+    manifest = read_manifest(name, root)
+    if verify:
+        bad = [file for file, ok in verify_snapshot(name, root).items() if not ok]
+        if bad:
+            raise ValueError(f"Snapshot {name} failed checksum verification: {bad}")
+
+    snapshot_dir = Path(root) / name
+    index = load_index(snapshot_dir / INDEX_FILE, mmap)
+    with open(snapshot_dir / METADATA_FILE, "rb") as f:
+        metadata = pickle.load(f)
+
+    if not (index.ntotal == len(metadata) == manifest["count"]) or index.d != manifest["dimension"]:
+        raise ValueError(f"Snapshot {name} does not match its manifest")
+    return {"name": name, "manifest": manifest, "index": index, "metadata": metadata}
+
+class SnapshotWatcher:
+    """
+    Holds the active snapshot and polls CURRENT from a daemon thread. A new snapshot is fully loaded
+    and verified off the query path, then swapped in with a single reference assignment, so queries
+    keep running on the old snapshot until the new one is ready. Read `.current` once per query so
+    the index, metadata (and anything prepare() attached) used together come from the same snapshot.
+    """
+
+    def __init__(self, root=SNAPSHOT_ROOT, interval_s=5.0, accept=None, prepare=None, on_swap=None, mmap=False,
+                 initial=None):
+        self.root = root
+        self.interval_s = interval_s
+        self.accept = accept
+        self.prepare = prepare
+        self.on_swap = on_swap
+        self.mmap = mmap
+        if initial is not None:
+            self.current = initial  # already loaded (and prepared), e.g. by a pre-fork parent
+        else:
+            name = read_current(root)
+            if name is None:
+                raise FileNotFoundError(f"No CURRENT snapshot under {root}")
+            self._check(read_manifest(name, root))
+            self.current = self._load(name)
+        self._rejected = None
+        self._stop = threading.Event()
+
+    def _load(self, name):
+        snapshot = load_snapshot(name, self.root, mmap=self.mmap)
+        if self.prepare:
+            self.prepare(snapshot)  # e.g. attach the snapshot's embedding model; may raise to reject it
+        return snapshot
+
+    def _check(self, manifest):
+        if self.accept and not self.accept(manifest):
+            raise ValueError(f"Snapshot {manifest['name']} rejected (model {manifest['model']}, dim {manifest['dimension']})")
+
+    def poll(self):
+        """Swap to the snapshot named in CURRENT if it changed. Returns True on swap."""
+        name = read_current(self.root)
+        if not name or name in (self.current["name"], self._rejected):
+            return False
+        try:
+            self._check(read_manifest(name, self.root))
+            snapshot = self._load(name)
+        except Exception as e:
+            self._rejected = name  # report once, not on every poll
+            print(f"\n:: !! Not switching to snapshot {name}: {e}")
+            return False
+
+        previous, self.current = self.current, snapshot
+        print(f"\n:: Switched index snapshot {previous['name']} -> {name} ({snapshot['manifest']['count']} entries)")
+        if self.on_swap:
+            self.on_swap(snapshot)
+        return True
+
+    def start(self):
+        def loop():
+            while not self._stop.wait(self.interval_s):
+                self.poll()
+
+        threading.Thread(target=loop, daemon=True).start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+def prune_snapshots(keep=3, root=SNAPSHOT_ROOT):
+    """Delete all but the newest `keep` snapshots; the CURRENT snapshot is never deleted."""
+    current = read_current(root)
+    removed = []
+    for name in list_snapshots(root)[:-keep or None]:
+        if name == current:
+            continue
+        path = Path(root) / name
+        for file in path.iterdir():
+            file.chmod(stat.S_IWRITE | stat.S_IREAD)
+        shutil.rmtree(path)
+        removed.append(name)
+    return removed
+
+def main():
+    import faiss
+
+    from scripts.utils.embedders import index_model, resolve_model
+
+    parser = argparse.ArgumentParser(description="Manage versioned FAISS index snapshots")
+    parser.add_argument("command", choices=["publish", "list", "activate", "verify", "prune"])
+    parser.add_argument("name", nargs="?", default=None, help="Snapshot name (activate/verify)")
+    parser.add_argument("--root", default=SNAPSHOT_ROOT, help="Snapshot directory")
+    parser.add_argument("--index", default="data/embeddings/combined_faiss.index", help="Index to publish")
+    parser.add_argument("--metadata", default="data/embeddings/combined_metadata.pkl", help="Metadata to publish")
+    parser.add_argument("--model", default=None, help="Model the published index was built with (default: from the index)")
+    parser.add_argument("--keep", type=int, default=3, help="Snapshots kept by prune")
+    args = parser.parse_args()
+
+    if args.command == "publish":
+        index = faiss.read_index(args.index)
+        with open(args.metadata, "rb") as f:
+            metadata = pickle.load(f)
+        model_name = resolve_model(args.model) if args.model else index_model(args.index)
+        name = publish_snapshot(index, metadata, model_name, args.root)
+        print(f":: Published snapshot {name} ({index.ntotal} entries) and set it as CURRENT")
+
+    elif args.command == "list":
+        current = read_current(args.root)
+        for name in list_snapshots(args.root):
+            manifest = read_manifest(name, args.root)
+            marker = "*" if name == current else " "
+            print(f" {marker} {name}  {manifest['model']:<24} dim={manifest['dimension']:<5} count={manifest['count']}")
+
+    elif args.command == "activate":
+        set_current(args.name, args.root)
+        print(f":: CURRENT -> {args.name}")
+
+    elif args.command == "verify":
+        name = args.name or read_current(args.root)
+        results = verify_snapshot(name, args.root)
+        for file, ok in results.items():
+            print(f"   {'ok ' if ok else 'BAD'} {file}")
+        print(f":: Snapshot {name} {'verified' if all(results.values()) else 'FAILED verification'}")
+
+    elif args.command == "prune":
+        removed = prune_snapshots(args.keep, args.root)
+        print(f":: Removed {len(removed)} snapshot(s): {', '.join(removed) or '-'}")
+
+if __name__ == "__main__":
+    main()
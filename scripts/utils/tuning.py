@@ -0,0 +1,248 @@
+# Author: Sean Sjahrial
+# Title: Cybersecurity RAG Assistant
+# Description: Part of UC Berkeley MICS Machine Learning Course (2025)
+# GitHub: https://github.com/isnakie
+# Description: Explicit thread-pool settings for the embedder (PyTorch / ONNX Runtime intra-op threads)
+# and FAISS (OpenMP threads used by index.search). The autotune command sweeps thread counts and batch
+# sizes on this machine and saves latency- and throughput-optimal settings that the query and ingest
+# scripts load on startup.
+# License: MIT
+
+"""
+Usage:
+
+Tune for one process using the whole machine
+> python -m scripts.utils.tuning autotune
+
+Tune for 4 processes sharing the host (each gets a quarter of the cores)
+> python -m scripts.utils.tuning autotune --processes 4
+
+Show the saved profile
+> python -m scripts.utils.tuning show
+
+The query scripts load the "latency" settings (the "throughput" settings with --batch), ingest loads
+"throughput". Explicit --threads / --faiss-threads / --batch-size always win over the profile.
+"""
+
+import argparse
+import json
+import os
+import platform
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+
+PROFILE_PATH = "models/thread_profile.json"
+GOALS = ("latency", "throughput")
+
+# Among settings within this fraction of the best, prefer the fewest threads / smallest batch
+TOLERANCE = 0.05
+
+def set_faiss_threads(threads):
+    import faiss
+
+    faiss.omp_set_num_threads(threads)
+
+def set_torch_threads(threads):
+    import torch
+
+    torch.set_num_threads(threads)
+
+# --- Loading a saved profile ---
+def load_profile(path=PROFILE_PATH, goal="latency"):
+    """Settings for goal from a saved profile; None when there is none or it was tuned on another machine."""
+    try:
+        with open(path) as f:
+            profile = json.load(f)
+    except FileNotFoundError:
+        return None
+    if profile["cpu_count"] != os.cpu_count():
+        print(f":: !! Ignoring {path}: tuned for {profile['cpu_count']} CPUs, this machine has {os.cpu_count()}")
+        return None
+    return profile[goal]
+
+def add_tuning_arguments(parser, batch_size=True):
+    """--faiss-threads, --batch-size and the profile options; --threads is defined by each script."""
+    parser.add_argument("--faiss-threads", type=int, default=None, help="FAISS OpenMP threads for index.search")
+    if batch_size:
+        parser.add_argument("--batch-size", type=int, default=None, help="Embedding batch size")
+    parser.add_argument("--profile", default=PROFILE_PATH, help="Thread profile written by tuning.py autotune")
+    parser.add_argument("--no-profile", action="store_true", help="Ignore the saved thread profile")
+
+def apply_tuning(args, goal):
+    """
+    Fill args.threads / args.faiss_threads / args.batch_size from the profile where they were not
+    given explicitly, and apply the FAISS thread count. The embedder's threads are applied when it is
+    loaded (load_embedder / EmbedderCache take args.threads).
+    """
+    profile = None if args.no_profile else load_profile(args.profile, goal)
+    if profile:
+        args.threads = args.threads or profile["embed_threads"]
+        args.faiss_threads = args.faiss_threads or profile["faiss_threads"]
+        if hasattr(args, "batch_size") and args.batch_size is None:
+            args.batch_size = profile["batch_size"]
+        print(f":: Thread profile ({goal}): embedder {args.threads} threads, FAISS {args.faiss_threads} threads"
+              + (f", batch {args.batch_size}" if hasattr(args, "batch_size") else ""))
+    if args.faiss_threads:
+        set_faiss_threads(args.faiss_threads)
+    return profile
+
+# --- Autotune ---
+def thread_options(budget):
+    """Powers of two up to the per-process core budget, plus the budget itself."""
+    options = {budget}
+    threads = 1
+    while threads < budget:
+        options.add(threads)
+        threads *= 2
+    return sorted(options)
+
+def time_ms(fn, repeats):
+    fn()  # warm-up
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - start) * 1000)
+    return float(np.percentile(times, 50))
+
+def pick(rows, key, lower_is_better):
+    """Best row by key, preferring earlier rows (fewer threads, smaller batches) within TOLERANCE."""
+    values = [row[key] for row in rows]
+    best = min(values) if lower_is_better else max(values)
+    for row in rows:
+        if (row[key] <= best * (1 + TOLERANCE)) if lower_is_better else (row[key] >= best * (1 - TOLERANCE)):
+            return row
+
+def sweep_embedder(model_name, backend, quantize, texts, threads_list, batch_sizes, repeats):
+    from scripts.utils.embedders import load_embedder
+
+    query = "How should passwords be stored to prevent offline cracking?"
+    rows = []
+    embedder = None
+    for threads in threads_list:
+        # ONNX Runtime fixes its thread pool when the session is created; PyTorch can be changed in place
+        if backend == "onnx" or embedder is None:
+            embedder = load_embedder(model_name, backend, quantize, threads)
+        if backend == "torch":
+            set_torch_threads(threads)
+
+        single_ms = time_ms(lambda: embedder.encode([query]), repeats)
+        for batch_size in batch_sizes:
+            batch_ms = time_ms(lambda: embedder.encode(texts, batch_size=batch_size), 1)
+            rows.append({"threads": threads, "batch_size": batch_size, "single_ms": single_ms,
+                         "docs_per_s": len(texts) / batch_ms * 1000})
+            print(f"   embed  threads={threads:<3} batch={batch_size:<4} single {single_ms:7.2f} ms  "
+                  f"{rows[-1]['docs_per_s']:8.1f} docs/s", flush=True)
+    return rows
+
+def sweep_faiss(index, query_vecs, threads_list, repeats, k=50):
+    rows = []
+    for threads in threads_list:
+        set_faiss_threads(threads)
+        single_ms = time_ms(lambda: index.search(query_vecs[:1], k), repeats)
+        batch_ms = time_ms(lambda: index.search(query_vecs, k), max(repeats // 10, 1))
+        rows.append({"threads": threads, "single_ms": single_ms, "queries_per_s": len(query_vecs) / batch_ms * 1000})
+        print(f"   faiss  threads={threads:<3} single {single_ms:7.2f} ms  {rows[-1]['queries_per_s']:8.1f} queries/s",
+              flush=True)
+    return rows
+
+def build_profile(embed_rows, faiss_rows):
+    # Latency: fastest single query per stage; batch size is the smallest that keeps most of the
+    # throughput at that thread count, so batch-mode questions do not wait on large batches
+    latency_embed = pick(embed_rows, "single_ms", lower_is_better=True)
+    at_threads = [row for row in embed_rows if row["threads"] == latency_embed["threads"]]
+    latency_batch = next(
+        row for row in at_threads if row["docs_per_s"] >= max(r["docs_per_s"] for r in at_threads) * 0.9
+    )
+    latency_faiss = pick(faiss_rows, "single_ms", lower_is_better=True)
+
+    throughput_embed = pick(embed_rows, "docs_per_s", lower_is_better=False)
+    throughput_faiss = pick(faiss_rows, "queries_per_s", lower_is_better=False)
+    return {
+        "latency": {"embed_threads": latency_embed["threads"], "faiss_threads": latency_faiss["threads"],
+                    "batch_size": latency_batch["batch_size"], "embed_ms": latency_embed["single_ms"],
+                    "search_ms": latency_faiss["single_ms"]},
+        "throughput": {"embed_threads": throughput_embed["threads"], "faiss_threads": throughput_faiss["threads"],
+                       "batch_size": throughput_embed["batch_size"], "docs_per_s": throughput_embed["docs_per_s"],
+                       "queries_per_s": throughput_faiss["queries_per_s"]},
+    }
+
+def autotune(args):
+    import pickle
+
+    from scripts.utils.embedders import index_model, resolve_model
+    from scripts.utils.index_io import load_index
+
+    budget = max(os.cpu_count() // args.processes, 1)
+    threads_list = args.threads or thread_options(budget)
+    model_name = resolve_model(args.model) if args.model else index_model(args.index)
+
+    index = load_index(args.index)
+    with open(args.metadata, "rb") as f:
+        metadata = pickle.load(f)
+    rng = np.random.default_rng(0)
+    sample = rng.choice(len(metadata), size=min(args.samples, len(metadata)), replace=False)
+    texts = [metadata[i]["text"] for i in sample]
+
+    print(f":: {os.cpu_count()} CPUs / {args.processes} process(es) -> sweeping {threads_list} threads, "
+          f"batch sizes {args.batch_sizes}, {len(texts)} texts, {model_name} ({args.backend})")
+    embed_rows = sweep_embedder(model_name, args.backend, args.quantize, texts, threads_list, args.batch_sizes, args.repeats)
+
+    # Query vectors for the FAISS sweep: stored vectors, so this does not depend on the embedder
+    ids = rng.choice(index.ntotal, size=min(args.search_queries, index.ntotal), replace=False)
+    query_vecs = np.vstack([index.reconstruct(int(i)) for i in ids]).astype("float32")
+    faiss_rows = sweep_faiss(index, query_vecs, threads_list, args.repeats)
+
+    profile = {
+        "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "host": platform.node(),
+        "cpu_count": os.cpu_count(),
+        "processes": args.processes,
+        "model": model_name,
+        "backend": args.backend,
+        "quantized": args.quantize,
+        **build_profile(embed_rows, faiss_rows),
+        "sweep": {"embed": embed_rows, "faiss": faiss_rows},
+    }
+    os.makedirs(os.path.dirname(args.profile) or ".", exist_ok=True)
+    with open(args.profile, "w") as f:
+        json.dump(profile, f, indent=4)
+
+    print(f"\n:: Saved thread profile to {args.profile}")
+    show(profile)
+
+def show(profile):
+    print(f"   tuned {profile['created']} on {profile['host']} ({profile['cpu_count']} CPUs, "
+          f"{profile['processes']} process(es), {profile['model']} {profile['backend']})")
+    print(f"   {'goal':<12}{'embed threads':>15}{'faiss threads':>15}{'batch':>7}")
+    for goal in GOALS:
+        settings = profile[goal]
+        print(f"   {goal:<12}{settings['embed_threads']:>15}{settings['faiss_threads']:>15}{settings['batch_size']:>7}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Tune embedder and FAISS thread pools for this machine")
+    parser.add_argument("command", choices=["autotune", "show"])
+    parser.add_argument("--profile", default=PROFILE_PATH, help="Where the profile is written/read")
+    parser.add_argument("--processes", type=int, default=1, help="Processes that will share this host's cores")
+    parser.add_argument("--threads", type=int, nargs="+", default=None, help="Thread counts to try (default: powers of two)")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[8, 16, 32, 64, 128], help="Embedding batch sizes to try")
+    parser.add_argument("--model", default=None, help="Embedding model (default: the index's model)")
+    parser.add_argument("--backend", choices=("torch", "onnx"), default="torch", help="Embedding backend")
+    parser.add_argument("--quantize", action="store_true", help="Use the int8-quantized ONNX model")
+    parser.add_argument("--samples", type=int, default=256, help="Knowledge-base texts embedded per batch measurement")
+    parser.add_argument("--search-queries", type=int, default=256, help="Queries per batched FAISS search")
+    parser.add_argument("--repeats", type=int, default=30, help="Timed repeats for single-query measurements")
+    parser.add_argument("--index", default="data/embeddings/combined_faiss.index", help="Path to FAISS index")
+    parser.add_argument("--metadata", default="data/embeddings/combined_metadata.pkl", help="Path to metadata pickle")
+    args = parser.parse_args()
+
+    if args.command == "autotune":
+        autotune(args)
+    else:
+        with open(args.profile) as f:
+            show(json.load(f))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,11 @@
+import os
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+
+# Helpers import as the scripts package (like `python -m scripts...`); the top-level scripts
+# (label_engine.py, predict.py) import their siblings by name, as when run directly. Both read
+# data and models relative to the repository root.
+sys.path[:0] = [str(ROOT), str(ROOT / "scripts")]
+os.chdir(ROOT)
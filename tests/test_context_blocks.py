@@ -0,0 +1,48 @@
+from scripts.utils.context_blocks import add_context_blocks, context_block, count_tokens, format_block, select_blocks
+
+def entry(i, text_len=100, **extra):
+    return {"source": "STIG", "id": f"V-{i}", "title": f"Rule {i}", "text": "x" * text_len, **extra}
+
+def test_format_block_cleans_truncates_and_lists_duplicates():
+    block = format_block({"source": "CWE", "id": 79, "title": "XSS", "text": "  a \n\n b  " + "c" * 3000,
+                          "duplicate_ids": ["CWE-80", 81]})
+    header, body = block.split("\n", 1)
+    assert header == "[CWE] 79 - XSS (also: CWE-80, 81)"
+    assert body.startswith("  a b c")
+    assert len(body) == 2 + 1800
+
+def test_add_context_blocks_stores_block_and_lengths():
+    metadata = add_context_blocks([entry(1)])
+    stored = metadata[0]
+    assert stored["context_block"] == format_block(entry(1))
+    assert stored["context_chars"] == len(stored["context_block"])
+    assert stored["context_tokens"] == count_tokens(stored["context_block"])
+
+def test_context_block_formats_entries_without_stored_blocks():
+    assert context_block(entry(1)) == context_block(add_context_blocks([entry(1)])[0])
+
+def test_select_blocks_keeps_rank_order_within_budget():
+    hits = [(entry(i), 0.1 * i) for i in range(5)]
+    block_chars = len(format_block(entry(0)))
+
+    selected = select_blocks(hits, max_context_chars=3 * block_chars)
+    assert [key for key, _ in selected] == [("STIG", "V-0"), ("STIG", "V-1"), ("STIG", "V-2")]
+    assert [block for _, block in selected] == [format_block(entry(i)) for i in range(3)]
+
+def test_select_blocks_stops_at_first_block_that_does_not_fit():
+    hits = [(entry(0), 0.0), (entry(1, text_len=1000), 0.1), (entry(2), 0.2)]
+    budget = len(format_block(entry(0))) + len(format_block(entry(2)))
+    assert [key for key, _ in select_blocks(hits, budget)] == [("STIG", "V-0")]
+
+def test_select_blocks_skips_keys_already_in_context():
+    hits = [(entry(i), 0.0) for i in range(3)]
+    selected = select_blocks(hits, 10_000, skip={("STIG", "V-1")})
+    assert [key for key, _ in selected] == [("STIG", "V-0"), ("STIG", "V-2")]
+
+def test_select_blocks_same_result_with_precomputed_blocks():
+    hits = [(entry(i), 0.0) for i in range(4)]
+    stored = [(e, score) for e, score in zip(add_context_blocks([entry(i) for i in range(4)]), [0.0] * 4)]
+    assert select_blocks(hits, 500) == select_blocks(stored, 500)
+
+def test_select_blocks_empty_when_nothing_fits():
+    assert select_blocks([(entry(0), 0.0)], max_context_chars=10) == []
@@ -0,0 +1,46 @@
+import pytest
+
+from scripts.ingest.dedup import cluster_near_duplicates, collapse, lsh_params
+
+@pytest.mark.parametrize("threshold, num_perm", [(0.5, 128), (0.8, 128), (0.9, 64), (0.7, 100)])
+def test_lsh_params_factor_num_perm_near_threshold(threshold, num_perm):
+    bands, rows = lsh_params(threshold, num_perm)
+    assert bands * rows == num_perm
+
+    # No other factorization puts the S-curve midpoint closer to the threshold
+    midpoint = (1 / bands) ** (1 / rows)
+    for r in range(1, num_perm + 1):
+        if num_perm % r == 0:
+            assert abs(midpoint - threshold) <= abs((1 / (num_perm // r)) ** (1 / r) - threshold)
+
+def test_lsh_params_higher_threshold_needs_longer_bands():
+    assert lsh_params(0.9, 128)[1] > lsh_params(0.5, 128)[1]
+
+def test_cluster_near_duplicates_groups_reworded_copies():
+    base = "The application must lock the account after three consecutive failed logon attempts within fifteen minutes"
+    texts = [
+        base,
+        "Use parameterized queries so user input is never concatenated into SQL statements",
+        base + ".",
+        base.replace("fifteen", "15"),
+    ]
+    clusters = cluster_near_duplicates(texts, threshold=0.5)
+    assert sorted(clusters) == [[0, 2, 3], [1]]
+
+def test_cluster_near_duplicates_keeps_distinct_texts_apart():
+    texts = ["alpha beta gamma delta", "epsilon zeta eta theta", "iota kappa lambda mu"]
+    assert cluster_near_duplicates(texts, threshold=0.8) == [[0], [1], [2]]
+
+def test_collapse_keeps_representative_and_records_members():
+    metadata = [
+        {"id": "V-1", "title": "Lockout", "text": "a"},
+        {"id": "V-2", "title": "Queries", "text": "b"},
+        {"id": "V-3", "title": "Lockout (copy)", "text": "a"},
+    ]
+    collapsed = collapse(metadata, [[0, 2], [1]])
+
+    assert [entry["id"] for entry in collapsed] == ["V-1", "V-2"]
+    assert collapsed[0]["duplicate_ids"] == ["V-3"]
+    assert collapsed[0]["duplicate_titles"] == ["Lockout (copy)"]
+    assert collapsed[1]["duplicate_ids"] == [] and collapsed[1]["duplicate_titles"] == []
+    assert "duplicate_ids" not in metadata[0]  # input entries are not modified
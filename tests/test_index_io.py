@@ -0,0 +1,58 @@
+import faiss
+import numpy as np
+import pytest
+
+from scripts.utils.index_io import FLT_MAX, MemmapFlatIndex, load_index
+
+@pytest.fixture(params=[faiss.IndexFlatL2, faiss.IndexFlatIP], ids=["l2", "ip"])
+def index_file(request, tmp_path):
+    rng = np.random.default_rng(0)
+    index = request.param(16)
+    index.add(rng.standard_normal((200, 16)).astype(np.float32))
+    path = tmp_path / "flat.index"
+    faiss.write_index(index, str(path))
+    return index, path, rng.standard_normal((7, 16)).astype(np.float32)
+
+def test_memmap_search_matches_faiss(index_file):
+    index, path, queries = index_file
+    mapped = MemmapFlatIndex(path)
+    assert (mapped.d, mapped.ntotal) == (index.d, index.ntotal)
+
+    D, I = mapped.search(queries, 10)
+    D_ref, I_ref = index.search(queries, 10)
+    assert D.dtype == np.float32 and I.dtype == np.int64
+    np.testing.assert_array_equal(I, I_ref)
+    np.testing.assert_allclose(D, D_ref, rtol=1e-4, atol=1e-4)
+
+def test_memmap_pads_like_faiss_when_k_exceeds_ntotal(index_file):
+    index, path, queries = index_file
+    D, I = MemmapFlatIndex(path).search(queries, 205)
+    D_ref, I_ref = index.search(queries, 205)
+
+    np.testing.assert_array_equal(I[:, 200:], I_ref[:, 200:])
+    np.testing.assert_array_equal(D[:, 200:], D_ref[:, 200:])
+    assert abs(D[0, -1]) == FLT_MAX
+
+def test_memmap_reconstruct(index_file):
+    index, path, _ = index_file
+    np.testing.assert_array_equal(MemmapFlatIndex(path).reconstruct(3), index.reconstruct(3))
+
+def test_memmap_rejects_non_flat_index(tmp_path):
+    index = faiss.IndexHNSWFlat(8, 16)
+    index.add(np.random.default_rng(0).random((20, 8), dtype=np.float32))
+    faiss.write_index(index, str(tmp_path / "hnsw.index"))
+    with pytest.raises(ValueError):
+        MemmapFlatIndex(tmp_path / "hnsw.index")
+
+def test_load_index_mmap_matches_heap(index_file):
+    index, path, queries = index_file
+    mapped = load_index(path, mmap=True)
+    np.testing.assert_array_equal(mapped.search(queries, 5)[1], index.search(queries, 5)[1])
+
+@pytest.mark.skipif(not hasattr(faiss, "IO_FLAG_MMAP_IFC"), reason="faiss build without in-place mapping")
+def test_load_index_mmap_raises_on_truncated_flat_index(index_file):
+    _, path, _ = index_file
+    data = path.read_bytes()
+    path.write_bytes(data[: len(data) // 2])
+    with pytest.raises(RuntimeError):
+        load_index(path, mmap=True)
@@ -0,0 +1,32 @@
+import pytest
+
+from label_engine import POLICIES, UNKNOWN, labels_agree, merge_votes
+
+def test_labels_agree_matches_classifier_families():
+    assert labels_agree("Exploitation - Web", "Exploitation")
+    assert labels_agree("Post-Exploitation", "Post - Exploitation")
+    assert not labels_agree("Discovery", "Exploitation")
+
+@pytest.mark.parametrize("policy, rule, clf, expected", [
+    ("rules_first", "Discovery", "Exploitation", (["Discovery"], False)),
+    ("rules_first", UNKNOWN, "Exploitation", (["Exploitation"], False)),
+    ("rules_first", UNKNOWN, None, ([], True)),
+    ("classifier_first", "Discovery", "Exploitation", (["Exploitation"], False)),
+    ("classifier_first", "Discovery", None, (["Discovery"], False)),
+    ("classifier_first", UNKNOWN, None, ([], True)),
+    ("union", "Discovery", "Exploitation", (["Discovery", "Exploitation"], False)),
+    ("union", "Exploitation - Web", "Exploitation", (["Exploitation - Web"], False)),
+    ("union", UNKNOWN, "Exploitation", (["Exploitation"], False)),
+    ("union", UNKNOWN, None, ([], True)),
+    ("consensus", "Exploitation - Web", "Exploitation", (["Exploitation - Web"], False)),
+    ("consensus", "Discovery", "Exploitation", ([], True)),
+    ("consensus", "Discovery", None, ([], True)),
+])
+def test_merge_votes(policy, rule, clf, expected):
+    assert merge_votes(rule, clf, policy) == expected
+
+def test_merge_votes_covers_every_policy_and_rejects_unknown():
+    for policy in POLICIES:
+        merge_votes(UNKNOWN, None, policy)
+    with pytest.raises(ValueError):
+        merge_votes(UNKNOWN, None, "majority")
@@ -0,0 +1,70 @@
+import json
+
+import pytest
+
+from scripts.utils import metrics
+
+@pytest.fixture(autouse=True)
+def clean_histograms():
+    metrics.reset()
+    yield
+    metrics.reset()
+
+def test_snapshot_counts_and_quantiles():
+    for ms in (0.5, 3, 3, 40, 700):
+        metrics.observe("embed", ms)
+
+    stats = metrics.snapshot()["embed"]
+    assert stats["count"] == 5
+    assert stats["sum_ms"] == pytest.approx(746.5)
+    assert stats["mean_ms"] == pytest.approx(149.3)
+    assert stats["p50_ms"] == 5.0      # third sample falls in the (2.5, 5] bucket
+    assert stats["p99_ms"] == 1000.0
+    assert stats["max_ms"] == 700
+
+def test_quantile_beyond_last_bucket_reports_max():
+    metrics.observe("llm", 90000)
+    assert metrics.snapshot()["llm"]["p95_ms"] == 90000
+
+def test_render_prometheus_buckets_are_cumulative_in_seconds():
+    metrics.observe("index_search", 0.8)
+    metrics.observe("index_search", 12)
+    metrics.observe("index_search", 120000)
+
+    lines = metrics.render_prometheus().splitlines()
+    assert lines[:2] == [
+        "# HELP rag_stage_latency_seconds Latency of RAG pipeline stages.",
+        "# TYPE rag_stage_latency_seconds histogram",
+    ]
+    assert 'rag_stage_latency_seconds_bucket{stage="index_search",le="0.001"} 1' in lines
+    assert 'rag_stage_latency_seconds_bucket{stage="index_search",le="0.01"} 1' in lines
+    assert 'rag_stage_latency_seconds_bucket{stage="index_search",le="0.025"} 2' in lines
+    assert 'rag_stage_latency_seconds_bucket{stage="index_search",le="60"} 2' in lines
+    assert 'rag_stage_latency_seconds_bucket{stage="index_search",le="+Inf"} 3' in lines
+    assert 'rag_stage_latency_seconds_sum{stage="index_search"} 120.012800' in lines
+    assert 'rag_stage_latency_seconds_count{stage="index_search"} 3' in lines
+
+def test_timed_records_stage_and_trace():
+    metrics.start_trace()
+    with metrics.timed("rerank") as t:
+        pass
+    trace = metrics.end_trace()
+
+    assert trace == [("rerank", t.ms)]
+    assert metrics.snapshot()["rerank"]["count"] == 1
+    assert metrics.end_trace() == []
+
+def test_write_json(tmp_path):
+    metrics.observe("embed", 4)
+    path = tmp_path / "metrics.json"
+    metrics.write_json(path)
+
+    dumped = json.loads(path.read_text())
+    assert dumped["stages"] == metrics.snapshot()
+    assert not (tmp_path / "metrics.json.tmp").exists()
+
+def test_reset_clears_all_stages():
+    metrics.observe("embed", 1)
+    metrics.reset()
+    assert metrics.snapshot() == {}
+    assert metrics.render_prometheus().count("\n") == 2
@@ -0,0 +1,113 @@
+import os
+import stat
+
+import faiss
+import numpy as np
+import pytest
+
+from scripts.utils.snapshots import (
+    INDEX_FILE, MANIFEST_FILE, SnapshotWatcher, list_snapshots, load_snapshot, prune_snapshots, publish_snapshot,
+    read_current, read_manifest, set_current, verify_snapshot,
+)
+
+def build(n=6, d=4, seed=0):
+    vectors = np.random.default_rng(seed).random((n, d), dtype=np.float32)
+    index = faiss.IndexFlatL2(d)
+    index.add(vectors)
+    return index, [{"id": f"CWE-{i}", "text": f"entry {i}"} for i in range(n)]
+
+def test_publish_writes_manifest_and_points_current(tmp_path):
+    index, metadata = build()
+    name = publish_snapshot(index, metadata, "all-mpnet-base-v2", tmp_path, extra={"source": "test"})
+
+    assert read_current(tmp_path) == name
+    assert list_snapshots(tmp_path) == [name]
+    manifest = read_manifest(name, tmp_path)
+    assert manifest["name"] == name
+    assert (manifest["model"], manifest["dimension"], manifest["count"]) == ("all-mpnet-base-v2", 4, 6)
+    assert manifest["source"] == "test"
+    assert all(verify_snapshot(name, tmp_path).values())
+    assert not [p for p in os.listdir(tmp_path) if p.startswith(".tmp")]
+
+    # Published files are read-only
+    assert not os.stat(tmp_path / name / INDEX_FILE).st_mode & stat.S_IWUSR
+
+    snapshot = load_snapshot(root=tmp_path)
+    assert snapshot["name"] == name
+    assert snapshot["index"].ntotal == 6 and snapshot["metadata"] == metadata
+
+def test_publish_same_index_twice_gives_distinct_ordered_names(tmp_path):
+    index, metadata = build()
+    first = publish_snapshot(index, metadata, "m", tmp_path)
+    second = publish_snapshot(index, metadata, "m", tmp_path)
+
+    assert first != second
+    assert list_snapshots(tmp_path) == [first, second]
+    assert read_current(tmp_path) == second
+
+def test_publish_rejects_mismatched_metadata(tmp_path):
+    index, metadata = build()
+    with pytest.raises(ValueError):
+        publish_snapshot(index, metadata[:-1], "m", tmp_path)
+    assert list_snapshots(tmp_path) == []
+
+def test_publish_without_activate_keeps_current(tmp_path):
+    index, metadata = build()
+    first = publish_snapshot(index, metadata, "m", tmp_path)
+    publish_snapshot(index, metadata, "m", tmp_path, activate=False)
+    assert read_current(tmp_path) == first
+
+def test_verify_detects_modified_file(tmp_path):
+    index, metadata = build()
+    name = publish_snapshot(index, metadata, "m", tmp_path)
+    path = tmp_path / name / INDEX_FILE
+    path.chmod(stat.S_IWUSR | stat.S_IRUSR)
+    with open(path, "ab") as f:
+        f.write(b"\0")
+
+    assert verify_snapshot(name, tmp_path)[INDEX_FILE] is False
+    with pytest.raises(ValueError):
+        load_snapshot(name, tmp_path)
+
+def test_prune_keeps_newest_and_current(tmp_path):
+    index, metadata = build()
+    names = [publish_snapshot(index, metadata, "m", tmp_path) for _ in range(5)]
+    set_current(names[0], tmp_path)  # rolled back to the oldest
+
+    removed = prune_snapshots(keep=2, root=tmp_path)
+
+    assert removed == names[1:3]
+    assert list_snapshots(tmp_path) == [names[0]] + names[3:]
+
+def test_prune_keep_zero_removes_all_but_current(tmp_path):
+    index, metadata = build()
+    names = [publish_snapshot(index, metadata, "m", tmp_path) for _ in range(3)]
+    assert prune_snapshots(keep=0, root=tmp_path) == names[:2]
+    assert list_snapshots(tmp_path) == [names[2]]
+
+def test_set_current_rejects_unknown_snapshot(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        set_current("20250101-000000-000000-deadbeef", tmp_path)
+
+def test_watcher_without_current_raises(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        SnapshotWatcher(tmp_path)
+
+def test_watcher_swaps_and_rejects(tmp_path):
+    index, metadata = build()
+    first = publish_snapshot(index, metadata, "m", tmp_path)
+    swapped = []
+    watcher = SnapshotWatcher(tmp_path, accept=lambda manifest: manifest["dimension"] == 4, on_swap=swapped.append)
+    assert watcher.current["name"] == first
+    assert not watcher.poll()
+
+    second = publish_snapshot(*build(n=8), "m", tmp_path)
+    assert watcher.poll()
+    assert watcher.current["name"] == second and len(watcher.current["metadata"]) == 8
+    assert [s["name"] for s in swapped] == [second]
+
+    # A snapshot the accept hook refuses is skipped and the current one stays active
+    wrong_dim = publish_snapshot(*build(d=8), "m", tmp_path)
+    assert not watcher.poll()
+    assert watcher.current["name"] == second
+    assert (tmp_path / wrong_dim / MANIFEST_FILE).exists()
@@ -0,0 +1,42 @@
+from scripts.utils.tuning import TOLERANCE, build_profile, pick, thread_options
+
+ROWS = [
+    {"threads": 1, "single_ms": 10.0, "docs_per_s": 100.0},
+    {"threads": 2, "single_ms": 6.0, "docs_per_s": 180.0},
+    {"threads": 4, "single_ms": 5.9, "docs_per_s": 300.0},
+    {"threads": 8, "single_ms": 5.8, "docs_per_s": 310.0},
+]
+
+def test_pick_prefers_earliest_row_within_tolerance_lower_is_better():
+    # 6.0 ms is within 5% of the best (5.8 ms), so two threads win over eight
+    assert pick(ROWS, "single_ms", lower_is_better=True)["threads"] == 2
+
+def test_pick_prefers_earliest_row_within_tolerance_higher_is_better():
+    # 300 docs/s is within 5% of the best (310), 180 is not
+    assert pick(ROWS, "docs_per_s", lower_is_better=False)["threads"] == 4
+
+def test_pick_returns_best_when_nothing_else_is_close():
+    rows = [{"threads": 1, "ms": 10.0}, {"threads": 2, "ms": 10.0 * (1 - 2 * TOLERANCE)}]
+    assert pick(rows, "ms", lower_is_better=True)["threads"] == 2
+
+def test_thread_options():
+    assert thread_options(1) == [1]
+    assert thread_options(6) == [1, 2, 4, 6]
+    assert thread_options(8) == [1, 2, 4, 8]
+
+def test_build_profile():
+    embed_rows = [
+        {"threads": t, "batch_size": b, "single_ms": ms, "docs_per_s": dps}
+        for t, ms, per_batch in ((1, 8.0, (50, 90, 95)), (4, 4.0, (120, 200, 210)))
+        for b, dps in zip((8, 32, 128), per_batch)
+    ]
+    faiss_rows = [
+        {"threads": 1, "single_ms": 2.0, "queries_per_s": 500.0},
+        {"threads": 4, "single_ms": 5.0, "queries_per_s": 1500.0},
+    ]
+    profile = build_profile(embed_rows, faiss_rows)
+
+    assert profile["latency"] == {"embed_threads": 4, "faiss_threads": 1, "batch_size": 32,
+                                  "embed_ms": 4.0, "search_ms": 2.0}
+    assert profile["throughput"] == {"embed_threads": 4, "faiss_threads": 4, "batch_size": 32,
+                                     "docs_per_s": 200.0, "queries_per_s": 1500.0}